@@ -1,9 +1,18 @@
 
+import functools
+import heapq
+import os
 import random
+import time
+
+from lexicon import ALL_LETTERS, BITS, LETTERS, Lexicon, mask_letters
 
 # Dictonary containing letter scores
 POINTS = dict(A=1, B=3, C=3, D=2, E=1, F=4, G=2, H=4, I=1, J=8, K=5, L=1, M=3, N=1, O=1, P=3, Q=10, R=1, S=1, T=1, U=1,
               V=4, W=4, X=8, Y=4, Z=10, _=0)
+# A blank ('_') is played as the lowercase of the letter it stands for, in words and on the board, and scores nothing.
+POINTS.update((L.lower(), 0) for L in LETTERS)
+BLANKS = str.maketrans(LETTERS.lower(), '_' * len(LETTERS))
 
 def bonus_template(half):
     "Make a board from the left half."
@@ -29,11 +38,13 @@ SCRABBLE = """
 |:..2...:
 |..2...:.
 |.2...;..
+|3..:...3
 |||||||||
 """
 
 
 BONUS = bonus_template(SCRABBLE)
+SIZE = len(BONUS)  # Squares along each side, counting the border
 
 # Internal representations of double word, triple word, double letter, triple letter
 DW, TW, DL, TL = '23:;'
@@ -46,6 +57,11 @@ def removed(letters, remove):
     return letters
 
 
+def tiles(letters):
+    "The tiles that letters are made from: 'HaT' is played with the tiles 'H_T'."
+    return letters.translate(BLANKS)
+
+
 def prefixes(word):
     "A list of the initial sequences of a word, not including the complete word."
     return [word[:i] for i in range(len(word))]
@@ -57,200 +73,510 @@ def transpose(matrix):
     return list(map(list, zip(*matrix)))
 
 
-def readwordlist(filename):
-    "Return a pair of sets: all the words in a file, and all the prefixes. (Uppercased.)"
-    wordset = set(open(filename).read().upper().split())
-    prefixset = set(p for word in wordset for p in prefixes(word))
-    return wordset, prefixset
+def flip(x):
+    "The index of square x of a flat SIZE * SIZE board in the transposed board (and vice versa)."
+    return (x % SIZE) * SIZE + x // SIZE
+
 
+# The bonus of every square of a flat board, row by row, and of the transposed board, column by column.
+BONUS_SQUARES = ''.join(map(''.join, BONUS)).encode()
+BONUS_TRANSPOSED = ''.join(map(''.join, transpose(BONUS))).encode()
 
-WORDS, PREFIXES = readwordlist('words.txt')
 
+def multipliers(bonus):
+    "The letter multipliers and the word multipliers of the squares with these bonuses, as two arrays."
+    return (bytes(3 if b == TL else 2 if b == DL else 1 for b in bonus.decode()),
+            bytes(3 if b == TW else 2 if b in (DW, '*') else 1 for b in bonus.decode()))
 
-class anchor(set):
-    "An anchor is where a new word can be placed; has a set of allowable letters."
 
+def readwords(filename):
+    "The set of all the words in a file. (Uppercased.)"
+    with open(filename) as f:
+        return set(f.read().upper().split())
 
-LETTERS = list('ABCDEFGHIJKLMNOPQRSTUVWXYZ')
-ANY = anchor(LETTERS)  # The anchor that can be any letter
+
+def readwordlist(filename):
+    """Return a pair of sets: all the words in a file, and all the prefixes. (Uppercased.)
+    The move generator uses LEXICON instead; this is kept to compare against it."""
+    wordset = readwords(filename)
+    prefixset = set(p for word in wordset for p in prefixes(word))
+    return wordset, prefixset
 
 
-def is_letter(sq):
-    return isinstance(sq, str) and sq in LETTERS
+# The word list, mapped from its compiled form (words.dawg) the first time a move is generated.
+WORDLIST = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'words.txt')
+LEXICON = Lexicon.lazy(WORDLIST)
 
 
-def is_empty(sq):
-    "Is this an empty square (no letters, but a valid position on board)."
-    return sq == '.' or sq == '*' or isinstance(sq, set)
+# What a square of a Board holds: nothing, the border, or the character code of a letter.
+EMPTY, BORDER = 0, 1
+ANCHOR = 1 << 26  # Flag in a cross-check for a square that is an anchor
 
 
-def add_suffixes(hand, pre, start, row, results, anchored=True):
-    "Add all possible suffixes, and accumulate (start, word) pairs in results."
-    i = start + len(pre)
-    if pre in WORDS and anchored and not is_letter(row[i]):
+def add_suffixes(hand, pre, start, squares, checks, results, anchored=True, node=None):
+    """Add all possible suffixes, and accumulate (start, word) pairs in results. start is the index of the first
+    square in squares (a Board's letters or transposed letters); node is the lexicon node reached by pre (looked up if
+    not given). An empty square x takes the letters in checks[x], or any letter if it is not an anchor; a blank
+    in hand tries only those letters that also continue a word from node."""
+    if node is None: node = LEXICON.walk(pre.upper())
+    if not node: return results
+    x = start + len(pre)
+    sq = squares[x]
+    if sq > BORDER:
+        L = chr(sq)
+        add_suffixes(hand, pre + L, start, squares, checks, results, True, LEXICON.child(node, L.upper()))
+        return results
+    if anchored and LEXICON.is_word(node):
         results.add((start, pre))
-    if pre in PREFIXES:
-        sq = row[i]
-        if is_letter(sq):
-            add_suffixes(hand, pre + sq, start, row, results)
-        elif is_empty(sq):
-            possibilities = sq if isinstance(sq, set) else ANY
-            for L in hand:
-                if L in possibilities:
-                    add_suffixes(hand.replace(L, '', 1), pre + L, start, row, results)
+    if sq == EMPTY:
+        possibilities = LEXICON.edges(node) & (checks[x] or ALL_LETTERS)
+        for L in set(hand):
+            if L == '_':
+                rest = hand.replace('_', '', 1)
+                for L in mask_letters(possibilities):
+                    add_suffixes(rest, pre + L.lower(), start, squares, checks, results, True,
+                                 LEXICON.child(node, L))
+            elif BITS[L] & possibilities:
+                add_suffixes(hand.replace(L, '', 1), pre + L, start, squares, checks, results, True,
+                             LEXICON.child(node, L))
     return results
 
 
-def legal_prefix(i, row):
-    """A legal prefix of an anchor at row[i] is either a string of letters
+def legal_prefix(x, squares, checks):
+    """A legal prefix of an anchor at squares[x] is either a string of letters
     already on the board, or new letters that fit into an empty space.
     Return the tuple (prefix_on_board, maxsize) to indicate this.
-    E.g. legal_prefix(a_row, 9) == ('BE', 2) and for 6, ('', 2)."""
-    s = i
-    while is_letter(row[s - 1]): s -= 1
-    if s < i:  ## There is a prefix
-        return ''.join(row[s:i]), i - s
-    while is_empty(row[s - 1]) and not isinstance(row[s - 1], set): s -= 1
-    return ('', i - s)
+    E.g. legal_prefix(9, ...) == ('BE', 2) and for 6, ('', 2)."""
+    s = x
+    while squares[s - 1] > BORDER: s -= 1
+    if s < x:  ## There is a prefix
+        return squares[s:x].decode(), x - s
+    while squares[s - 1] == EMPTY and not checks[s - 1]: s -= 1
+    return ('', x - s)
+
+
+def find_prefixes(hand, pre='', results=None, node=None):
+    """Return a dict of {prefix: lexicon node} for every prefix of a word that can be made from hand.
+    A blank ('_') can stand for any letter that continues a word, and appears in the prefix in lowercase."""
+    if results is None: results = {}
+    if node is None: node = LEXICON.root
+    # Now do the computation
+    results[pre] = node
+    for L in set(hand):
+        if L == '_':
+            for l in LEXICON.letters(node):
+                find_prefixes(hand.replace(L, '', 1), pre + l.lower(), results, LEXICON.child(node, l))
+        else:
+            next_node = LEXICON.child(node, L)
+            if next_node:
+                find_prefixes(hand.replace(L, '', 1), pre + L, results, next_node)
+    return results
 
 
-prev_hand, prev_results = '', set()  # cache for find_prefixes
+# Sizes of the caches of prefix tables and of line plays. (Clear them with clear_caches if LEXICON is replaced.)
+PREFIX_CACHE_SIZE, LINE_CACHE_SIZE = 64, 4096
 
 
-def find_prefixes(hand, pre='', results=None):
-    ## Cache the most recent full hand (don't cache intermediate results)
-    global prev_hand, prev_results
-    if hand == prev_hand: return prev_results
-    if results is None: results = set()
-    if pre == '': prev_hand, prev_results = hand, results
-    # Now do the computation
-    if pre in WORDS or pre in PREFIXES: results.add(pre)
-    if pre in PREFIXES:
-        for L in hand:
-            if L == '_':
-                for l in LETTERS:
-                    find_prefixes(hand.replace(L, '', 1), pre + l, results)
-    return results
+@functools.lru_cache(maxsize=PREFIX_CACHE_SIZE)
+def prefix_table(hand):
+    """The prefixes that can be made from hand (see find_prefixes), grouped by length: table[n] lists
+    (prefix, node, rest, fits) for the prefixes of n letters, where rest is what is left of hand and fits is the
+    mask of letters that could go on the next square: the node's edges that rest has a tile for."""
+    table = [[] for _ in range(len(hand) + 1)]
+    for (pre, node) in find_prefixes(hand).items():
+        rest = removed(hand, tiles(pre))
+        fits = LEXICON.edges(node)
+        if '_' not in rest:
+            fits &= sum(BITS[L] for L in set(rest))
+        table[len(pre)].append((pre, node, rest, fits))
+    return tuple(map(tuple, table))
 
 
-def row_plays(hand, row):
-    "Return a set of legal plays in row.  A row play is an (start, 'WORD') pair."
+def row_plays(hand, squares, checks, k):
+    """Return a set of legal plays along line k of squares (row k of a Board's letters, or column k
+    of its transposed letters). A row play is a (start, 'WORD') pair; start is an index into squares."""
     results = set()
     ## To each allowable prefix, add all suffixes, keeping words
-    for (i, sq) in enumerate(row[1:-1], 1):
-        if isinstance(sq, set):
-            pre, maxsize = legal_prefix(i, row)
+    for x in range(k * SIZE + 1, k * SIZE + SIZE - 1):
+        if checks[x]:
+            pre, maxsize = legal_prefix(x, squares, checks)
             if pre:  ## Add to the letters already on the board
-                start = i - len(pre)
-                add_suffixes(hand, pre, start, row, results, anchored=False)
-            else:  ## Empty to left: go through the set of all possible prefixes
-                for pre in find_prefixes(hand):
-                    if len(pre) <= maxsize:
-                        start = i - len(pre)
-                        add_suffixes(removed(hand, pre), pre, start, row, results,
-                                     anchored=False)
+                start = x - len(pre)
+                add_suffixes(hand, pre, start, squares, checks, results, anchored=False)
+            else:  ## Empty to left: go through the possible prefixes that fit, and can be followed by a tile here
+                table = prefix_table(hand)
+                for n in range(min(maxsize, len(hand) - 1) + 1):
+                    for (pre, node, rest, fits) in table[n]:
+                        if fits & checks[x]:
+                            add_suffixes(rest, pre, x - n, squares, checks, results, anchored=False, node=node)
     return results
 
 
-def find_cross_word(board, i, j):
-    """Find the vertical word that crosses board[j][i]. Return (j2, w),
-    where j2 is the starting row, and w is the word"""
-    sq = board[j][i]
-    w = sq if is_letter(sq) else '.'
-    for j2 in range(j, 0, -1):
-        sq2 = board[j2 - 1][i]
-        if is_letter(sq2):
-            w = sq2 + w
-        else:
-            break
-    for j3 in range(j + 1, len(board)):
-        sq3 = board[j3][i]
-        if is_letter(sq3):
-            w = w + sq3
-        else:
-            break
-    return (j2, w)
+@functools.lru_cache(maxsize=LINE_CACHE_SIZE)
+def line_plays(rack, line, line_checks):
+    """The row plays (see row_plays) along a single line, given as the bytes of its SIZE squares and a tuple of
+    their cross-checks; starts are indexes into the line. Plays depend on nothing but the line and the tiles in the
+    rack, so they are cached, and lines that are the same on another turn, in the other direction, or in another
+    game all share an entry. Pass the rack sorted so that the order of its tiles doesn't matter."""
+    return tuple(row_plays(rack, line, line_checks, 0))
+
 
+def clear_caches():
+    "Empty the caches of move generation: needed when LEXICON is replaced."
+    prefix_table.cache_clear()
+    line_plays.cache_clear()
 
-def neighbors(board, i, j):
-    """Return a list of the contents of the four neighboring squares,
-    in the order N,S,E,W."""
-    return [board[j - 1][i], board[j + 1][i],
-            board[j][i + 1], board[j][i - 1]]
 
+def cache_stats():
+    "The hits, misses, maxsize and current size of the prefix table and line play caches."
+    return {'prefix_table': prefix_table.cache_info()._asdict(), 'line_plays': line_plays.cache_info()._asdict()}
 
-def set_anchors(row, j, board):
-    """Anchors are empty squares with a neighboring letter. Some are resticted
-    by cross-words to be only a subset of letters."""
-    for (i, sq) in enumerate(row[1:-1], 1):
-        neighborlist = (N, S, E, W) = neighbors(board, i, j)
-        # Anchors are squares adjacent to a letter.  Plus the '*' square.
-        if sq == '*' or (is_empty(sq) and any(map(is_letter, neighborlist))):
-            if is_letter(N) or is_letter(S):
-                # Find letters that fit with the cross (vertical) word
-                (j2, w) = find_cross_word(board, i, j)
-                row[i] = anchor(L for L in LETTERS if w.replace('.', L) in WORDS)
-            else:  # Unrestricted empty square -- any letter will fit.
-                row[i] = ANY
+
+def letters_around(squares, x, step=1):
+    "The runs of letters just before and just after squares[x], going step squares at a time, as a pair of strings."
+    s, e = x - step, x + step
+    while squares[s] > BORDER: s -= step
+    while squares[e] > BORDER: e += step
+    return squares[s + step:x:step].decode(), squares[x + step:e:step].decode()
+
+
+def cross_check(before, after):
+    "The mask of letters L for which before + L + after is a word. (Blanks in before and after are lowercase.)"
+    node = LEXICON.walk(before.upper())
+    after = after.upper()
+    mask = 0
+    for L in LEXICON.letters(node):
+        if LEXICON.is_word(LEXICON.walk(after, LEXICON.child(node, L))):
+            mask |= BITS[L]
+    return mask
+
+
+ACROSS, DOWN = (1, 0), (0, 1)  # Directions that words can go
+# The (letter multipliers, word multipliers) of the squares of the array that words in each direction run along.
+MULTIPLIERS = {ACROSS: multipliers(BONUS_SQUARES), DOWN: multipliers(BONUS_TRANSPOSED)}
+NO_CROSS_WORD = -1
+
+
+class Board:
+    """A board kept in flat arrays, with the anchors and cross-checks that move generation needs kept up to date
+    play by play instead of being recomputed for every move.
+
+    Square (i, j) is letters[j * SIZE + i]: EMPTY, BORDER, or the code of a letter. transposed holds the same
+    squares column by column (square (i, j) is transposed[i * SIZE + j]) and is kept in step, so words in either
+    direction run along consecutive squares of one of the two arrays. checks[direction] is laid out like the array
+    words in that direction run along: 0 for a square that is not an anchor, and for an anchor (an empty square next
+    to a letter, or the start square) ANCHOR plus the mask of letters that fit with the letters across the line.
+    cross_sums[direction], laid out the same way, holds the points of those letters across the line, or NO_CROSS_WORD
+    for a square with no letters across the line: scoring a tile there only needs its own points added.
+    A board made by clone shares these arrays with the one it was cloned from (both are then shared) until either
+    of them is played on, when it copies them for itself."""
+
+    __slots__ = ('letters', 'transposed', 'checks', 'cross_sums', 'shared')
+
+    def __init__(self, squares):
+        "Make a board from rows of squares as in BONUS: letters, empty squares ('.', '*' or a bonus) and '|'."
+        self.letters = bytearray(ord(sq) if sq.isalpha() else BORDER if sq == '|' else EMPTY
+                                 for row in squares for sq in row)
+        self.transposed = bytearray(self.letters[flip(x)] for x in range(SIZE * SIZE))
+        self.checks = {ACROSS: [0] * (SIZE * SIZE), DOWN: [0] * (SIZE * SIZE)}
+        self.cross_sums = {ACROSS: [NO_CROSS_WORD] * (SIZE * SIZE), DOWN: [NO_CROSS_WORD] * (SIZE * SIZE)}
+        start = BONUS_SQUARES.index(b'*')
+        if self.letters[start] == EMPTY:  # A board with letters on it may have a tile on the start square already
+            self.checks[ACROSS][start] = self.checks[DOWN][flip(start)] = ANCHOR | ALL_LETTERS
+        self.shared = False
+        self.update([(x % SIZE, x // SIZE) for x in range(SIZE * SIZE) if self.letters[x] > BORDER])
+
+    def copy(self):
+        "A board with the same squares, that can be played on without changing this one."
+        board = Board.__new__(Board)
+        board.letters, board.transposed = self.letters[:], self.transposed[:]
+        board.checks = {ACROSS: self.checks[ACROSS][:], DOWN: self.checks[DOWN][:]}
+        board.cross_sums = {ACROSS: self.cross_sums[ACROSS][:], DOWN: self.cross_sums[DOWN][:]}
+        board.shared = False
+        return board
+
+    def clone(self):
+        "A board with the same squares, sharing this one's arrays until one of the two is played on (copy on write)."
+        board = Board.__new__(Board)
+        board.letters, board.transposed, board.checks, board.cross_sums = \
+            self.letters, self.transposed, self.checks, self.cross_sums
+        board.shared = self.shared = True
+        return board
+
+    def unshare(self):
+        "Give the board arrays of its own, if it shares them, so that it can be changed."
+        if self.shared:
+            self.letters, self.transposed = self.letters[:], self.transposed[:]
+            self.checks = {ACROSS: self.checks[ACROSS][:], DOWN: self.checks[DOWN][:]}
+            self.cross_sums = {ACROSS: self.cross_sums[ACROSS][:], DOWN: self.cross_sums[DOWN][:]}
+            self.shared = False
+
+    def squares(self, direction):
+        "The array that words in this direction run along."
+        return self.letters if direction == ACROSS else self.transposed
+
+    def square(self, i, j):
+        "The letter on square (i, j), or its bonus if it is empty."
+        sq = self.letters[j * SIZE + i]
+        return chr(sq) if sq > BORDER else BONUS[j][i]
+
+    def is_empty(self, i, j):
+        return self.letters[j * SIZE + i] == EMPTY
+
+    def place(self, i, j, L):
+        "Put letter L on square (i, j). Call update once all of a play's letters are placed."
+        if self.shared: self.unshare()
+        x, t = j * SIZE + i, i * SIZE + j
+        self.letters[x] = self.transposed[t] = ord(L)
+        self.checks[ACROSS][x] = self.checks[DOWN][t] = 0
+
+    def update(self, placed):
+        """Bring the anchors and cross-checks up to date after letters were placed on the squares in placed.
+        Only the empty squares at the ends of the runs of letters through a placed square can change: each
+        becomes an anchor, and gets a new cross-check and cross sum for words running across that run."""
+        if self.shared: self.unshare()
+        for (i, j) in placed:
+            for (direction, across, x) in ((ACROSS, DOWN, j * SIZE + i), (DOWN, ACROSS, i * SIZE + j)):
+                squares = self.squares(direction)
+                for step in (-1, 1):
+                    e = x + step
+                    while squares[e] > BORDER: e += step
+                    if squares[e] == EMPTY:
+                        before, after = letters_around(squares, e)
+                        self.checks[across][flip(e)] = ANCHOR | cross_check(before, after)
+                        self.cross_sums[across][flip(e)] = sum(POINTS[L] for L in before + after)
+                        if not self.checks[direction][e]:
+                            self.checks[direction][e] = ANCHOR | ALL_LETTERS
 
 
 def make_play(play, board, hand):
-    "Put the word down on the board."
+    "Put the word down on the board; return the hand without the letters that were placed."
     (score, (i, j), (di, dj), word) = play
+    placed = []
     for (n, L) in enumerate(word):
-        hand = hand.replace(L, "", 1)
-        board[j + n * dj][i + n * di] = L
+        square = (i + n * di, j + n * dj)
+        if board.is_empty(*square):
+            hand = hand.replace(tiles(L), "", 1)
+            board.place(*square, L)
+            placed.append(square)
+    board.update(placed)
     return hand
 
 
-def calculate_score(board, pos, direction, hand, word):
-    "Return the total score for this play."
-    total, crosstotal, word_mult = 0, 0, 1
-    starti, startj = pos
-    di, dj = direction
-    other_direction = DOWN if direction == ACROSS else ACROSS
-    for (n, L) in enumerate(word):
-        i, j = starti + n * di, startj + n * dj
-        sq = board[j][i]
-        b = BONUS[j][i]
-        word_mult *= (1 if is_letter(sq) else
-                      3 if b == TW else 2 if b in (DW, '*') else 1)
-        letter_mult = (1 if is_letter(sq) else
-                       3 if b == TL else 2 if b == DL else 1)
-        total += POINTS[L] * letter_mult
-        if isinstance(sq, set) and sq is not ANY and direction is not DOWN:
-            crosstotal += cross_word_score(board, L, (i, j), other_direction)
-    return crosstotal + word_mult * total
-
-
-def cross_word_score(board, L, pos, direction):
-    "Return the score of a word made in the other direction from the main word."
-    i, j = pos
-    (j2, word) = find_cross_word(board, i, j)
-    return calculate_score(board, (i, j2), DOWN, L, word.replace('.', L))
+def tiles_played(play, board):
+    "The letters of play that are not on the board yet, as the tiles it takes from the hand (a blank is '_')."
+    (score, (i, j), (di, dj), word) = play
+    x, step, letters = j * SIZE + i, dj * SIZE + di, board.letters
+    return tiles(''.join([L for (n, L) in enumerate(word) if letters[x + n * step] == EMPTY]))
 
 
-ACROSS, DOWN = (1, 0), (0, 1)  # Directions that words can go
+def tiles_on_board(board):
+    "The number of tiles on the board."
+    return sum(sq > BORDER for sq in board.letters)
 
 
-def horizontal_plays(hand, board):
-    "Find all horizontal plays -- (score, pos, word) pairs -- across all rows."
+def calculate_score(board, pos, direction, hand, word):
+    "Return the total score for this play."
+    (i, j) = pos
+    start = j * SIZE + i if direction == ACROSS else i * SIZE + j
+    return line_scores(board.squares(direction), *MULTIPLIERS[direction], board.cross_sums[direction],
+                       [(start, word)])[0]
+
+
+def line_scores(squares, letter_mult, word_mult, cross_sums, plays):
+    """The scores of a batch of (start, word) plays along squares, including the words made across the line by the
+    new tiles. letter_mult, word_mult and cross_sums are the board's arrays for the same direction as squares."""
+    scores = []
+    for (x, word) in plays:
+        total, crosstotal, mult = 0, 0, 1
+        for L in word:
+            if squares[x] > BORDER:
+                total += POINTS[L]
+            else:
+                points = POINTS[L] * letter_mult[x]
+                total += points
+                mult *= word_mult[x]
+                if cross_sums[x] != NO_CROSS_WORD:
+                    crosstotal += (points + cross_sums[x]) * word_mult[x]
+            x += 1
+        scores.append(crosstotal + mult * total)
+    return scores
+
+
+def direction_plays(hand, board, direction):
+    "Find all plays in one direction -- (score, pos, word) triples -- along all the lines."
     results = set()
-    for (j, row) in enumerate(board[1:-1], 1):
-        set_anchors(row, j, board)
-        for (i, word) in row_plays(hand, row):
-            score = calculate_score(board, (i, j), ACROSS, hand, word)
-            results.add((score, (i, j), word))
+    squares, checks = board.squares(direction), board.checks[direction]
+    letter_mult, word_mult = MULTIPLIERS[direction]
+    cross_sums = board.cross_sums[direction]
+    rack = ''.join(sorted(hand))
+    for k in range(1, SIZE - 1):
+        row = k * SIZE
+        plays = line_plays(rack, bytes(squares[row:row + SIZE]), tuple(checks[row:row + SIZE]))
+        if plays:
+            scores = line_scores(squares, letter_mult, word_mult, cross_sums, [(row + n, word) for (n, word) in plays])
+            for ((n, word), score) in zip(plays, scores):
+                results.add((score, (n, k) if direction == ACROSS else (k, n), word))
     return results
 
 
 def all_plays(hand, board):
     """All plays in both directions. A play is a (score, pos, dir, word) tuple,
     where pos is an (i, j) pair, and dir is a (delta-_i, delta_j) pair."""
-    hplays = horizontal_plays(hand, board)
-    vplays = horizontal_plays(hand, transpose(board))
-    return (set((score, (i, j), ACROSS, w) for (score, (i, j), w) in hplays) |
-            set((score, (i, j), DOWN, w) for (score, (j, i), w) in vplays))
+    return set((score, pos, direction, w) for direction in (ACROSS, DOWN)
+               for (score, pos, w) in direction_plays(hand, board, direction))
+
+
+def play_bound(x, values, total, mult, cross, squares, checks, letter_mult, word_mult, cross_sums, fits=ALL_LETTERS):
+    """An upper bound on the score of a play going on from empty square x with tiles worth values (highest first),
+    when the word so far has total points (before its word multiplier, mult) and its cross words cross points.
+    Tiles can only go on the next empty squares in turn, up to one whose cross-check none of them fits (fits is the
+    mask of the letters they can be), so the bound takes them all to be used, every word multiplier on them to
+    count, the letters on the board among them and just after them to be in the word, and the best tiles to go
+    where they count most."""
+    placed = []
+    while len(placed) < len(values):
+        sq = squares[x]
+        if sq == EMPTY:
+            if checks[x] and not checks[x] & fits:
+                break
+            mult *= word_mult[x]
+            placed.append(x)
+        elif sq == BORDER:
+            break
+        else:
+            total += POINTS[chr(sq)]
+        x += 1
+    else:
+        while squares[x] > BORDER:
+            total += POINTS[chr(squares[x])]
+            x += 1
+    weights = []  # What a point of a tile on each of the squares is worth, in the word and across it
+    for e in placed:
+        if cross_sums[e] == NO_CROSS_WORD:
+            weights.append(letter_mult[e] * mult)
+        else:
+            weights.append(letter_mult[e] * (mult + word_mult[e]))
+            cross += cross_sums[e] * word_mult[e]
+    weights.sort(reverse=True)
+    return mult * total + cross + sum(w * v for (w, v) in zip(weights, values))
+
+
+def hand_letters(hand):
+    "The mask of the letters the tiles in hand can be."
+    return ALL_LETTERS if '_' in hand else sum(BITS[L] for L in set(hand))
+
+
+class TopPlays:
+    """A branch-and-bound search for the n best plays of a hand on a board: the same plays, in the same order, as
+    the n largest of all_plays. Each anchor, with each size of prefix that can go before it, gets a bound on the
+    plays through it (see play_bound); they are searched in order of their bounds, and any of them, or any partial
+    word, that can't score as much as the nth best play found so far is cut off. Plays are scored as they are built,
+    letter by letter, as line_scores would score them."""
+
+    __slots__ = ('n', 'top', 'direction', 'k', 'squares', 'checks', 'letter_mult', 'word_mult', 'cross_sums')
+
+    def __init__(self, hand, board, n=1):
+        self.n, self.top, self.direction = n, [], None  # top is a heap of the best plays so far, worst first
+        rack = ''.join(sorted(hand))
+        values = sorted((POINTS[L] for L in hand), reverse=True)
+        fits = hand_letters(hand)
+        starts = []
+        for direction in (ACROSS, DOWN):
+            squares, checks, cross_sums = board.squares(direction), board.checks[direction], board.cross_sums[direction]
+            letter_mult, word_mult = MULTIPLIERS[direction]
+            for x in range(SIZE + 1, SIZE * (SIZE - 1) - 1):
+                if checks[x] and checks[x] & fits:
+                    pre, maxsize = legal_prefix(x, squares, checks)
+                    for m in ([len(pre)] if pre else range(min(maxsize, len(hand) - 1) + 1)):
+                        bound = play_bound(x - m, values, 0, 1, 0, squares, checks, letter_mult, word_mult, cross_sums,
+                                           fits)
+                        starts.append((bound, direction, x, m, pre))
+        starts.sort(key=lambda start: start[0], reverse=True)
+        for (bound, direction, x, m, pre) in starts:
+            if bound < self.threshold():
+                break
+            if direction != self.direction:
+                self.direction, self.squares, self.checks = direction, board.squares(direction), board.checks[direction]
+                self.letter_mult, self.word_mult = MULTIPLIERS[direction]
+                self.cross_sums = board.cross_sums[direction]
+            self.k = x // SIZE
+            self.start(rack, values, x, m, pre)
+
+    def plays(self):
+        "The best plays, best first."
+        return sorted(self.top, reverse=True)
+
+    def threshold(self):
+        "The score a play needs to make the top n: that of the nth best so far (-1 until there are n)."
+        return self.top[0][0] if len(self.top) == self.n else -1
+
+    def add(self, start, word, score):
+        "Count the play of word at start (an index into the line's squares) among the best, if it is good enough."
+        n, k = start % SIZE, self.k
+        play = (score, (n, k) if self.direction == ACROSS else (k, n), self.direction, word)
+        if len(self.top) < self.n:
+            if play not in self.top:
+                heapq.heappush(self.top, play)
+        elif play > self.top[0] and play not in self.top:
+            heapq.heapreplace(self.top, play)
+
+    def start(self, rack, values, x, m, pre):
+        """Search the plays through anchor x that start m squares before it: on pre, the letters on the board there,
+        or else with each prefix of m tiles from the rack that can go on the empty squares there."""
+        if pre:
+            self.suffixes(rack, values, pre, x - m, x, LEXICON.walk(pre.upper()), sum(POINTS[L] for L in pre), 1, 0,
+                          False)
+            return
+        letter_mult, word_mult, check = self.letter_mult, self.word_mult, self.checks[x]
+        for (pre, node, rest, fits) in prefix_table(rack)[m]:
+            if fits & check:
+                total, mult = 0, 1
+                for (i, L) in enumerate(pre, x - m):
+                    total += POINTS[L] * letter_mult[i]
+                    mult *= word_mult[i]
+                rest_values = values[:]
+                for L in tiles(pre):
+                    rest_values.remove(POINTS[L])
+                self.suffixes(rest, rest_values, pre, x - m, x, node, total, mult, 0, False)
+
+    def suffixes(self, hand, values, pre, start, x, node, total, mult, cross, anchored):
+        """As add_suffixes does, go on from pre (a word so far, starting at start) with the tiles in hand, worth
+        values, at square x; total, mult and cross are the score so far, as in play_bound."""
+        squares = self.squares
+        sq = squares[x]
+        if sq > BORDER:
+            L = chr(sq)
+            node = LEXICON.child(node, L.upper())
+            if node:
+                self.suffixes(hand, values, pre + L, start, x + 1, node, total + POINTS[L], mult, cross, True)
+            return
+        if anchored and LEXICON.is_word(node):
+            self.add(start, pre, cross + mult * total)
+        if sq != EMPTY or not hand:
+            return
+        threshold = self.threshold()
+        if threshold >= 0 and play_bound(x, values, total, mult, cross, squares, self.checks, self.letter_mult,
+                                         self.word_mult, self.cross_sums, hand_letters(hand)) < threshold:
+            return
+        possibilities = LEXICON.edges(node) & (self.checks[x] or ALL_LETTERS)
+        letter_mult, word_mult, cross_sum = self.letter_mult[x], self.word_mult[x], self.cross_sums[x]
+        for L in set(hand):
+            rest = hand.replace(L, '', 1)
+            rest_values = values[:]
+            rest_values.remove(POINTS[L])
+            letters = [L2.lower() for L2 in mask_letters(possibilities)] if L == '_' else \
+                [L] if BITS[L] & possibilities else []
+            for L2 in letters:
+                points = POINTS[L2] * letter_mult
+                crossed = cross if cross_sum == NO_CROSS_WORD else cross + (points + cross_sum) * word_mult
+                self.suffixes(rest, rest_values, pre + L2, start, x + 1, LEXICON.child(node, L2.upper()),
+                              total + points, mult * word_mult, crossed, True)
+
+
+def top_plays(hand, board, n=1):
+    "The n best plays (the n largest of all_plays), best first, found by a branch-and-bound search (see TopPlays)."
+    return TopPlays(hand, board, n).plays()
 
 
 NOPLAY = None
@@ -258,8 +584,8 @@ NOPLAY = None
 
 def best_play(hand, board):
     "Return the highest-scoring play.  Or None."
-    plays = all_plays(hand, board)
-    return sorted(plays)[-1] if plays else NOPLAY
+    plays = top_plays(hand, board, 1)
+    return plays[0] if plays else NOPLAY
 
 
 def best_strat(hand, board):
@@ -284,16 +610,22 @@ def player(hand, board):
 
 
 def draw_tiles(bag, hand=''):
-    while bag and len(hand) < 7:
-        random.shuffle(bag)
-        l = len(bag)
-        hand = hand + bag.pop(0)
-        assert len(bag) + 1 == l
-    return hand
+    "Fill hand up to 7 tiles from the end of the bag (which is shuffled once, when the game is set up)."
+    n = min(7 - len(hand), len(bag))
+    if n <= 0:
+        return hand
+    drawn = bag[-n:]
+    del bag[-n:]
+    return hand + ''.join(drawn)
+
 
+TILES = 'E' * 12 + 'AI' * 9 + 'O' * 8 + 'NRT' * 6 + 'LSUD' * 4 + 'G' * 3 + 'BCMPFHVWY' * 2 + '__' + 'KJXQZ'  # The full bag
 
-def scrabble_setup():
-    bag = list('E' * 12 + 'AI' * 9 + 'O' * 8 + 'NRT' * 6 + 'LSUD' * 4 + 'G' * 3 + 'BCMPFHVWY' * 2 + 'KJXQZ')
+
+def scrabble_setup(rng=random):
+    "The state at the start of a game: hands drawn from a bag shuffled by rng (a random.Random, or the module)."
+    bag = list(TILES)
+    rng.shuffle(bag)
     hand0 = draw_tiles(bag)
     hand1 = draw_tiles(bag)
     return (0, (hand0, 0), (hand1, 0), bag)
@@ -319,45 +651,126 @@ def make_board():
     |........
     |||||||||
     """)
-    print(board)
-    # board = map(list, board)
-    return board
+    return Board(board)
+
+
+def board_rows(board):
+    "The rows of a board's squares, as strings of letters, '.' for an empty square and '|' for the border."
+    squares = bytes(sq if sq > BORDER else ord('.') if sq == EMPTY else ord('|') for sq in board.letters).decode()
+    return [squares[j * SIZE:(j + 1) * SIZE] for j in range(SIZE)]
 
 
 def show_board(board):
     "Print the board."
-    for j, row in enumerate(board):
-        for i, sq in enumerate(row):
-            if is_empty(sq):
-                print(BONUS[i][j], end="")
-            else:
-                print(sq, end="")
-        print("")
+    squares = bytes(sq if sq > BORDER else b for (sq, b) in zip(board.letters, BONUS_SQUARES)).decode()
+    for j in range(SIZE):
+        print(squares[j * SIZE:(j + 1) * SIZE])
     print("\n")
 
 
-def play_scrabble(A, B):
+def play_game(A, B, verbose=True, observers=(), rng=random, endgame=False, position=None, pause=None):
+    """Play strategy A (moving first) against strategy B. Return (score0, score1, seconds), where seconds[p]
+    lists how long strategy p took to choose each of its moves. Each of the observers is called with every event of
+    the game (see gamelog.py); if verbose, a Printer is one of them, and prints the board after every move.
+    The bag is shuffled by rng: give each game a random.Random of its own to make its draws independent of
+    everything else, and the same every time for the same seed. The game stops when the bag is empty, unless
+    endgame is set: then it is played out until a player goes out or both pass, and the racks left count against
+    the players holding them (see final_scores).
+    A game can go on from a position (state, board, passes), such as snapshot.load_scrabble gives, instead of
+    starting anew. pause, if given, is called with the position before every move; if it returns true, the game
+    stops there, without an 'end' event, and the scores so far are returned."""
     strategies = [A, B]
+    seconds = ([], [])
+    observers = list(observers) + [Printer()] if verbose else list(observers)
 
     # state = (p, (hand0, score0), (hand1, score1), bag)
-    (p, (hand0, score0), (hand1, score1), bag) = state = scrabble_setup()
-    board = make_board()
-    show_board(board)
-    while bag:
+    if position is None:
+        state, board, passes = scrabble_setup(rng), make_board(), 0
+    else:
+        state, board, passes = position
+    (p, (hand0, score0), (hand1, score1), bag) = state
+    if observers:
+        start = {'event': 'start', 'game': 'scrabble', 'players': [A.__name__, B.__name__], 'hands': [hand0, hand1]}
+        if position is not None:
+            start.update(board=board_rows(board), scores=[score0, score1], player=p)
+        notify(observers, start)
+    while (bag or endgame) and passes < 2 and hand0 and hand1:  # Two passes in a row: the game is stuck
+        if pause and pause((state, board, passes)):
+            return score0, score1, seconds
+        t = time.perf_counter()
         play = strategies[p](state[p + 1][0], board)
+        seconds[p].append(time.perf_counter() - t)
+        passes = 0 if play else passes + 1
+        drawn = ''
         if play:
-            print(play)
             if p == 0:
                 hand0 = make_play(play, board, hand0)
                 score0 += play[0]
-                hand0 = draw_tiles(bag, hand0)
+                leave, hand0 = hand0, draw_tiles(bag, hand0)
+                drawn = hand0[len(leave):]
             if p == 1:
                 hand1 = make_play(play, board, hand1)
                 score1 += play[0]
-                hand1 = draw_tiles(bag, hand1)
+                leave, hand1 = hand1, draw_tiles(bag, hand1)
+                drawn = hand1[len(leave):]
+        if observers:
+            notify(observers, {'event': 'move', 'player': p, 'play': play, 'drawn': drawn,
+                               'scores': [score0, score1]})
         p = 1 - p
-        show_board(board)
         state = (p, (hand0, score0), (hand1, score1), bag)
+    if endgame:
+        score0, score1 = final_scores((hand0, hand1), (score0, score1))
+    if observers:
+        end = {'event': 'end', 'scores': [score0, score1]}
+        if endgame:
+            end['racks'] = [hand0, hand1]
+        notify(observers, end)
+    return score0, score1, seconds
+
+
+def rack_value(rack):
+    "The points of the tiles on a rack."
+    return sum(POINTS[L] for L in rack)
+
+
+def final_scores(hands, scores):
+    """The scores at the end of a game played out: a player who has gone out gains the points on the other's rack,
+    which the other loses; if neither has, each loses the points on their own rack."""
+    values = [rack_value(hand) for hand in hands]
+    if not hands[0] or not hands[1]:
+        out = 0 if not hands[0] else 1
+        return [scores[p] + (values[1 - p] if p == out else -values[p]) for p in (0, 1)]
+    return [scores[p] - values[p] for p in (0, 1)]
+
+
+def notify(observers, event):
+    "Pass an event of a game to each of its observers."
+    for observer in observers:
+        observer(event)
+
+
+class Printer:
+    "An observer of a game (see play_game) that prints it: the board to start with, then each play and the board."
+
+    def __init__(self):
+        self.board = None
+
+    def __call__(self, event):
+        kind = event['event']
+        if kind == 'start':
+            self.board = Board(''.join(event['board'])) if 'board' in event else make_board()
+            show_board(self.board)
+        elif kind == 'move':
+            play = event['play']
+            if play:
+                print(play)
+                make_play(play, self.board, '')
+            show_board(self.board)
+
+
+def play_scrabble(A, B):
+    "Play strategy A (moving first) against strategy B, printing the game. Return the winner's name, or 'DRAW'."
+    score0, score1, _ = play_game(A, B)
     if score0 > score1:
         print(score1, score0)
         return A.__name__
@@ -368,14 +781,15 @@ def play_scrabble(A, B):
 
 
 def timedExec(f, *args):
-    import time
-    t = time.clock()
+    t = time.perf_counter()
     result = f(*args)
-    t0 = time.clock()
+    t0 = time.perf_counter()
     return t0 - t, result
 
 
 def playN(A, B, N=1000):
+    """Play N games one after another, alternating who moves first, and print the results.
+    (tournament.scrabble_tournament plays them in parallel.)"""
     time = 0
     d = {A.__name__: 0, B.__name__: 0, "DRAW": 0}
     for n in range(N):
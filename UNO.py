@@ -5,93 +5,155 @@ This does not incorporate all the complex rules of UNO, but does incorporate the
 '''
 
 import random
+import time
 
 '''
-    Takes two functions (representing player strategies) and plays a game of UNO using them. Pick A=player to play. 
+    Takes two functions (representing player strategies) and plays a game of UNO between them. Returns (winner, turns, seconds):
+    the index of the winner in [A, B], the number of turns played, and for each of A and B the seconds each of its decisions took.
+    Each of the observers is called with every event of the game (see gamelog.py); if verbose, a printer is one of them,
+    and prints every move. The deck is shuffled by rng (a random.Random, or the random module): with one of its own, seeded,
+    a game deals the same cards every time, whatever else is going on in the process.
+    A game can go on from a state (such as snapshot.load_uno gives) instead of starting anew; its turns are counted
+    from there. pause, if given, is called with the state before every turn; if it returns true, the game stops there,
+    without an 'end' event, and (None, turns, seconds) is returned.
 '''
-def play_uno(A ,B):
+def play_game(A, B, verbose=True, observers=(), rng=random, state=None, pause=None):
     players = [A, B]
+    seconds = ([], [])
+    turns = 0
+    observers = list(observers) + [printer()] if verbose else list(observers)
 
     # Unpack state
-    p, hand0, hand1, top_card, deck, pick = state = UNO_setup()
+    if state is None:
+        state = UNO_setup(rng)
+    p, hand0, hand1, top_card, deck, pick = state
+    hands = [hand0, hand1] if p == 0 else [hand1, hand0]  # By player: the lists in the state change in place
+    if observers:
+        notify(observers, {'event': 'start', 'game': 'uno', 'players': [A.__name__, B.__name__],
+                           'hands': [list(h) for h in hands], 'top': top_card, 'player': p})
 
     # Play until game ends
     while True:
+        if pause and pause(state):
+            return None, turns, seconds
 
         # Ask current player to pick a move
+        t = time.perf_counter()
         card = players[p](state)
+        seconds[p].append(time.perf_counter() - t)
+        turns += 1
+        sizes = [len(h) for h in hands]
 
         # If the player waits, update the state to reflect turn passing
         if card == 'wait':
-            print(players[p].__name__, 'waits')
             state = (1-p, hand1, hand0, top_card, deck, 0)
 
         # If the player picks, update the state accordingly
         elif card == 'pick':
-            print(players[p].__name__, 'picks')
-            state = draw(state)
+            state = draw(state, rng)
 
         # Otherwise, play the picked card.
         else:
-            print(players[p].__name__, 'played', convert_name(card))
-            state = play_card(card, state)
-
+            state = play_card(card, state, rng)
 
+        mover = p
         p, hand0, hand1, top_card, deck, pick = state
-        # Check if a player has to call UNO or has won! Note: Does not have functionality to catch someone before saying UNO due to synchronicity issues.
-        if len(hand0) == 1:
-            print(players[p].__name__, 'calls UNO')
-        if len(hand1) == 1:
-            print(players[1 -p].__name__, 'calls UNO')
-        if len(hand1) == 0:
-            return( players[1-p].__name__ , 'wins!')
-        if len(hand0) == 0:
-            return(players[p].__name__)
-
-def UNO_setup():
+        if observers:
+            # Cards are only ever drawn onto the end of a hand, and the mover draws only when picking.
+            drawn = [h[n:] if (q != mover or card == 'pick') else [] for (q, (h, n)) in enumerate(zip(hands, sizes))]
+            notify(observers, {'event': 'move', 'player': mover, 'move': card, 'drawn': drawn, 'top': top_card,
+                               'next': p, 'sizes': [len(h) for h in hands]})
+        # Check if a player has won! (The printer has players call UNO.)
+        if len(hand1) == 0 or len(hand0) == 0:
+            winner = 1 - p if len(hand1) == 0 else p
+            if observers:
+                notify(observers, {'event': 'end', 'winner': winner, 'turns': turns})
+            return winner, turns, seconds
+
+'''
+    Passes an event of a game to each of its observers.
+'''
+def notify(observers, event):
+    for observer in observers:
+        observer(event)
+
+'''
+    Makes an observer of a game that prints every move, and has players call UNO when they are down to one card.
+    Note: Does not have functionality to catch someone before saying UNO due to synchronicity issues.
+'''
+def printer():
+    names = []
+    def observe(event):
+        if event['event'] == 'start':
+            names[:] = event['players']
+        elif event['event'] == 'move':
+            name, card = names[event['player']], event['move']
+            if card == 'wait':
+                print(name, 'waits')
+            elif card == 'pick':
+                print(name, 'picks')
+            else:
+                print(name, 'played', convert_name(card))
+            p, sizes = event['next'], event['sizes']
+            if sizes[p] == 1:
+                print(names[p], 'calls UNO')
+            if sizes[1 - p] == 1:
+                print(names[1 - p], 'calls UNO')
+    return observe
+
+'''
+    Takes two functions (representing player strategies) and plays a game of UNO using them. Pick A=player to play.
+    Returns the name of the winner.
+'''
+def play_uno(A ,B):
+    winner, turns, seconds = play_game(A, B)
+    return [A, B][winner].__name__
+
+def UNO_setup(rng=random):
     # Sets up deck with one of each [color, face] and 4 Wilds and Draw Fours (represented as ?W and ?F internally).
+    # It is shuffled once, and cards are dealt from the end.
     deck = [color + card for color in 'RGBY' for card in '0123456789SRD123456789SRD'] + [color+card for card in 'WF' for color in '?'*4]
-    random.shuffle(deck)
+    rng.shuffle(deck)
 
     #Picks the first card, and deals cards to players. Defaults to starting with 5 cards, but can be modified by specifiying third parameter.
     top_card = start_card(deck)
-    hand0 = deal([], deck)
-    hand1 = deal([], deck)
+    hand0 = deal([], deck, rng=rng)
+    hand1 = deal([], deck, rng=rng)
 
     # Plays top card to get state
-    state = play_card(top_card, (0, hand0, hand1, '', deck, 0))
+    state = play_card(top_card, (0, hand0, hand1, '', deck, 0), rng)
     return(state)
 
 '''
-Deals num_cards to hand0 from deck.
+Deals num_cards to hand0 from the end of deck, shuffling a new deck with rng if it runs out.
 '''
-def deal(hand0, deck, num_cards=5):
+def deal(hand0, deck, num_cards=5, rng=random):
     for _ in range(num_cards):
-        # Resets deck if empty
+        # Refills the deck (the one in the state, in place) with a new one if it is empty
         if not deck:
-            deck = [color + card for color in 'RGBY' for card in '0123456789SRD123456789SRD'] + [color +card for card in 'WF' for color in '????']
-            random.shuffle(deck)
+            deck.extend([color + card for color in 'RGBY' for card in '0123456789SRD123456789SRD'] + [color +card for card in 'WF' for color in '????'])
+            rng.shuffle(deck)
 
         # Adds cards to hand
-        hand0.append(deck.pop(0))
+        hand0.append(deck.pop())
     return(hand0)
 
 '''
 Draws a card from the deck, sets as top card if it isn't wild or draw four
 '''
 def start_card(deck):
-    top_card = deck.pop(0)
+    top_card = deck.pop()
     if top_card[1] in "WF":
         return(start_card(deck))
     return top_card
 
-def draw(state):
+def draw(state, rng=random):
     p, hand0, hand1, top_card, deck, pick = state
     pick = 1
-    hand0 = deal(hand0, deck, 1)
+    hand0 = deal(hand0, deck, 1, rng)
     return (p, hand0, hand1, top_card, deck, pick)
 
-def play_card(card, state):
+def play_card(card, state, rng=random):
     p, hand0, hand1, top_card, deck, pick = state
     top_card = card
     # Plays card, if playable
@@ -109,10 +171,10 @@ def play_card(card, state):
         if (card[1] in 'RS'):
             return((p, hand0, hand1, top_card, deck, 0))
         elif(card[1] == 'D'):
-            hand1 = deal(hand1, deck, 2)
+            hand1 = deal(hand1, deck, 2, rng)
             return((1-p, hand1, hand0, top_card, deck, 0))
         elif(card[1] in 'WF'):
-            if card[1] =="F": hand1 = deal(hand1, deck, 4)
+            if card[1] =="F": hand1 = deal(hand1, deck, 4, rng)
             top_card = card[0] + '?'
             return ((1-p, hand1, hand0, top_card, deck, 0))
     # Play number cards
@@ -132,9 +194,9 @@ def clueless(state):
     if (moves == 'pick' or moves == 'wait'):
         return moves
 
-    # If there are moves, pick and play a random move
+    # If there are moves, pick and play a random move (sorted, so that a seeded game doesn't depend on set order)
     if moves != set():
-        card = random.choice(list(moves))
+        card = random.choice(sorted(moves))
         # If move is a wild or draw four, pick a random color
         if card[0] == '?':
             return 'RYBG'[random.randint(0, 3)]+card[1]
@@ -149,7 +211,7 @@ def clueless2(state):
     if moves == 'pick' or moves == 'wait':
         return(moves)
     if moves != set():
-        card = random.choice(list(moves))
+        card = random.choice(sorted(moves))
         if card[0] == '?':
             return('RYBG'[random.randint(0 ,3) ]+card[1])
     return card
@@ -192,53 +254,46 @@ def convert_name(card):
     return(color+face)
 
 '''
-    Finds all playable cards
+    Finds the set of playable cards: each wild, and each card of the top card's color or face, once.
 '''
 def check_cards(hand, top_card):
-    playable = []
-    for card in hand:
-        if card[1] in 'WF':
-            playable.append(card)
-        if card[0] == top_card[0]:
-            playable.append(card)
-        elif card[1] == top_card[1]:
-            playable.append(card)
-    return playable
+    color, face = top_card
+    return {card for card in hand if card[1] in 'WF' or card[0] == color or card[1] == face}
 
 '''
-    Takes a state, finds playable cards, returns them if there are any, or returns 'pick' or 'wait'
+    Takes a state, finds playable cards, returns them if there are any, or returns 'pick' or 'wait'.
+    (uno_engine finds them without going through the hand, and plays by fuller rules.)
 '''
 def legal_moves(state):
     p, hand0, hand1, top_card, deck, pick = state
     cards_playable = check_cards(hand0, top_card)
     if cards_playable:
-        return set(cards_playable)
+        return cards_playable
     else:
         return('pick' if not pick else 'wait')
 
 
-# The following function test the speedo f the program
-# def timedExec(f, *args):
-#     import time
-#     t = time.clock()
-#     result = f(*args)
-#     t0 = time.clock()
-#     return t0 - t, result
-#
-# def playN(A ,B, N=1000):
-#     time = 0
-#     d = {A.__name__ :0, B.__name__ :0}
-#     for n in range(N):
-#         if n % 2:
-#             time1, results =  timedExec(play_uno, A, B)
-#             d[results] +=1
-#             time += time1
-#         else:
-#             time1, results =  timedExec(play_uno, B, A)
-#             d[results] +=1
-#             time += time1
-#         print(results)
-#     print(d, time / float(N))
+# The following functions test the speed of the program. (tournament.uno_tournament plays games in parallel.)
+def timedExec(f, *args):
+    t = time.perf_counter()
+    result = f(*args)
+    t0 = time.perf_counter()
+    return t0 - t, result
+
+def playN(A ,B, N=1000):
+    time = 0
+    d = {A.__name__ :0, B.__name__ :0}
+    for n in range(N):
+        if n % 2:
+            time1, results =  timedExec(play_uno, A, B)
+            d[results] +=1
+            time += time1
+        else:
+            time1, results =  timedExec(play_uno, B, A)
+            d[results] +=1
+            time += time1
+        print(results)
+    print(d, time / float(N))
 
 
 def main():
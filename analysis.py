@@ -0,0 +1,195 @@
+'''
+Batch analysis of Scrabble positions: the best plays for each of a stream of (board, rack) positions.
+
+    for (i, plays) in analysis.analyze_positions(positions, top=3):
+        ...
+
+Nothing is changed by analysis: move generation reads the Board (see Scrabble.all_plays) and never writes to it, so
+the same board can be given in any number of positions, and is still good to play on afterwards. Positions that
+are the same (the same letters on the board, the same tiles in the rack in any order) are analyzed once, and their
+result given for each of them, as long as the first is being analyzed or among the REMEMBER most recently used
+results (kept in an LRU); a duplicate that comes later than that is analyzed again.
+
+Positions are sent out in batches to a pool of worker processes, which share the lexicon (it is mapped from the
+same file) and keep their own caches of line plays warm from batch to batch; a batch of positions on the same
+Board object pickles the board once. Results are generated as batches finish, so not in the order of the
+positions: each comes with the index of its position. Only a few batches per worker are read ahead, and only
+REMEMBER results are kept, so positions can come from a generator too long to hold in memory.
+
+The result for a position is its top plays, best first, as (score, pos, dir, word) tuples; the first is the one
+best_play would make. With scores_only it is only their scores. A number of top plays is found by Scrabble.top_plays,
+which cuts off the plays that can't make it; all of the plays (top=None) are scored a line at a time, and with
+scores_only without a tuple being made for every one of them.
+
+    python analysis.py games.jsonl --top 3
+'''
+
+import argparse
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+
+import Scrabble
+import gamelog
+import tournament
+
+BATCH = 16  # Positions per task sent to a worker
+AHEAD = 4  # Tasks in flight per worker
+REMEMBER = 1024  # Results kept for duplicate positions
+
+
+def plays(hand, board):
+    "Generate all the plays of hand on board, as all_plays finds them, without collecting them in a set."
+    rack = ''.join(sorted(hand))
+    for direction in (Scrabble.ACROSS, Scrabble.DOWN):
+        squares, checks, cross_sums = board.squares(direction), board.checks[direction], board.cross_sums[direction]
+        letter_mult, word_mult = Scrabble.MULTIPLIERS[direction]
+        for k in range(1, Scrabble.SIZE - 1):
+            row = k * Scrabble.SIZE
+            found = Scrabble.line_plays(rack, bytes(squares[row:row + Scrabble.SIZE]),
+                                        tuple(checks[row:row + Scrabble.SIZE]))
+            if found:
+                scores = Scrabble.line_scores(squares, letter_mult, word_mult, cross_sums,
+                                              [(row + n, word) for (n, word) in found])
+                for ((n, word), score) in zip(found, scores):
+                    yield (score, (n, k) if direction == Scrabble.ACROSS else (k, n), direction, word)
+
+
+def scores(hand, board):
+    "Generate the scores of all the plays of hand on board, without making the plays."
+    rack = ''.join(sorted(hand))
+    for direction in (Scrabble.ACROSS, Scrabble.DOWN):
+        squares, checks, cross_sums = board.squares(direction), board.checks[direction], board.cross_sums[direction]
+        letter_mult, word_mult = Scrabble.MULTIPLIERS[direction]
+        for k in range(1, Scrabble.SIZE - 1):
+            row = k * Scrabble.SIZE
+            found = Scrabble.line_plays(rack, bytes(squares[row:row + Scrabble.SIZE]),
+                                        tuple(checks[row:row + Scrabble.SIZE]))
+            if found:
+                yield from Scrabble.line_scores(squares, letter_mult, word_mult, cross_sums,
+                                                [(row + n, word) for (n, word) in found])
+
+
+def top_plays(hand, board, top=None):
+    "The top plays (all of them if top is None), best first."
+    return sorted(plays(hand, board), reverse=True) if top is None else Scrabble.top_plays(hand, board, top)
+
+
+def top_scores(hand, board, top=None):
+    "The scores of the top plays (all of them if top is None), best first."
+    if top is None:
+        return sorted(scores(hand, board), reverse=True)
+    return [play[0] for play in Scrabble.top_plays(hand, board, top)]
+
+
+def position_key(board, rack):
+    "What a position's plays depend on: the letters on the board and the tiles in the rack."
+    return (bytes(board.letters), ''.join(sorted(rack)))
+
+
+def analyze(task):
+    "Analyze a batch of positions: task is (positions, top, scores_only); return the list of their results."
+    positions, top, scores_only = task
+    analyze_one = top_scores if scores_only else top_plays
+    return [analyze_one(rack, board, top) for (board, rack) in positions]
+
+
+def analyze_positions(positions, top=1, scores_only=False, workers=None, batch=BATCH):
+    """Generate (i, result) for each of positions, an iterable of (board, rack) pairs, in the order the results
+    are ready; i is the index of the position. A result is the position's top plays, best first (all of its plays
+    if top is None), or only their scores if scores_only. Positions are analyzed by a pool of worker processes
+    (all cores by default), or in this process if workers is 1. The results of the REMEMBER positions most recently
+    seen are kept, for duplicates."""
+    workers = workers or os.cpu_count()
+    pool = ProcessPoolExecutor(workers, initializer=tournament.start_worker) if workers > 1 else None
+    done = OrderedDict()  # {key: result} for the positions analyzed most recently, least recently seen first
+    waiting = {}  # {key: [i, ...]} for the positions being analyzed, and their duplicates
+    tasks = {}  # {future: keys of its positions}
+    queued, keys = [], []
+    source = enumerate(positions)
+
+    def submit():
+        task = (queued[:], top, scores_only)
+        if pool:
+            future = pool.submit(analyze, task)
+        else:
+            future = Future()
+            future.set_result(analyze(task))
+        tasks[future] = keys[:]
+        queued.clear()
+        keys.clear()
+
+    try:
+        while True:
+            while len(tasks) < AHEAD * workers and source:
+                for (i, (board, rack)) in source:
+                    key = position_key(board, rack)
+                    if key in done:
+                        done.move_to_end(key)
+                        yield (i, done[key])
+                    elif key in waiting:
+                        waiting[key].append(i)
+                    else:
+                        waiting[key] = [i]
+                        queued.append((board, rack))
+                        keys.append(key)
+                        if len(queued) == batch:
+                            break
+                else:
+                    source = None
+                if queued:
+                    submit()
+            if not tasks:
+                return
+            finished, _ = wait(tasks, return_when=FIRST_COMPLETED)
+            for future in finished:
+                for (key, result) in zip(tasks.pop(future), future.result()):
+                    done[key] = result
+                    if len(done) > REMEMBER:
+                        done.popitem(last=False)
+                    for i in waiting.pop(key):
+                        yield (i, result)
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+
+
+def logged_positions(filename):
+    "Generate (game, move, board, rack, play) for every move in the Scrabble games of a log, before it was made."
+    for (g, events) in enumerate(gamelog.read_games(filename)):
+        if events[0]['game'] != 'scrabble':
+            continue
+        position = gamelog.ScrabblePosition()
+        for event in events:
+            if event['event'] == 'move':
+                p = event['player']
+                yield (g, position.moves, position.board.copy(), position.hands[p], gamelog.as_play(event['play']))
+            position(event)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Find the best plays in every position of logged Scrabble games.')
+    parser.add_argument('log', help='a log of games (see gamelog.py)')
+    parser.add_argument('--top', type=int, default=1, help='how many plays to give for each position')
+    parser.add_argument('--scores-only', action='store_true', help='give only the scores of the top plays')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--quiet', action='store_true', help='print only the totals')
+    args = parser.parse_args(argv)
+    moves = list(logged_positions(args.log))
+    t = time.perf_counter()
+    results = analyze_positions(((board, rack) for (_, _, board, rack, _) in moves), args.top, args.scores_only,
+                                args.workers)
+    for (i, result) in sorted(results):
+        g, m, _, rack, play = moves[i]
+        if not args.quiet:
+            print(json.dumps({'game': g, 'move': m, 'rack': rack, 'played': play, 'top': result}))
+    seconds = time.perf_counter() - t
+    unique = len({position_key(board, rack) for (_, _, board, rack, _) in moves})
+    print('{} positions ({} different) in {:.2f}s: {:.0f} positions/s'.format(
+        len(moves), unique, seconds, len(moves) / seconds if seconds else 0))
+
+
+if __name__ == '__main__':
+    main()
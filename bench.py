@@ -0,0 +1,309 @@
+'''
+Benchmarks for the word games.
+
+    python bench.py                     run the suite, and compare it with the baseline (bench_baseline.json)
+    python bench.py suite --save        run the suite, and save it as the new baseline
+    python bench.py lexicon             compare the DAWG with the word and prefix sets
+    python bench.py blanks              compare racks with blanks against racks without
+
+The suite times the hot paths of both games on fixed positions, racks and seeds: loading the word list, find_prefixes,
+row_plays, all_plays, calculate_score, and whole games of Scrabble (best_strat against itself) and of UNO (clueless
+against clueless2, as UNO.py and as uno_engine plays them). Each case reports operations per second (best of a few
+runs of at least --seconds each) and the peak memory one operation allocates (under tracemalloc, in a separate run).
+Against a baseline, a case more than --tolerance slower is flagged, and the command exits with status 1.
+Move generation caches its line plays (see Scrabble.line_plays); the cases clear the caches before every operation,
+so they measure the search itself.
+
+lexicon compares the DAWG lexicon against the original WORDS/PREFIXES sets: memory held, build (or load) time, and
+all_plays throughput. The sets are wrapped in SetLexicon so the very same move generator runs on both.
+
+blanks compares all_plays for racks with two blanks against the same racks without them. A rack with blanks has
+many times more legal plays (every word it makes, with the blanks on each letter they can stand for), so the fair
+measure of the cost of blanks is the time per play generated.
+'''
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import lexicon
+import Scrabble
+import UNO
+import uno_engine
+from lexicon import Lexicon, mask_letters
+
+
+class SetLexicon:
+    """The lexicon interface over a pair of sets of words and prefixes. A node is the prefix itself, so following
+    an edge concatenates and hashes a string, the way the generator worked before the DAWG. (Prefixes carry a
+    leading '^' so that the root is a non-empty, truthy string; the dead node is ''. The sets have no cheap way to list
+    the edges out of a node, so edges tries all 26 letters.)"""
+    root = '^'
+
+    def __init__(self, words, prefixes):
+        self.words = set('^' + w for w in words)
+        self.prefixes = set('^' + p for p in prefixes)
+
+    def child(self, node, L):
+        pre = node + L
+        return pre if (pre in self.prefixes or pre in self.words) else ''
+
+    def edges(self, node):
+        return sum(1 << n for n in range(26) if self.child(node, chr(65 + n)))
+
+    def letters(self, node):
+        return mask_letters(self.edges(node))
+
+    def is_word(self, node):
+        return node in self.words
+
+    def walk(self, letters, node=None):
+        if node is None: node = self.root
+        for L in letters:
+            node = self.child(node, L)
+            if not node:
+                return ''
+        return node
+
+    def __contains__(self, word):
+        return ('^' + word) in self.words
+
+
+def measure(f, *args):
+    """Call f(*args) twice, once timed and once with tracemalloc on (which slows it down).
+    Return (result, seconds, bytes still allocated, peak bytes allocated)."""
+    result, seconds = timed(f, *args)
+    del result
+    tracemalloc.start()
+    result = f(*args)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, current, peak
+
+
+def timed(f, *args):
+    "Call f(*args); return (result, seconds)."
+    t = time.perf_counter()
+    result = f(*args)
+    return result, time.perf_counter() - t
+
+
+def sample_board():
+    "A fixed mid-game position."
+    board = Scrabble.make_board()
+    for play in [(0, (5, 8), Scrabble.ACROSS, 'HATES'), (0, (7, 5), Scrabble.DOWN, 'QUOTE'),
+                 (0, (9, 4), Scrabble.DOWN, 'JOKES'), (0, (4, 10), Scrabble.ACROSS, 'VERDANT')]:
+        Scrabble.make_play(play, board, '')
+    return board
+
+
+HANDS = ['EARSTLN', 'QUIZEDA', 'AEIOUST', 'BCDFGHM', 'RETAINS']
+
+
+def all_plays_rate(lexicon, board, repeat=3):
+    "all_plays calls per second over HANDS with the given lexicon installed; return (calls/second, set of plays)."
+    saved, Scrabble.LEXICON = Scrabble.LEXICON, lexicon
+    try:
+        plays, total = set(), 0.0
+        for _ in range(repeat):
+            for hand in HANDS:
+                Scrabble.clear_caches()  # Don't let cached plays carry over between lexicons
+                result, seconds = timed(Scrabble.all_plays, hand, board)
+                plays |= set((hand,) + play for play in result)
+                total += seconds
+        return len(HANDS) * repeat / total, plays
+    finally:
+        Scrabble.LEXICON = saved
+
+
+def bench_lexicon(filename='words.txt'):
+    "Compare the WORDS/PREFIXES sets with the DAWG lexicon."
+    (words, prefixes), set_seconds, set_bytes, set_peak = measure(Scrabble.readwordlist, filename)
+    dawg, dawg_seconds, dawg_bytes, dawg_peak = measure(Lexicon.from_file, filename)
+    lexicon.compile_lexicon(filename)
+    _, mapped_seconds, mapped_bytes, mapped_peak = measure(lexicon.load, filename)
+    print('{:<10}{:>10}{:>14}{:>14}'.format('lexicon', 'build s', 'held MB', 'peak MB'))
+    for (name, seconds, held, peak) in [('sets', set_seconds, set_bytes, set_peak),
+                                        ('dawg', dawg_seconds, dawg_bytes, dawg_peak),
+                                        ('mapped', mapped_seconds, mapped_bytes, mapped_peak)]:
+        print('{:<10}{:>10.3f}{:>14.1f}{:>14.1f}'.format(name, seconds, held / 1e6, peak / 1e6))
+    print('dawg: {} words, {} nodes, {} edges, {:.2f} MB of arrays'.format(
+        len(dawg), len(dawg.masks), len(dawg.children), dawg.nbytes() / 1e6))
+
+    board = sample_board()
+    set_rate, set_plays = all_plays_rate(SetLexicon(words, prefixes), board)
+    dawg_rate, dawg_plays = all_plays_rate(dawg, board)
+    assert set_plays == dawg_plays, 'the two lexicons generate different plays'
+    print('all_plays: sets {:.1f} calls/s, dawg {:.1f} calls/s ({:.2f}x), {} distinct plays'.format(
+        set_rate, dawg_rate, dawg_rate / set_rate, len(dawg_plays)))
+
+
+def bench_blanks(repeat=3):
+    "Compare all_plays on HANDS with their last two letters replaced by blanks, and without."
+    board = sample_board()
+    Scrabble.LEXICON.masks  # Load it before timing
+    print('{:<10}{:>8}{:>10}{:>12}{:>10}{:>10}{:>12}{:>10}'.format(
+        'hand', 'plays', 'ms', 'us/play', 'blanks', 'plays', 'ms', 'us/play'))
+    totals = [[0, 0.0], [0, 0.0]]
+    for hand in HANDS:
+        row = []
+        for (n, rack) in enumerate((hand, hand[:5] + '__')):
+            best = float('inf')
+            for _ in range(repeat):
+                Scrabble.clear_caches()
+                plays, seconds = timed(Scrabble.all_plays, rack, board)
+                best = min(best, seconds)
+            totals[n][0] += len(plays)
+            totals[n][1] += best
+            row += [rack, len(plays), 1000 * best, 1e6 * best / max(1, len(plays))]
+        print('{:<10}{:>8}{:>10.1f}{:>12.1f}{:>10}{:>10}{:>12.1f}{:>10.1f}'.format(*row))
+    (plain, plain_seconds), (blank, blank_seconds) = totals
+    print('two blanks: {:.1f}x the plays in {:.1f}x the time, {:.2f}x the time per play'.format(
+        blank / plain, blank_seconds / plain_seconds, (blank_seconds / blank) / (plain_seconds / plain)))
+
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+RACKS = HANDS + ['EARST__']  # The suite's racks: HANDS, and one with both blanks
+
+
+def lines(board):
+    "The (squares, checks, k) of every line of a board, in both directions."
+    return [(board.squares(d), board.checks[d], k) for d in (Scrabble.ACROSS, Scrabble.DOWN)
+            for k in range(1, Scrabble.SIZE - 1)]
+
+
+def suite_cases():
+    """The cases of the suite: a dict of {name: (operation, units)}, where operation is a function of no arguments
+    and units is how many of the things a case counts one call of it does (racks, lines, plays or games)."""
+    board = sample_board()
+    Scrabble.LEXICON.masks  # Load it before timing
+    board_lines = lines(board)
+    plays = [(play, rack) for rack in RACKS for play in Scrabble.all_plays(rack, board)]
+
+    def find_prefixes():
+        for rack in RACKS:
+            Scrabble.find_prefixes(rack)
+
+    def row_plays():
+        for rack in HANDS:
+            Scrabble.clear_caches()
+            for (squares, checks, k) in board_lines:
+                Scrabble.row_plays(rack, squares, checks, k)
+
+    def all_plays():
+        for rack in RACKS:
+            Scrabble.clear_caches()
+            Scrabble.all_plays(rack, board)
+
+    def calculate_score():
+        for ((score, pos, direction, word), rack) in plays:
+            Scrabble.calculate_score(board, pos, direction, rack, word)
+
+    def scrabble_game():
+        random.seed(1)
+        Scrabble.clear_caches()
+        Scrabble.play_game(Scrabble.best_strat, Scrabble.best_strat, verbose=False)
+
+    def uno_games():
+        random.seed(1)
+        for _ in range(100):
+            UNO.play_game(UNO.clueless, UNO.clueless2, verbose=False)
+
+    def uno_engine_games():
+        uno_engine.simulate(uno_engine.random_play, uno_engine.random_play, 1000, seed=1)
+
+    return {'readwordlist': (lambda: Scrabble.readwordlist(Scrabble.WORDLIST), 1),
+            'lexicon_load': (lambda: lexicon.load(Scrabble.WORDLIST), 1),
+            'find_prefixes': (find_prefixes, len(RACKS)),
+            'row_plays': (row_plays, len(HANDS) * len(board_lines)),
+            'all_plays': (all_plays, len(RACKS)),
+            'calculate_score': (calculate_score, len(plays)),
+            'scrabble_game': (scrabble_game, 1),
+            'uno_game': (uno_games, 100),
+            'uno_engine_game': (uno_engine_games, 1000)}
+
+
+def run_case(operation, units, seconds=1.0, repeat=3):
+    """Time operation: return (units per second, as the best of repeat runs of at least seconds each,
+    and the peak bytes allocated by one call)."""
+    best = 0.0
+    for _ in range(repeat):
+        n, t = 0, time.perf_counter()
+        while True:
+            operation()
+            n += 1
+            elapsed = time.perf_counter() - t
+            if elapsed >= seconds:
+                break
+        best = max(best, n * units / elapsed)
+    tracemalloc.start()
+    operation()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def run_suite(names=None, seconds=1.0, repeat=3):
+    "Run the cases of the suite (or those in names); return the results as a dict that can be saved as JSON."
+    results = {}
+    for (name, (operation, units)) in suite_cases().items():
+        if names and name not in names:
+            continue
+        rate, peak = run_case(operation, units, seconds, repeat)
+        results[name] = {'ops_per_second': rate, 'peak_bytes': peak}
+    return {'python': platform.python_version(), 'machine': platform.machine(), 'cpus': os.cpu_count(),
+            'cases': results}
+
+
+def compare(results, baseline, tolerance=0.2):
+    "Print the results beside the baseline (if any). Return the names of the cases more than tolerance slower."
+    slower = []
+    base = baseline['cases'] if baseline else {}
+    print('{:<18}{:>14}{:>12}{:>16}{:>10}'.format('case', 'ops/s', 'peak MB', 'baseline ops/s', 'ratio'))
+    for (name, r) in results['cases'].items():
+        line = '{:<18}{:>14.1f}{:>12.2f}'.format(name, r['ops_per_second'], r['peak_bytes'] / 1e6)
+        if name in base:
+            ratio = r['ops_per_second'] / base[name]['ops_per_second']
+            line += '{:>16.1f}{:>10.2f}'.format(base[name]['ops_per_second'], ratio)
+            if ratio < 1 - tolerance:
+                line += '  SLOWER'
+                slower.append(name)
+        print(line)
+    return slower
+
+
+def bench_suite(argv=None):
+    "Run the suite from the command line arguments in argv; return 1 if a case is slower than the baseline, else 0."
+    parser = argparse.ArgumentParser(prog='bench.py suite', description='Run the benchmark suite.')
+    parser.add_argument('cases', nargs='*', help='cases to run (default: all)')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline file to compare with (or save to)')
+    parser.add_argument('--save', action='store_true', help='save the results as the baseline')
+    parser.add_argument('--seconds', type=float, default=1.0, help='minimum seconds per timed run')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='slowdown that counts as a regression')
+    args = parser.parse_args(argv)
+    results = run_suite(args.cases, args.seconds, args.repeat)
+    baseline = None
+    if not args.save and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    slower = compare(results, baseline, args.tolerance)
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=1)
+        print('saved', args.baseline)
+    return 1 if slower else 0
+
+
+BENCHMARKS = {'suite': bench_suite, 'lexicon': bench_lexicon, 'blanks': bench_blanks}
+
+if __name__ == '__main__':
+    if sys.argv[1:2] in (['lexicon'], ['blanks']):
+        BENCHMARKS[sys.argv[1]]()
+    else:
+        sys.exit(bench_suite(sys.argv[2:] if sys.argv[1:2] == ['suite'] else sys.argv[1:]))
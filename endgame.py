@@ -0,0 +1,235 @@
+'''
+The Scrabble endgame: once the bag is empty, each player knows the other's rack (it is the tiles not yet seen),
+and the rest of the game can be searched exactly.
+
+A position is the board, both racks, the player to move and whether the last move was a pass. Its value is the
+spread the player to move can make from there on, with best play by both: the points of their plays less the
+opponent's, counting the end of the game as Scrabble.final_scores does (a player who goes out gains twice the
+points on the other rack, relative to the other; when both pass in a row, each loses their own rack's points).
+
+Solver searches it by negamax with alpha-beta pruning, trying plays in order of score (after the best play found
+for the position before, if any), and passing last. Positions are hashed by Zobrist keys: a random 64-bit number
+for each letter on each square, for each tile in each player's rack, and for the player to move and a pass, XORed
+together; so a play changes the key by XORing in its new tiles. A transposition table of 2 ** tt_bits slots
+(each the latest position to hash there: its key, the depth searched, its value or bound, the best play, and
+whether the search reached the depth limit) bounds the memory used, however long the search. A value that didn't
+reach the limit holds at any depth; one that did only at the depth it was searched to, and a search that uses it
+has reached the limit too. Iterative deepening searches 1, 2, 3, ... moves ahead until the
+time is up or the whole game tree has been searched (the result is then exact), and plays the best move of the
+deepest search that finished. Positions at the depth limit count as a spread of 0 from there on.
+
+endgame_strat is a Scrabble strategy that plays best_play while there are tiles in the bag, and the solver's play
+after; use it with play_game(..., endgame=True), which plays the endgame out.
+
+    python endgame.py --seed 3 --seconds 10
+'''
+
+import argparse
+import random
+import time
+
+import Scrabble
+import simulation
+import tournament
+
+SECONDS = 5.0  # Time limit of a search
+TT_BITS = 16  # The transposition table has 2 ** TT_BITS slots
+EXACT, LOWER, UPPER = 0, 1, 2  # What a value in the transposition table is: the value, or a bound on it
+
+KEYS = random.Random(20240601)  # Fixed, so keys are the same from run to run
+SQUARE_KEYS = [[KEYS.getrandbits(64) for _ in range(128)] for _ in range(Scrabble.SIZE * Scrabble.SIZE)]
+RACK_KEYS = [{L: [KEYS.getrandbits(64) for _ in range(8)] for L in Scrabble.LETTERS + '_'} for p in (0, 1)]
+TO_MOVE_KEY, PASSED_KEY = KEYS.getrandbits(64), KEYS.getrandbits(64)
+
+
+class TimeUp(Exception):
+    "The search has run out of time."
+
+
+def board_key(board):
+    "The Zobrist key of the letters on a board."
+    key = 0
+    for (x, sq) in enumerate(board.letters):
+        if sq > Scrabble.BORDER:
+            key ^= SQUARE_KEYS[x][sq]
+    return key
+
+
+def rack_key(p, rack):
+    "The Zobrist key of player p's rack: the nth copy of a tile has a key of its own."
+    key, keys = 0, RACK_KEYS[p]
+    for L in set(rack):
+        for n in range(rack.count(L)):
+            key ^= keys[L][n]
+    return key
+
+
+def play_key(play, board):
+    "What the key of a board changes by when play is made on it: its new tiles. (Call before making it.)"
+    (score, (i, j), (di, dj), word) = play
+    x, step, letters, key = j * Scrabble.SIZE + i, dj * Scrabble.SIZE + di, board.letters, 0
+    for (n, L) in enumerate(word):
+        if letters[x + n * step] == Scrabble.EMPTY:
+            key ^= SQUARE_KEYS[x + n * step][ord(L)]
+    return key
+
+
+class Solver:
+    """An endgame search, with its transposition table and counts: nodes searched, table probes and hits, and
+    cutoffs. A solver can be used for many searches; its table is kept from one to the next."""
+
+    def __init__(self, seconds=SECONDS, tt_bits=TT_BITS):
+        self.seconds, self.mask = seconds, (1 << tt_bits) - 1
+        self.table = [None] * (1 << tt_bits)
+        self.nodes = self.probes = self.hits = self.cutoffs = 0
+        self.deadline, self.horizon = None, False
+
+    def solve(self, board, racks, p=0, passed=False, max_depth=None):
+        """Search the endgame with player p to move. Return (play, value, depth, exact): the best play (None to pass),
+        the spread it makes from here on, the depth (in moves) of the deepest search that finished, and whether
+        that search was exact (it saw the end of every line of play)."""
+        start = time.perf_counter()
+        self.deadline = start + self.seconds
+        key = board_key(board)
+        best, depth = (None, 0, 0, False), 1
+        try:
+            while max_depth is None or depth <= max_depth:
+                self.horizon = False
+                value, play = self.search(board, list(racks), p, passed, depth, -10 ** 6, 10 ** 6, key)
+                best = (play, value, depth, not self.horizon)
+                if not self.horizon:
+                    break  # Searching deeper would find nothing more
+                depth += 1
+        except TimeUp:
+            pass
+        self.seconds_used = time.perf_counter() - start
+        return best
+
+    def search(self, board, racks, p, passed, depth, alpha, beta, key):
+        "The negamax value of the position, searched depth moves ahead, within (alpha, beta); and its best play."
+        self.nodes += 1
+        if not self.nodes & 255 and time.perf_counter() > self.deadline:
+            raise TimeUp()
+        if depth == 0:
+            self.horizon = True
+            return 0, None
+        outer_horizon, self.horizon = self.horizon, False  # Whether this position's value reaches the horizon
+        rack, other = racks[p], racks[1 - p]
+        position = key ^ rack_key(0, racks[0]) ^ rack_key(1, racks[1]) ^ (TO_MOVE_KEY if p else 0) ^ \
+            (PASSED_KEY if passed else 0)
+        slot = position & self.mask
+        entry = self.table[slot]
+        self.probes += 1
+        hint = None
+        if entry is not None and entry[0] == position:
+            self.hits += 1
+            _, stored_depth, value, kind, hint, horizon = entry
+            if stored_depth >= depth or not horizon:
+                if kind == EXACT or kind == LOWER and value >= beta or kind == UPPER and value <= alpha:
+                    self.horizon = outer_horizon or horizon
+                    return value, hint
+        plays = sorted(Scrabble.all_plays(rack, board), reverse=True)
+        if hint is not None and hint in plays:
+            plays.remove(hint)
+            plays.insert(0, hint)
+        plays.append(None)  # Passing is always allowed
+        start_alpha, best_value, best_play = alpha, -10 ** 6, None
+        for play in plays:
+            if play is None:
+                if passed:  # Both have passed: the game is over
+                    value = Scrabble.rack_value(other) - Scrabble.rack_value(rack)
+                else:
+                    value = -self.search(board, racks, 1 - p, True, depth - 1, -beta, -alpha, key)[0]
+            elif depth == 1:  # The last move before the horizon need not be made, only scored
+                if len(Scrabble.tiles_played(play, board)) == len(rack):
+                    value = play[0] + 2 * Scrabble.rack_value(other)
+                else:
+                    value, self.horizon = play[0], True
+            else:
+                child_key = key ^ play_key(play, board)
+                child = board.copy()
+                leave = Scrabble.make_play(play, child, rack)
+                if not leave:  # Out: the other rack counts for the player going out, and against its holder
+                    value = play[0] + 2 * Scrabble.rack_value(other)
+                else:
+                    racks[p] = leave
+                    value = play[0] - self.search(child, racks, 1 - p, False, depth - 1, -beta, -alpha, child_key)[0]
+                    racks[p] = rack
+            if value > best_value:
+                best_value, best_play = value, play
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        self.cutoffs += 1
+                        break
+        kind = UPPER if best_value <= start_alpha else LOWER if best_value >= beta else EXACT
+        self.table[slot] = (position, depth, best_value, kind, best_play, self.horizon)
+        self.horizon = outer_horizon or self.horizon
+        return best_value, best_play
+
+    def stats(self):
+        "Counts of the searches so far, and rates."
+        seconds = getattr(self, 'seconds_used', 0)
+        return {'nodes': self.nodes, 'nodes_per_second': self.nodes / seconds if seconds else 0.0,
+                'tt_probes': self.probes, 'tt_hits': self.hits,
+                'tt_hit_rate': self.hits / self.probes if self.probes else 0.0, 'cutoffs': self.cutoffs,
+                'tt_used': sum(entry is not None for entry in self.table), 'tt_slots': len(self.table)}
+
+
+def opponent_rack(hand, board):
+    "The opponent's rack, if the bag is empty (it is then all the tiles not seen); else None."
+    unseen = simulation.unseen_tiles(hand, board)
+    return ''.join(unseen) if len(unseen) <= 7 else None
+
+
+def endgame_strat(hand, board):
+    "best_play while there are tiles in the bag; after that, the endgame solver's play (within SECONDS)."
+    other = opponent_rack(hand, board)
+    if other is None:
+        return Scrabble.best_play(hand, board)
+    return Solver(SECONDS).solve(board, (hand, other))[0]
+
+
+def endgame_position(seed):
+    """Play greedy (best_play) self-play from a seed until the bag is empty. Return (board, racks, p, scores): the
+    position, with player p to move. (None if the game got stuck first.)"""
+    (p, (hand0, _), (hand1, _), bag) = Scrabble.scrabble_setup(random.Random(seed))
+    board, racks, scores, passes = Scrabble.make_board(), [hand0, hand1], [0, 0], 0
+    while bag and passes < 2:
+        play = Scrabble.best_play(racks[p], board)
+        passes = 0 if play else passes + 1
+        if play:
+            scores[p] += play[0]
+            racks[p] = Scrabble.draw_tiles(bag, Scrabble.make_play(play, board, racks[p]))
+        p = 1 - p
+    return (board, racks, p, scores) if not bag else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solve the endgame of a game of greedy self-play.')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the game')
+    parser.add_argument('--seconds', type=float, default=SECONDS)
+    parser.add_argument('--tt-bits', type=int, default=TT_BITS)
+    parser.add_argument('--depth', type=int, default=None, help='search no deeper than this')
+    args = parser.parse_args(argv)
+    tournament.start_worker()
+    position = endgame_position(args.seed)
+    if position is None:
+        raise SystemExit('game {} got stuck before the bag was empty'.format(args.seed))
+    board, racks, p, scores = position
+    Scrabble.show_board(board)
+    print('player {} to move; racks {} and {}; scores {}'.format(p, racks[0], racks[1], scores))
+    solver = Solver(args.seconds, args.tt_bits)
+    play, value, depth, exact = solver.solve(board, racks, p, max_depth=args.depth)
+    stats = solver.stats()
+    print('best play {} for a spread of {:+d} from here ({} search, {} moves deep) in {:.2f}s'.format(
+        play, value, 'exact' if exact else 'depth-limited', depth, solver.seconds_used))
+    print('{nodes} nodes, {nodes_per_second:.0f} nodes/s, {cutoffs} cutoffs; transposition table: {tt_probes} probes, '
+          '{tt_hits} hits ({tt_hit_rate:.1%}), {tt_used} of {tt_slots} slots used'.format(**stats))
+    greedy = Scrabble.best_play(racks[p], board)
+    print('greedy play {}'.format(greedy))
+    return solver
+
+
+if __name__ == '__main__':
+    main()
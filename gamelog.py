@@ -0,0 +1,191 @@
+'''
+Game records: the event streams of Scrabble and UNO games, saved as JSON Lines and replayed.
+
+Scrabble.play_game and UNO.play_game call each of their observers with every event of a game, as a dict:
+
+    Scrabble  {'event': 'start', 'game': 'scrabble', 'players': [name, name], 'hands': [hand, hand]; and, if the
+               game was resumed from a position (see snapshot.py), 'board': rows (as in Scrabble.board_rows),
+               'scores': [score, score], 'player': p}
+              {'event': 'move', 'player': p, 'play': (score, (i, j), (di, dj), word) or None,
+               'drawn': tiles drawn after it, 'scores': [score, score]}
+              {'event': 'end', 'scores': [score, score], 'racks': [rack, rack] (if the endgame was played out)}
+    UNO       {'event': 'start', 'game': 'uno', 'players': [name, name], 'hands': [cards, cards], 'top': card,
+               'player': p}
+              {'event': 'move', 'player': p, 'move': a card, 'pick' or 'wait', 'drawn': [cards, cards] (drawn by each
+               player as a result), 'top': card, 'next': player to move, 'sizes': [cards held, cards held]}
+              {'event': 'end', 'winner': p, 'turns': turns}
+
+A Writer is an observer that writes the events to a file, one JSON object per line, through a large buffer; so is the
+printing (Scrabble.Printer, UNO.printer) that verbose games used to do directly. A log can hold many games, each
+starting with its 'start' event (record adds a 'seed' to it).
+
+Replaying a game's events rebuilds its position after any number of moves, without its strategies or its random
+draws: ScrabblePosition and UnoPosition follow the events and hold the board, hands and scores (or top card).
+
+    python gamelog.py record scrabble best_strat leaves.leave_strat -n 100 -o games.jsonl
+    python gamelog.py show games.jsonl --game 3 --move 20
+'''
+
+import argparse
+import json
+
+import Scrabble
+import UNO
+import tournament
+
+
+class Writer:
+    "An observer that writes every event to a file as a line of JSON. Close it (or use it in a with block) when done."
+
+    def __init__(self, filename, buffering=1 << 20):
+        self.file = open(filename, 'w', buffering=buffering)
+        self.encode = json.JSONEncoder(separators=(',', ':'), check_circular=False).encode
+
+    def __call__(self, event):
+        self.file.write(self.encode(event))
+        self.file.write('\n')
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_events(filename):
+    "Generate the events in a log file."
+    with open(filename) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_games(filename):
+    "Generate the games in a log file, each as a list of its events."
+    game = None
+    for event in read_events(filename):
+        if event['event'] == 'start':
+            if game: yield game
+            game = []
+        game.append(event)
+    if game: yield game
+
+
+def as_play(play):
+    "A Scrabble play as play_game makes them, from its JSON form (lists for tuples)."
+    if not play:
+        return Scrabble.NOPLAY
+    score, pos, direction, word = play
+    return (score, tuple(pos), tuple(direction), word)
+
+
+class ScrabblePosition:
+    "The position in a Scrabble game, kept up to date by the game's events: board, hands, scores and player to move."
+
+    def __init__(self):
+        self.board, self.hands, self.scores, self.player, self.moves = None, None, [0, 0], 0, 0
+
+    def __call__(self, event):
+        kind = event['event']
+        if kind == 'start':
+            self.board = Scrabble.Board(''.join(event['board'])) if 'board' in event else Scrabble.make_board()
+            self.hands, self.scores = list(event['hands']), list(event.get('scores', [0, 0]))
+            self.player, self.moves = event.get('player', 0), 0
+        elif kind == 'move':
+            p, play = event['player'], as_play(event['play'])
+            if play:
+                self.hands[p] = Scrabble.make_play(play, self.board, self.hands[p]) + event['drawn']
+            self.scores = list(event['scores'])
+            self.player, self.moves = 1 - p, self.moves + 1
+
+    def show(self):
+        Scrabble.show_board(self.board)
+        for p in (0, 1):
+            print('{}player {}: {:<8} {:>4}'.format('*' if p == self.player else ' ', p, self.hands[p],
+                                                     self.scores[p]))
+
+
+class UnoPosition:
+    "The position in an UNO game, kept up to date by the game's events: hands, top card and player to move."
+
+    def __init__(self):
+        self.hands, self.top, self.player, self.moves = None, None, 0, 0
+
+    def __call__(self, event):
+        kind = event['event']
+        if kind == 'start':
+            self.hands, self.top, self.player, self.moves = [list(h) for h in event['hands']], event['top'], \
+                event['player'], 0
+        elif kind == 'move':
+            card, hand = event['move'], self.hands[event['player']]
+            if card not in ('pick', 'wait'):
+                played = '?' + card[1] if card[1] in 'WF' else card
+                if played in hand:  # As in UNO.play_card, a card that isn't in the hand is played anyway
+                    hand.remove(played)
+            for (h, drawn) in zip(self.hands, event['drawn']):
+                h.extend(drawn)
+            self.top, self.player, self.moves = event['top'], event['next'], self.moves + 1
+
+    def show(self):
+        print('top card:', UNO.convert_name(self.top))
+        for p in (0, 1):
+            print('{}player {}: {}'.format('*' if p == self.player else ' ', p, ' '.join(self.hands[p])))
+
+
+POSITIONS = {'scrabble': ScrabblePosition, 'uno': UnoPosition}
+
+
+def replay(events, moves=None):
+    "The position after the first moves moves of a game (all of them by default), from its events."
+    position = POSITIONS[events[0]['game']]()
+    for event in events:
+        if event['event'] == 'move' and moves is not None and position.moves >= moves:
+            break
+        position(event)
+    return position
+
+
+def record(game, A, B, games, seed, filename):
+    "Play games between strategies A and B, one seed each (see tournament.game_seeds), and log them to a file."
+    play_game = Scrabble.play_game if game == 'scrabble' else UNO.play_game
+    with Writer(filename) as writer:
+        for s in tournament.game_seeds(seed, games):
+            def observer(event, s=s):
+                writer(dict(event, seed=s) if event['event'] == 'start' else event)
+            play_game(A, B, verbose=False, observers=[observer], rng=tournament.game_rng(s))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Record games to a log, or replay a position from one.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    rec = commands.add_parser('record', help='play games and log them')
+    rec.add_argument('game', choices=['scrabble', 'uno'])
+    rec.add_argument('A', help='a strategy, e.g. best_strat or clueless')
+    rec.add_argument('B')
+    rec.add_argument('-n', '--games', type=int, default=1)
+    rec.add_argument('--seed', type=int, default=0)
+    rec.add_argument('-o', '--output', default='games.jsonl')
+    show = commands.add_parser('show', help='print the position in a logged game')
+    show.add_argument('log')
+    show.add_argument('--game', type=int, default=0, help='which game in the log (from 0)')
+    show.add_argument('--move', type=int, default=None, help='after how many moves (default: the end)')
+    args = parser.parse_args(argv)
+    if args.command == 'record':
+        module = Scrabble if args.game == 'scrabble' else UNO
+        record(args.game, tournament.strategy(args.A, module), tournament.strategy(args.B, module),
+               args.games, args.seed, args.output)
+    else:
+        for (n, events) in enumerate(read_games(args.log)):
+            if n == args.game:
+                position = replay(events, args.move)
+                print('game {} ({}), after {} moves'.format(n, ' v '.join(events[0]['players']), position.moves))
+                position.show()
+                return position
+        raise SystemExit('there are not {} games in {}'.format(args.game + 1, args.log))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+'''
+Opt-in instrumentation of the Scrabble move generator: counters and timers for each of its stages.
+
+    with instrument.Profile() as profile:
+        Scrabble.play_game(profile.watch(Scrabble.best_strat), profile.watch(leaves.leave_strat), verbose=False)
+    profile.report()
+
+While a Profile is running, the functions it measures are replaced in the Scrabble module by wrappers that count
+and time them, and LEXICON by a CountingLexicon; stopping it puts the originals back. So the move generator has no
+instrumentation in it, and costs nothing extra, unless a profile is running. (When one is, every add_suffixes call
+and lexicon lookup pays for a Python function call, so times are inflated; compare them with each other, or
+between runs, rather than with uninstrumented times.)
+
+What is counted:
+
+    anchors          anchor squares searched from (by row_plays)
+    starts           anchors, each with a size of prefix, searched from by TopPlays (TopPlays.start calls)
+    bounds           upper bounds worked out for TopPlays to cut the search off with (play_bound calls)
+    prefixes         prefixes of the rack tried (find_prefixes calls)
+    suffix_nodes     squares visited extending words (add_suffixes and TopPlays.suffixes calls)
+    cross_checks     cross-check masks computed (after each play)
+    plays_scored     plays scored (by line_scores, or by TopPlays as it finds them)
+    lexicon_lookups  calls to the lexicon (child, edges, letters, is_word, walk)
+    line_hits        lines whose plays came from the cache (see Scrabble.line_plays), and
+    line_misses      lines that were searched
+
+and timed: all_plays, top_plays (the branch-and-bound search best_play makes), row_plays (the search of lines not in
+the cache), cross_check and line_scores. all_plays goes through row_plays and the line cache; top_plays goes through
+TopPlays, which counts starts and bounds instead of anchors and doesn't use the cache. Lines that hit the cache are
+not searched, so their anchors and nodes are not counted; start a Profile with clear=True (the default) for counts
+that don't depend on what ran before.
+
+    python instrument.py best_strat leaves.leave_strat --seed 1 --moves
+'''
+
+import argparse
+import functools
+import json
+import time
+
+import Scrabble
+import tournament
+
+COUNTERS = ('anchors', 'starts', 'bounds', 'prefixes', 'suffix_nodes', 'cross_checks', 'plays_scored',
+            'lexicon_lookups', 'line_hits', 'line_misses')
+TIMERS = ('all_plays', 'top_plays', 'row_plays', 'cross_check', 'line_scores')
+METHODS = (('start', 'starts'), ('suffixes', 'suffix_nodes'), ('add', 'plays_scored'))  # Of TopPlays, counted
+
+
+class CountingLexicon:
+    "A lexicon that counts the calls made to it in counts['lexicon_lookups'] (for Profile)."
+
+    def __init__(self, lexicon, counts):
+        self.lexicon, self.counts, self.root = lexicon, counts, lexicon.root
+
+    def child(self, node, L):
+        self.counts['lexicon_lookups'] += 1
+        return self.lexicon.child(node, L)
+
+    def edges(self, node):
+        self.counts['lexicon_lookups'] += 1
+        return self.lexicon.edges(node)
+
+    def letters(self, node):
+        self.counts['lexicon_lookups'] += 1
+        return self.lexicon.letters(node)
+
+    def is_word(self, node):
+        self.counts['lexicon_lookups'] += 1
+        return self.lexicon.is_word(node)
+
+    def walk(self, letters, node=None):
+        self.counts['lexicon_lookups'] += 1
+        return self.lexicon.walk(letters, node)
+
+    def __contains__(self, word):
+        self.counts['lexicon_lookups'] += 1
+        return word in self.lexicon
+
+
+class Profile:
+    """Counts and times of the stages of move generation, from start to stop (or over a with block).
+    counts and seconds hold the totals; moves holds one record for each move made by a watched strategy."""
+
+    def __init__(self, clear=True):
+        self.clear = clear
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.seconds = dict.fromkeys(TIMERS, 0.0)
+        self.moves = []
+        self.saved = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        "Install the wrappers in the Scrabble module."
+        if self.saved is not None:
+            raise RuntimeError('this profile is already running')
+        if self.clear:
+            Scrabble.clear_caches()
+        replacements = {name: self.timed(name, getattr(Scrabble, name)) for name in TIMERS}
+        replacements['row_plays'] = self.row_plays(replacements['row_plays'])
+        replacements['cross_check'] = self.counted('cross_checks', replacements['cross_check'])
+        replacements['line_scores'] = self.line_scores(replacements['line_scores'])
+        replacements['find_prefixes'] = self.counted('prefixes', Scrabble.find_prefixes)
+        replacements['add_suffixes'] = self.counted('suffix_nodes', Scrabble.add_suffixes)
+        replacements['play_bound'] = self.counted('bounds', Scrabble.play_bound)
+        replacements['LEXICON'] = CountingLexicon(Scrabble.LEXICON, self.counts)
+        self.saved = {name: getattr(Scrabble, name) for name in replacements}
+        self.saved_methods = {name: getattr(Scrabble.TopPlays, name) for (name, counter) in METHODS}
+        self.cache_start = Scrabble.line_plays.cache_info()
+        for (name, value) in replacements.items():
+            setattr(Scrabble, name, value)
+        for (name, counter) in METHODS:
+            setattr(Scrabble.TopPlays, name, self.counted(counter, self.saved_methods[name]))
+
+    def stop(self):
+        "Put the original functions back."
+        if self.saved is None:
+            return
+        self.update_cache_counts()
+        for (name, value) in self.saved.items():
+            setattr(Scrabble, name, value)
+        for (name, value) in self.saved_methods.items():
+            setattr(Scrabble.TopPlays, name, value)
+        self.saved = None
+
+    def timed(self, name, f):
+        "A wrapper for f that adds the time spent in it to seconds[name]. (Not for recursive functions.)"
+        seconds, clock = self.seconds, time.perf_counter
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            t = clock()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                seconds[name] += clock() - t
+        return wrapper
+
+    def counted(self, name, f):
+        "A wrapper for f that counts its calls in counts[name]."
+        counts = self.counts
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            counts[name] += 1
+            return f(*args, **kwargs)
+        return wrapper
+
+    def row_plays(self, f):
+        "A wrapper for row_plays that counts the anchors in the line searched."
+        counts = self.counts
+
+        @functools.wraps(f)
+        def wrapper(hand, squares, checks, k):
+            counts['anchors'] += sum(1 for x in range(k * Scrabble.SIZE + 1, (k + 1) * Scrabble.SIZE - 1)
+                                     if checks[x])
+            return f(hand, squares, checks, k)
+        return wrapper
+
+    def line_scores(self, f):
+        "A wrapper for line_scores that counts the plays scored."
+        counts = self.counts
+
+        @functools.wraps(f)
+        def wrapper(squares, letter_mult, word_mult, cross_sums, plays):
+            counts['plays_scored'] += len(plays)
+            return f(squares, letter_mult, word_mult, cross_sums, plays)
+        return wrapper
+
+    def update_cache_counts(self):
+        "Bring the line cache hits and misses up to date."
+        if self.saved is not None:
+            info = Scrabble.line_plays.cache_info()
+            self.counts['line_hits'] += info.hits - self.cache_start.hits
+            self.counts['line_misses'] += info.misses - self.cache_start.misses
+            self.cache_start = info
+
+    def snapshot(self):
+        "The counts and times so far, as one dict."
+        self.update_cache_counts()
+        return {**self.counts, **{name + '_seconds': s for (name, s) in self.seconds.items()}}
+
+    def watch(self, strategy):
+        "A strategy that plays as strategy does, and records the counts and times of each of its moves in moves."
+        @functools.wraps(strategy)
+        def watched(hand, board):
+            before, t = self.snapshot(), time.perf_counter()
+            play = strategy(hand, board)
+            seconds = time.perf_counter() - t
+            after = self.snapshot()
+            self.moves.append({'move': len(self.moves) + 1, 'strategy': strategy.__name__, 'hand': hand,
+                               'play': play and play[3], 'score': play[0] if play else 0, 'seconds': seconds,
+                               **{key: after[key] - before[key] for key in after}})
+            return play
+        return watched
+
+    def report(self, moves=False):
+        "Print the totals, the time in each stage, and (if moves) a line for every watched move."
+        if moves and self.moves:
+            print('{:>4} {:<12} {:<9} {:>9} {:>8} {:>7} {:>7} {:>9} {:>10} {:>7} {:>7} {:>9} {:>6}/{:<6}'.format(
+                'move', 'strategy', 'play', 'ms', 'anchors', 'starts', 'bounds', 'prefixes', 'nodes', 'checks',
+                'scored', 'lookups', 'hits', 'misses'))
+            for m in self.moves:
+                print('{:>4} {:<12} {:<9} {:>9.2f} {:>8} {:>7} {:>7} {:>9} {:>10} {:>7} {:>7} {:>9} {:>6}/{:<6}'.format(
+                    m['move'], m['strategy'][:12], (m['play'] or '-')[:9], 1000 * m['seconds'], m['anchors'],
+                    m['starts'], m['bounds'], m['prefixes'], m['suffix_nodes'], m['cross_checks'], m['plays_scored'],
+                    m['lexicon_lookups'], m['line_hits'], m['line_misses']))
+        totals = self.snapshot()
+        for name in COUNTERS:
+            print('{:<16}{:>12}'.format(name, totals[name]))
+        for name in TIMERS:
+            print('{:<16}{:>12.1f} ms'.format(name, 1000 * totals[name + '_seconds']))
+
+
+def profile_games(A, B, games=1, seed=0):
+    "Play games between strategies A and B with a Profile running and every move watched. Return the profile."
+    profile = Profile()
+    with profile:
+        for s in tournament.game_seeds(seed, games):
+            Scrabble.play_game(profile.watch(A), profile.watch(B), verbose=False, rng=tournament.game_rng(s))
+    return profile
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Profile the Scrabble move generator over games between strategies.')
+    parser.add_argument('A', nargs='?', default='best_strat', help='a strategy, e.g. best_strat or leaves.leave_strat')
+    parser.add_argument('B', nargs='?', default='best_strat')
+    parser.add_argument('-n', '--games', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--moves', action='store_true', help='print a line for every move')
+    parser.add_argument('--json', help='save the totals and every move to this JSON file')
+    args = parser.parse_args(argv)
+    profile = profile_games(tournament.strategy(args.A, Scrabble), tournament.strategy(args.B, Scrabble),
+                            args.games, args.seed)
+    profile.report(args.moves)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'totals': profile.snapshot(), 'moves': profile.moves}, f, indent=1)
+    return profile
+
+
+if __name__ == '__main__':
+    main()
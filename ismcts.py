@@ -0,0 +1,282 @@
+'''
+An UNO player that searches by Information-Set Monte-Carlo Tree Search.
+
+A player can't see the other hands or the order of the draw pile, so each iteration of the search first deals them
+at random, from the cards the player hasn't seen (a determinization), and then runs down one tree of moves shared
+by all the deals: at each node a move is chosen by UCB among the moves legal in this deal, counting how often each
+was available (so a move legal in few deals isn't penalized for being tried in few of them). The first move not yet
+in the tree is added, the game is played out from there by random play (uno_engine.random_play), and the result is
+counted at every node on the way down, as a win or a loss for the player who made its move. The move played is the
+one tried most at the root.
+
+Deals and play-outs are uno_engine games, so play-outs run at the engine's speed. A search has a budget of play-outs
+(PLAYOUTS) or of seconds (SECONDS, if set) per decision. With WORKERS above 1, the search is root parallel: each
+of a pool of worker processes grows a tree of its own from a seed of its own, each with the whole budget (of
+seconds) or its share (of play-outs), and the visits of their root moves are added up. The budget can be set by
+changing these module settings, before any tournament workers are started.
+
+ismcts_strat is an UNO.py strategy: give it to UNO.play_uno or play_game like clueless. It sees only what a player
+at the table would: its hand, the top card and the sizes of the other hand and of the deck. As UNO.py keeps no
+discard pile, the unseen cards are taken to be a whole deck less its hand and the top card. ismcts_play is the same
+player for uno_engine, at tables of any size and by any rules; there the unseen cards are exactly the other hands
+and the draw pile. ismcts_strat names it as its engine counterpart, so tables played by uno_engine (such as
+tournaments of more than two players) seat ismcts_play in its place, rather than searching UNO.py's two-player
+game through the adapter.
+
+    python ismcts.py -n 100 --playouts 300
+'''
+
+import argparse
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import UNO
+import tournament
+import uno_engine
+from uno_engine import CHALLENGE, COLORS, DECK, FOUR, FOUR_CARD, NO_FACE, PICK, WAIT, WILD, WILD_CARD
+
+PLAYOUTS = 300  # Play-outs per decision
+SECONDS = None  # If set, the seconds per decision instead
+WORKERS = 1  # Worker processes searching each decision
+EXPLORATION = 0.7  # The weight of exploration in UCB
+MAX_TURNS = 1000  # A play-out still going after this many turns counts as a loss for everyone
+LEGACY = uno_engine.Rules.legacy()
+
+pool = None  # The worker processes, started by the first decision that needs them
+
+
+class Node:
+    "A node of the search tree: the move to it, the player who made it, and its visits, wins and availability."
+
+    __slots__ = ('move', 'player', 'children', 'visits', 'wins', 'available')
+
+    def __init__(self, move=None, player=None):
+        self.move, self.player, self.children = move, player, {}
+        self.visits, self.wins, self.available = 0, 0, 1
+
+    def select(self, moves, c=EXPLORATION):
+        "The child for one of moves with the highest upper confidence bound."
+        best, best_bound = None, -1.0
+        for move in moves:
+            child = self.children[move]
+            bound = child.wins / child.visits + c * math.sqrt(math.log(child.available) / child.visits)
+            if bound > best_bound:
+                best, best_bound = child, bound
+        return best
+
+
+def legal_moves(game):
+    """All the moves the player to move can make: each card it can play (a wild with each color it can name), a
+    challenge if it can make one, and picking (or waiting) if it has no card to play or must draw a penalty."""
+    moves = []
+    for card in game.legal_cards():
+        if card < WILD_CARD:
+            moves.append(card)
+        else:
+            wild = WILD if card == WILD_CARD else FOUR
+            moves.extend(range(wild, wild + 4))
+    if game.bluffed is not None:
+        moves.append(CHALLENGE)
+    if game.penalty or not moves:
+        moves.append(WAIT if game.picked and not game.penalty else PICK)
+    return moves
+
+
+def play_out(game, max_turns=MAX_TURNS):
+    "Play the game out by random play; return the winner (None if it goes on too long)."
+    random_play = uno_engine.random_play
+    while game.turns < max_turns:
+        cards = game.legal_cards()
+        if cards or game.bluffed is not None:
+            move = random_play(game, cards)
+        elif game.penalty:
+            move = PICK
+        else:
+            move = WAIT if game.picked else PICK
+        winner = game.move(move)
+        if winner is not None:
+            return winner
+    return None
+
+
+def search(deal, rng, playouts=PLAYOUTS, seconds=None):
+    """Grow a search tree from deals made by deal(rng) (games with the searching player to move), for that many
+    play-outs or, if seconds is set, until they are up. Return {move: (visits, wins)} for the moves at the root."""
+    root = Node()
+    deadline = time.perf_counter() + seconds if seconds else None
+    n = 0
+    while (time.perf_counter() < deadline) if deadline else n < playouts:
+        n += 1
+        game = deal(rng)
+        node, path, winner = root, [], None
+        while winner is None:
+            moves = legal_moves(game)
+            children = node.children
+            untried = [move for move in moves if move not in children]
+            for move in moves:
+                if move in children:
+                    children[move].available += 1
+            if untried:
+                move = untried[rng.randrange(len(untried))]
+                node = children[move] = Node(move, game.player)
+                path.append(node)
+                winner = game.move(move)
+                if winner is None:
+                    winner = play_out(game)
+                break
+            node = node.select(moves)
+            path.append(node)
+            winner = game.move(node.move)
+        for node in path:
+            node.visits += 1
+            node.wins += node.player == winner
+    return {move: (child.visits, child.wins) for (move, child) in root.children.items()}
+
+
+def card_number(name):
+    "The uno_engine card for an UNO.py card name, such as 'R7' or '?W'."
+    if name[0] == '?':
+        return WILD_CARD if name[1] == 'W' else FOUR_CARD
+    return uno_engine.parse_move(name)
+
+
+def move_name(move):
+    "The UNO.py move for an uno_engine move: 'pick', 'wait', or a card such as 'R7' or 'BW'."
+    if move == PICK: return 'pick'
+    if move == WAIT: return 'wait'
+    if move >= WILD: return COLORS[(move - WILD) % 4] + ('W' if move < FOUR else 'F')
+    return uno_engine.card_name(move)
+
+
+def legacy_deal(view):
+    """A function that deals the unseen cards of a view of an UNO.py state: (hand, other hand's size, top card,
+    deck's size, pick). The deals are uno_engine games by UNO.py's rules, with player 0 to move."""
+    hand, other_size, top_card, deck_size, pick = view
+    hand = [card_number(name) for name in hand]
+    unseen = list(DECK)
+    for card in hand + ([uno_engine.parse_move(top_card)] if top_card[1] != '?' else []):
+        unseen.remove(card)
+    while len(unseen) < other_size + deck_size:  # The deck has been refilled since the cards in play were dealt
+        unseen.extend(DECK)
+    color = COLORS.index(top_card[0])
+    face = uno_engine.FACES.index(top_card[1]) if top_card[1] != '?' else NO_FACE
+    template = uno_engine.UnoGame(random.Random(0), LEGACY)
+    template.set_hand(0, hand)
+    template.discard, template.top_color, template.top_face = [], color, face
+    template.player, template.direction, template.picked, template.penalty = 0, 1, bool(pick), 0
+    template.bluffed, template.offender, template.turns = None, None, 0
+
+    def deal(rng):
+        cards = unseen[:]
+        rng.shuffle(cards)
+        game = template.copy(rng)
+        game.set_hand(1, cards[:other_size])
+        game.deck = cards[other_size:other_size + deck_size]
+        return game
+    return deal
+
+
+def engine_deal(game):
+    """A function that deals the unseen cards of an uno_engine game: the other players' hands and the draw pile,
+    shuffled together and dealt out again in the same numbers. Whether a challenge would succeed is unseen too: each
+    deal makes it a coin toss."""
+    me = game.player
+    unseen = list(game.deck)
+    for p in range(game.players):
+        if p != me:
+            unseen.extend(card for (card, n) in enumerate(game.hands[p]) for _ in range(n))
+
+    def deal(rng):
+        cards = unseen[:]
+        rng.shuffle(cards)
+        dealt = game.copy(rng)
+        start = 0
+        for p in range(game.players):
+            if p != me:
+                dealt.set_hand(p, cards[start:start + game.sizes[p]])
+                start += game.sizes[p]
+        dealt.deck = cards[start:]
+        if dealt.bluffed is not None:
+            dealt.bluffed = rng.random() < 0.5
+        return dealt
+    return deal
+
+
+def search_task(task):
+    "Run one search of a decision: task is (kind, what the player sees, seed, playouts, seconds)."
+    kind, view, seed, playouts, seconds = task
+    deal = legacy_deal(view) if kind == 'legacy' else engine_deal(view)
+    return search(deal, random.Random(seed), playouts, seconds)
+
+
+def decide(kind, view):
+    """The move most tried by a search (or by the searches of WORKERS processes, added up) of a decision, within
+    the budget of PLAYOUTS or SECONDS. Seeds are drawn from the random module, so a game seeded by the tournament
+    plays the same every time (within a budget of play-outs)."""
+    global pool
+    seed = random.getrandbits(64)
+    if WORKERS <= 1:
+        results = [search_task((kind, view, seed, PLAYOUTS, SECONDS))]
+    else:
+        if pool is None:
+            pool = ProcessPoolExecutor(WORKERS)
+        share = -(-PLAYOUTS // WORKERS)
+        results = pool.map(search_task, [(kind, view, seed + w, share, SECONDS) for w in range(WORKERS)])
+    totals = {}
+    for result in results:
+        for (move, (visits, wins)) in result.items():
+            v, w = totals.get(move, (0, 0))
+            totals[move] = (v + visits, w + wins)
+    return max(sorted(totals), key=totals.get)
+
+
+def ismcts_strat(state):
+    "An UNO.py strategy that plays the move found by ISMCTS, when it has a choice."
+    p, hand0, hand1, top_card, deck, pick = state
+    moves = UNO.legal_moves(state)
+    if moves in ('pick', 'wait'):
+        return moves
+    if len(moves) == 1 and next(iter(moves))[1] not in 'WF':
+        return next(iter(moves))
+    return move_name(decide('legacy', (tuple(hand0), len(hand1), top_card, len(deck), pick)))
+
+
+def ismcts_play(game, cards):
+    "An uno_engine strategy that plays the move found by ISMCTS, when it has a choice."
+    moves = legal_moves(game)
+    if len(moves) == 1:
+        return moves[0]
+    return decide('engine', game)
+
+
+ismcts_strat.engine = ismcts_play  # What uno_engine.engine_strategy plays in its place
+
+
+def main(argv=None):
+    global PLAYOUTS, SECONDS, WORKERS
+    parser = argparse.ArgumentParser(description='Play ismcts_strat against UNO.clueless.')
+    parser.add_argument('-n', '--games', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--playouts', type=int, default=PLAYOUTS, help='play-outs per decision')
+    parser.add_argument('--seconds', type=float, default=SECONDS, help='seconds per decision, instead of play-outs')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='processes searching each decision')
+    args = parser.parse_args(argv)
+    PLAYOUTS, SECONDS, WORKERS = args.playouts, args.seconds, args.workers
+    wins, decisions, t = 0, [], time.perf_counter()
+    for (n, seed) in enumerate(tournament.game_seeds(args.seed, args.games)):
+        rng = tournament.game_rng(seed)
+        players = (ismcts_strat, UNO.clueless) if n % 2 == 0 else (UNO.clueless, ismcts_strat)
+        winner, turns, seconds = UNO.play_game(*players, verbose=False, rng=rng)
+        me = n % 2
+        wins += winner == me
+        decisions.extend(seconds[me])
+    seconds = time.perf_counter() - t
+    print('ismcts_strat won {} of {} games against clueless ({:.1%}) in {:.1f}s; {:.1f} ms per move on average'.format(
+        wins, args.games, wins / args.games, seconds, 1000 * sum(decisions) / len(decisions)))
+    return wins
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+'''
+Leave values for Scrabble: how much the tiles left on the rack after a play are worth on the next turn.
+
+The table has an entry for every multiset of up to 6 tiles (the letters and the blank '_'), 1,107,568 in all, at the
+index given by rank: the combinatorial number system ranks the sorted tiles, so a lookup is a sort of at most six
+letters and six additions. Values are stored in tenths of a point as 16-bit ints, in a file that is memory-mapped
+like the lexicon (2.2 MB).
+
+The table is generated offline by self-play:
+
+    python leaves.py generate -n 5000
+
+A leave's value is how many more points than average its owner scored on their next move, averaged over every time
+it was left in the games, and shrunk towards a prior made from per-tile values when it was seen only a few times (or
+not at all). Until a table has been generated, leave values are the prior alone.
+
+leave_strat is the computer player that uses it: the play with the most points plus leave value.
+'''
+
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+from array import array
+from math import comb
+
+import Scrabble
+import tournament
+
+ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ_'  # In sorted order: '_' sorts after 'Z'
+CODE = {t: n for (n, t) in enumerate(ALPHABET)}
+MAX_LEAVE = 6
+CHOOSE = [[comb(n, k) for k in range(MAX_LEAVE + 1)] for n in range(len(ALPHABET) + MAX_LEAVE)]
+# The index of the first leave of each size: the number of smaller leaves.
+OFFSETS = [sum(comb(len(ALPHABET) + m - 1, m) for m in range(k)) for k in range(MAX_LEAVE + 2)]
+SIZE = OFFSETS[-1]
+
+TABLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'leaves.bin')
+HEADER = struct.Struct('=4sBB2xII')  # magic, version, byte order, games played to make it, samples
+MAGIC, VERSION = b'LEAV', 1
+BYTEORDER = b'L' if sys.byteorder == 'little' else b'B'
+SCALE = 10  # Values are stored in tenths of a point
+
+# Rough worth of single tiles kept on the rack, and the penalties for duplicates and for too many vowels or
+# consonants: the prior for leaves the self-play games saw too rarely.
+TILE_VALUES = dict(A=0.9, B=1.3, C=1.2, D=0.7, E=0.9, F=2.6, G=-0.3, H=4.5, I=0.0, J=4.1, K=3.9, L=-0.2,
+                   M=1.7, N=-0.2, O=0.2, P=1.3, Q=2.3, R=0.1, S=2.3, T=-0.2, U=-0.6, V=0.1, W=1.5, X=7.7,
+                   Y=3.4, Z=8.6, _=4.0)
+DUPLICATE_PENALTY, BALANCE_PENALTY = 2.6, 0.9
+VOWELS = set('AEIOU')
+PRIOR_WEIGHT = 20  # A leave seen this many times counts as much as its prior
+CANDIDATES = 10  # How many of the highest-scoring plays leave_strat weighs up by leave value
+
+
+def rank(leave):
+    "The index in the table of a leave: a string of at most MAX_LEAVE tiles, in any order."
+    r = OFFSETS[len(leave)]
+    for (i, t) in enumerate(sorted(leave), 1):
+        r += CHOOSE[CODE[t] + i - 1][i]
+    return r
+
+
+def prior(leave):
+    "The value of a leave made up from the values of its tiles."
+    value = sum(TILE_VALUES[t] for t in leave)
+    value -= DUPLICATE_PENALTY * (len(leave) - len(set(leave)))
+    vowels = sum(t in VOWELS for t in leave)
+    value -= BALANCE_PENALTY * max(0, abs(vowels - (len(leave) - vowels - leave.count('_'))) - 1)
+    return value
+
+
+def all_leaves():
+    "Every leave, as a sorted string."
+    from itertools import combinations_with_replacement
+    for k in range(MAX_LEAVE + 1):
+        for tiles in combinations_with_replacement(ALPHABET, k):
+            yield ''.join(tiles)
+
+
+def build_table(samples=()):
+    """The table of leave values (as an array of ints, in tenths of a point) from (rank, next move score) samples:
+    each is the leave a player kept and what they scored on their next move."""
+    sums, counts = {}, {}
+    total = n = 0
+    for (r, score) in samples:
+        sums[r] = sums.get(r, 0) + score
+        counts[r] = counts.get(r, 0) + 1
+        total += score
+        n += 1
+    mean = total / n if n else 0.0
+    table = array('h', bytes(2 * SIZE))
+    for leave in all_leaves():
+        r = rank(leave)
+        count = counts.get(r, 0)
+        value = (sums.get(r, 0) - count * mean + PRIOR_WEIGHT * prior(leave)) / (count + PRIOR_WEIGHT)
+        table[r] = max(-32768, min(32767, round(SCALE * value)))
+    return table
+
+
+def save_table(table, filename=TABLE, games=0, samples=0):
+    "Write a table to a file (atomically, as compile_lexicon does)."
+    temporary = '{}.{}.tmp'.format(filename, os.getpid())
+    with open(temporary, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, BYTEORDER[0], games, samples))
+        table.tofile(f)
+    os.replace(temporary, filename)
+
+
+def read_table(filename=TABLE):
+    "Map a table file; return (values, games, samples), or None if it is missing or in another format."
+    try:
+        with open(filename, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(mapped) != HEADER.size + 2 * SIZE:
+        return None
+    magic, version, byteorder, games, samples = HEADER.unpack_from(mapped)
+    if (magic, version, byteorder) != (MAGIC, VERSION, BYTEORDER[0]):
+        return None
+    return memoryview(mapped)[HEADER.size:].cast('h'), games, samples
+
+
+VALUES = None  # The mapped table once it is first used, or () if there is none
+
+
+def leave_value(leave):
+    "The value in points of keeping the tiles in leave."
+    global VALUES
+    if VALUES is None:
+        table = read_table()
+        VALUES = table[0] if table else ()
+    if not VALUES:
+        return prior(leave)
+    return VALUES[rank(leave)] / SCALE
+
+
+def leave_strat(hand, board):
+    """Of the CANDIDATES plays with the most points, the one with the most points plus value of the tiles it leaves
+    on the rack. Once all the unseen tiles fit on the opponent's rack the bag is empty, and only points count."""
+    unseen = len(Scrabble.TILES) - Scrabble.tiles_on_board(board) - len(hand)
+    if unseen <= 7:
+        return Scrabble.best_play(hand, board)
+    plays = Scrabble.top_plays(hand, board, CANDIDATES)
+    if not plays:
+        return Scrabble.NOPLAY
+
+    values = {}  # Leave value by the tiles played: many plays use the same tiles
+
+    def equity(play):
+        played = Scrabble.tiles_played(play, board)
+        if played not in values:
+            values[played] = leave_value(Scrabble.removed(hand, played))
+        return (play[0] + values[played], play)
+    return max(plays, key=equity)
+
+
+def self_play(seed):
+    """Play a game of greedy (best_play) self-play from a seed. Return (rank, score) samples: the leave a player
+    kept while tiles were left in the bag, and the points they scored on their next move."""
+    (p, (hand0, _), (hand1, _), bag) = Scrabble.scrabble_setup(random.Random(seed))
+    hands, kept = [hand0, hand1], [None, None]
+    board = Scrabble.make_board()
+    samples, passes = [], 0
+    while bag and passes < 2:
+        play = Scrabble.best_play(hands[p], board)
+        if kept[p] is not None:
+            samples.append((kept[p], play[0] if play else 0))
+            kept[p] = None
+        passes = 0 if play else passes + 1
+        if play:
+            leave = Scrabble.make_play(play, board, hands[p])
+            kept[p] = rank(leave) if bag else None
+            hands[p] = Scrabble.draw_tiles(bag, leave)
+        p = 1 - p
+    return samples
+
+
+def generate(games=1000, seed=0, workers=None, filename=TABLE):
+    "Play games of self-play in parallel, and save the table they make. Return the number of samples."
+    tournament.start_worker()
+    results = tournament.play_games(self_play, tournament.game_seeds(seed, games), workers, tournament.start_worker)
+    samples = [sample for result in results for sample in result]
+    save_table(build_table(samples), filename, games, len(samples))
+    return len(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate the Scrabble leave table by self-play.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    gen = commands.add_parser('generate', help='play self-play games and save the table')
+    gen.add_argument('-n', '--games', type=int, default=1000)
+    gen.add_argument('--seed', type=int, default=0)
+    gen.add_argument('--workers', type=int, default=None)
+    gen.add_argument('--output', default=TABLE)
+    args = parser.parse_args(argv)
+    samples = generate(args.games, args.seed, args.workers, args.output)
+    print('saved {} ({} games, {} samples)'.format(args.output, args.games, samples))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+'''
+A compact word list for the word games: a minimized DAWG (directed acyclic word graph) kept in three flat arrays.
+
+Every node is stored as a 27-bit mask -- one bit for each letter A-Z that has an outgoing edge, plus a terminal bit
+for "a word ends here" -- and the index of its first child in a shared array of children. The child reached by
+letter L is found by counting the mask bits below L's bit, so following an edge is a couple of integer operations
+instead of building and hashing a new prefix string.
+
+Node 0 is a dead node with no edges and node 1 is the root. Walking off the graph always lands on node 0, which is
+falsy, so callers can test "is this still a prefix of some word" with a plain truth test.
+
+Building the graph takes a second or so, so it is compiled once into a binary file next to the word list
+(`python lexicon.py words.txt`, or automatically on first use) and later runs mmap that file: the arrays are
+memoryviews straight onto the mapped pages, which every process using the same file shares. The file records a hash
+of the word list it was built from and is rebuilt when the word list changes.
+'''
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+DEAD, ROOT = 0, 1
+TERMINAL = 1 << 26
+ALL_LETTERS = TERMINAL - 1  # A mask with every letter's bit set
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+BITS = {L: 1 << n for (n, L) in enumerate(LETTERS)}  # The mask bit of each letter
+
+
+def mask_letters(mask):
+    "The letters whose bits are set in mask, in alphabetical order."
+    return [L for (n, L) in enumerate(LETTERS) if mask >> n & 1]
+
+
+class Lexicon:
+    "A set of uppercase words that can also be walked one letter at a time."
+    root = ROOT
+    source = compiled = None  # Set for a lexicon loaded from a word list file
+
+    def __init__(self, masks, firsts, children, size):
+        self.masks, self.firsts, self.children, self.size = masks, firsts, children, size
+
+    @classmethod
+    def lazy(cls, source, compiled=None):
+        """The lexicon for the word list file source, loaded from its compiled file (see load) the first time it
+        is used. Until then it costs nothing but the object."""
+        lexicon = cls.__new__(cls)
+        lexicon.source, lexicon.compiled = source, compiled or compiled_name(source)
+        return lexicon
+
+    def __getattr__(self, name):
+        # Only called for attributes that are not set: the arrays of a lazy lexicon that has not been loaded yet.
+        if name in ('masks', 'firsts', 'children', 'size') and self.source:
+            self.masks, self.firsts, self.children, self.size = load_arrays(self.source, self.compiled)
+            return getattr(self, name)
+        raise AttributeError(name)
+
+    def __reduce__(self):
+        # A lexicon from a file is pickled as its file names, so another process maps the same compiled file
+        # rather than receiving a copy of the arrays.
+        if self.source:
+            return (Lexicon.lazy, (self.source, self.compiled))
+        return (Lexicon, (self.masks, self.firsts, self.children, self.size))
+
+    @classmethod
+    def from_words(cls, words):
+        "Build the minimized graph for an iterable of uppercase words."
+        return cls(*build_dawg(words))
+
+    @classmethod
+    def from_file(cls, filename):
+        "Build the graph for the whitespace-separated words in a file. (Uppercased.)"
+        with open(filename) as f:
+            return cls.from_words(f.read().upper().split())
+
+    def child(self, node, L):
+        "The node reached from node by letter L, or DEAD."
+        mask, b = self.masks[node], 1 << (ord(L) - 65)
+        if not mask & b:
+            return DEAD
+        return self.children[self.firsts[node] + (mask & (b - 1)).bit_count()]
+
+    def edges(self, node):
+        "The mask of letters that have an edge out of node."
+        return self.masks[node] & ALL_LETTERS
+
+    def letters(self, node):
+        "The letters that have an edge out of node."
+        return mask_letters(self.masks[node])
+
+    def is_word(self, node):
+        "Does a word end at this node?"
+        return bool(self.masks[node] & TERMINAL)
+
+    def walk(self, letters, node=None):
+        "Follow letters from node (default: the root); return the node reached, or DEAD."
+        if node is None: node = ROOT
+        for L in letters:
+            node = self.child(node, L)
+            if not node:
+                return DEAD
+        return node
+
+    def __contains__(self, word):
+        return self.is_word(self.walk(word))
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        "Generate all the words, in alphabetical order."
+        stack = [(ROOT, '')]
+        while stack:
+            node, pre = stack.pop()
+            if self.is_word(node):
+                yield pre
+            stack.extend((self.child(node, L), pre + L) for L in reversed(self.letters(node)))
+
+    def arrays(self):
+        "The (masks, firsts, children, size) that define the lexicon."
+        return self.masks, self.firsts, self.children, self.size
+
+    def nbytes(self):
+        "The number of bytes in the three arrays."
+        return sum(len(a) * a.itemsize for a in (self.masks, self.firsts, self.children))
+
+
+def build_dawg(words):
+    """Build a minimized DAWG with the incremental algorithm of Daciuk et al. (sorted input).
+    Return the arrays (masks, firsts, children) and the number of words."""
+    words = sorted(set(words))
+    # While building, a node is [terminal, {letter: node}, index]. Once a node can no longer change it is looked
+    # up in the register, keyed by its terminal flag and its (already registered) children, and either replaced
+    # by an equal node registered earlier or registered itself.
+    register, order = {}, []
+    root = [False, {}, ROOT]
+    unchecked = []  # (parent, letter, child) triples on the path of the previous word
+
+    def minimize(down_to):
+        while len(unchecked) > down_to:
+            parent, L, node = unchecked.pop()
+            key = (node[0], tuple([(L2, c[2]) for (L2, c) in node[1].items()]))  # Letters arrive in sorted order
+            if key in register:
+                parent[1][L] = register[key]
+            else:
+                node[2] = len(order) + 2
+                register[key] = node
+                order.append(node)
+
+    previous = ''
+    for word in words:
+        common = 0
+        for (a, b) in zip(word, previous):
+            if a != b: break
+            common += 1
+        minimize(common)
+        node = unchecked[-1][2] if unchecked else root
+        for L in word[common:]:
+            new = [False, {}, None]
+            node[1][L] = new
+            unchecked.append((node, L, new))
+            node = new
+        node[0] = True
+        previous = word
+    minimize(0)
+
+    # Flatten: the dead node, the root, then the registered nodes in index order.
+    masks, firsts, children = array('I', [0]), array('I', [0]), array('I')
+    for node in [root] + order:
+        mask = TERMINAL if node[0] else 0
+        firsts.append(len(children))
+        for (L, c) in node[1].items():
+            mask |= BITS[L]
+            children.append(c[2])
+        masks.append(mask)
+    return masks, firsts, children, len(words)
+
+
+# The compiled file: a header, then the masks, firsts and children arrays as native 32-bit unsigned ints.
+HEADER = struct.Struct('=4sBB2x32sIII')  # magic, version, byte order, digest of the word list, size, nodes, children
+MAGIC, VERSION = b'DAWG', 1
+BYTEORDER = b'L' if sys.byteorder == 'little' else b'B'
+
+
+def compiled_name(source):
+    "The default name of the compiled form of a word list: words.txt => words.dawg."
+    return os.path.splitext(source)[0] + '.dawg'
+
+
+def file_digest(filename):
+    "A hash of the contents of a file."
+    with open(filename, 'rb') as f:
+        return hashlib.blake2b(f.read(), digest_size=32).digest()
+
+
+def compile_lexicon(source, compiled=None):
+    "Build the lexicon for the word list file source and write it to the compiled file. Return the file name."
+    compiled = compiled or compiled_name(source)
+    digest = file_digest(source)
+    masks, firsts, children, size = Lexicon.from_file(source).arrays()
+    header = HEADER.pack(MAGIC, VERSION, BYTEORDER[0], digest, size, len(masks), len(children))
+    # Write to a temporary file and rename it into place, so a process that is loading never sees half a file.
+    temporary = '{}.{}.tmp'.format(compiled, os.getpid())
+    with open(temporary, 'wb') as f:
+        f.write(header)
+        for a in (masks, firsts, children):
+            a.tofile(f)
+    os.replace(temporary, compiled)
+    return compiled
+
+
+def read_compiled(compiled, digest):
+    """Map the compiled file and return its (masks, firsts, children, size) as memoryviews onto the mapping.
+    Return None if the file is missing, in another format, or was built from a word list with another digest."""
+    try:
+        with open(compiled, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(mapped) < HEADER.size:
+        return None
+    magic, version, byteorder, file_hash, size, nodes, edges = HEADER.unpack_from(mapped)
+    if (magic, version, byteorder, file_hash) != (MAGIC, VERSION, BYTEORDER[0], digest):
+        return None
+    if len(mapped) != HEADER.size + 4 * (2 * nodes + edges):
+        return None
+    view = memoryview(mapped)[HEADER.size:]  # The views keep the mapping open for as long as they are used
+    masks = view[:4 * nodes].cast('I')
+    firsts = view[4 * nodes:8 * nodes].cast('I')
+    children = view[8 * nodes:].cast('I')
+    return masks, firsts, children, size
+
+
+def load_arrays(source, compiled=None):
+    "The (masks, firsts, children, size) for the word list file source, compiling it first if needed."
+    compiled = compiled or compiled_name(source)
+    digest = file_digest(source)
+    arrays = read_compiled(compiled, digest)
+    if arrays is None:
+        compile_lexicon(source, compiled)
+        arrays = read_compiled(compiled, digest)
+    return arrays
+
+
+def load(source, compiled=None):
+    "The lexicon for the word list file source, mapped from its compiled file (which is built if needed)."
+    lexicon = Lexicon.lazy(source, compiled)
+    lexicon.masks  # Load now
+    return lexicon
+
+
+if __name__ == '__main__':
+    for source in sys.argv[1:] or ['words.txt']:
+        print('compiled', source, 'to', compile_lexicon(source))
@@ -1,5 +1,12 @@
+import sys
+
 import UNO
 import Scrabble
+import wordindex
+
+if len(sys.argv) > 1:  # A query of the word list, such as: python main.py anagram RETAIN_ (see wordindex.py)
+    wordindex.main(sys.argv[1:])
+    sys.exit()
 
 while True:
     user_input = input("Enter 'U' to play UNO and 'S' to play scrabble. Press q to quit.\n")
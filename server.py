@@ -0,0 +1,415 @@
+'''
+A game server that hosts many UNO and Scrabble tables at once, for players connecting over TCP.
+
+The protocol is JSON Lines: every message, either way, is one JSON object on a line. A client sends commands:
+
+    {"cmd": "new", "game": "uno", "seats": ["human", "clueless"]}   open a table; each seat is "human" (this
+                                                                     client, at one seat at most), "open" (for
+                                                                     someone to join) or the name of a computer
+                                                                     strategy; add "seed": n for the same deal
+                                                                     every time
+    {"cmd": "join", "table": 3}                                      take an open seat, or watch if there is none
+                                                                     (not at a table the client already sits at)
+    {"cmd": "move", "table": 3, "move": "R7"}                        answer a turn
+    {"cmd": "stats"}                                                 the server's counts and move latencies
+
+and gets back {"event": "table", ...} when it takes a seat, the events of each game it is at (as in gamelog.py,
+with "table" added, and the other player's hand and draws hidden from a seated player), {"event": "turn", ...}
+when it has to move, and {"event": "error", "message": ...} for a command it can't carry out. UNO moves are as
+in UNO.py ("R7", "BW", "pick", "wait"); a turn lists the legal ones. A Scrabble move is [word, [i, j], "ACROSS" or
+"DOWN"], with a blank's letter in lowercase, or "pass".
+
+A client that disconnects ends the games it is playing (their tables are aborted). At a table whose game hasn't
+started, its seat is open again; such a table is closed once nobody is seated at it and the client that opened it
+has gone.
+
+Each table's game is Scrabble.play_game or UNO.play_game itself, run in a thread of the table pool, so the rules
+are the same as everywhere else. Its players are stand-ins that either ask a client over the connection (the
+thread waits; the event loop carries on), or run a computer strategy in a pool of worker processes, so a slow
+best_play takes a core of its own and never holds up the other tables or the event loop.
+
+    python server.py serve --port 7777
+    python server.py load --game uno --tables 64 --games 5
+
+load runs a server and client stand-ins in this process and reports how it stood up: UNO stand-ins play their
+tables against clueless with random legal moves, Scrabble stand-ins watch best_strat play itself.
+'''
+
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import Scrabble
+import UNO
+import tournament
+
+GAMES = {'scrabble': Scrabble, 'uno': UNO}
+STRATEGIES = {'scrabble': ('best_strat', 'best_strat2', 'leaves.leave_strat', 'simulation.sim_strat'),
+              'uno': ('clueless', 'clueless2', 'ismcts.ismcts_strat')}  # The computer players a client can seat
+MAX_TABLES = 256  # Tables playing at once (each has a thread while it plays)
+DIRECTIONS = {'ACROSS': Scrabble.ACROSS, 'DOWN': Scrabble.DOWN}
+
+
+class TableClosed(Exception):
+    "A player has left the table, so its game can't go on."
+
+
+class Client:
+    "A connection to the server, and the seats it holds at tables: {table id: seat number}."
+
+    def __init__(self, writer):
+        self.writer, self.seats = writer, {}
+        self.encode = json.JSONEncoder(separators=(',', ':')).encode
+
+    def send(self, message):
+        if not self.writer.is_closing():
+            self.writer.write(self.encode(message).encode() + b'\n')
+
+
+class Seat:
+    "A human player's seat at a table: the client sitting there, and the moves it has sent that aren't used yet."
+
+    def __init__(self, client=None):
+        self.client, self.moves = client, asyncio.Queue()
+
+    async def next_move(self):
+        move = await self.moves.get()
+        if move is None:
+            raise TableClosed()
+        return move
+
+
+class Table:
+    """A game between two seats, each a Seat or the name of a computer strategy. Clients seated at the table or
+    watching it get its events."""
+
+    def __init__(self, server, n, game, seats, seed=None):
+        self.server, self.id, self.game, self.seats = server, n, game, seats
+        self.rng = random.Random(seed)  # The table's own deal and draws: threads don't share the random module's
+        self.watchers, self.started, self.creator = set(), False, None
+
+    def is_ready(self):
+        return all(not isinstance(seat, Seat) or seat.client for seat in self.seats)
+
+    def open_seat(self):
+        "The number of an open seat, or None."
+        return next((n for (n, seat) in enumerate(self.seats) if isinstance(seat, Seat) and not seat.client), None)
+
+    def play(self):
+        "Play the game, in a thread of the server's table pool. Return what play_game returns."
+        module = GAMES[self.game]
+        players = [self.human(n, seat) if isinstance(seat, Seat) else self.computer(tournament.strategy(seat, module))
+                   for (n, seat) in enumerate(self.seats)]
+        return module.play_game(*players, verbose=False, observers=[self.observe], rng=self.rng)
+
+    def computer(self, strategy):
+        "A player that has strategy choose its moves in the server's process pool, and times how long that takes."
+        pool, latencies = self.server.pool, self.server.latencies
+
+        def move(*args):
+            t = time.perf_counter()
+            result = pool.submit(strategy, *args).result()
+            latencies.append(time.perf_counter() - t)
+            return result
+        move.__name__ = strategy.__name__
+        return move
+
+    def human(self, n, seat):
+        "A player that asks the client in seat n for its moves, and waits for the answer."
+        ask, loop = (self.ask_scrabble if self.game == 'scrabble' else self.ask_uno), self.server.loop
+
+        def move(*args):
+            return asyncio.run_coroutine_threadsafe(ask(n, seat, *args), loop).result()
+        move.__name__ = 'human'
+        return move
+
+    async def ask_scrabble(self, n, seat, hand, board):
+        "Ask for a Scrabble move until the client sends a legal one."
+        seat.client.send({'event': 'turn', 'table': self.id, 'seat': n, 'hand': hand})
+        while True:
+            move = await seat.next_move()
+            if move == 'pass':
+                return Scrabble.NOPLAY
+            try:
+                word, (i, j), direction = move
+                target = ((i, j), DIRECTIONS[direction.upper()], word)
+            except (TypeError, ValueError, KeyError, AttributeError):
+                seat.client.send({'event': 'error', 'table': self.id, 'message': 'a move is [word, [i, j], '
+                                  '"ACROSS" or "DOWN"], or "pass"'})
+                continue
+            plays = await self.server.loop.run_in_executor(self.server.pool, Scrabble.all_plays, hand, board)
+            for play in plays:
+                if play[1:] == target:
+                    return play
+            seat.client.send({'event': 'error', 'table': self.id, 'message': 'not a legal play'})
+
+    async def ask_uno(self, n, seat, state):
+        "Ask for an UNO move until the client sends a legal one."
+        p, hand, _, top, _, pick = state
+        legal = UNO.legal_moves(state)
+        seat.client.send({'event': 'turn', 'table': self.id, 'seat': n, 'hand': hand, 'top': top, 'pick': pick,
+                          'legal': legal if isinstance(legal, str) else sorted(legal)})
+        while True:
+            move = await seat.next_move()
+            if isinstance(legal, str):
+                if move == legal:
+                    return move
+            elif isinstance(move, str) and len(move) == 2 and (
+                    move in legal or (move[0] in 'RGBY' and move[1] in 'WF' and '?' + move[1] in legal)):
+                return move
+            seat.client.send({'event': 'error', 'table': self.id, 'message': 'not a legal move'})
+
+    def observe(self, event):
+        "Pass an event of the game (in the table's thread) on to the clients, from the event loop."
+        self.server.loop.call_soon_threadsafe(self.broadcast, event)
+
+    def broadcast(self, event):
+        if event['event'] == 'move':
+            self.server.moves += 1
+        for client in list(self.watchers):
+            client.send(private(dict(event, table=self.id), client.seats.get(self.id)))
+
+
+def private(event, seat):
+    "An event as the player in seat sees it: without the other player's hand, or what they drew. (Watchers see all.)"
+    if seat is None:
+        return event
+    if event['event'] == 'start':
+        event['hands'] = [hand if n == seat else None for (n, hand) in enumerate(event['hands'])]
+    elif event['event'] == 'move':
+        drawn = event['drawn']
+        if isinstance(drawn, list):  # UNO: the cards each player drew
+            event['drawn'] = [d if n == seat else len(d) for (n, d) in enumerate(drawn)]
+        elif event['player'] != seat:  # Scrabble: the tiles the player who moved drew
+            event['drawn'] = len(drawn)
+    return event
+
+
+class Server:
+    "The tables, the pools that play them, and counts of what has happened."
+
+    def __init__(self, workers=None, max_tables=MAX_TABLES):
+        # Workers forked from this process would hold copies of the clients' sockets, and keep them open
+        self.pool = ProcessPoolExecutor(workers or os.cpu_count(), multiprocessing.get_context('forkserver'),
+                                        initializer=tournament.start_worker)
+        self.table_pool = ThreadPoolExecutor(max_tables)
+        self.max_tables, self.tables, self.ids = max_tables, {}, itertools.count(1)
+        self.clients = set()
+        self.finished = self.aborted = self.moves = 0
+        self.latencies = []
+        self.loop = None
+
+    async def start(self, host='127.0.0.1', port=7777):
+        "Start listening; return the asyncio server."
+        self.loop = asyncio.get_running_loop()
+        return await asyncio.start_server(self.connect, host, port)
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+        self.table_pool.shutdown(wait=False, cancel_futures=True)
+
+    async def connect(self, reader, writer):
+        "Serve one client until it disconnects."
+        client = Client(writer)
+        self.clients.add(client)
+        try:
+            while line := await reader.readline():
+                try:
+                    message = json.loads(line)
+                    self.handle(client, message)
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    client.send({'event': 'error', 'message': 'bad command: {!r}'.format(e)})
+        finally:
+            self.clients.discard(client)
+            for table in list(self.tables.values()):
+                table.watchers.discard(client)
+                s = client.seats.get(table.id)
+                if table.started:
+                    if s is not None:
+                        table.seats[s].moves.put_nowait(None)
+                    continue
+                if s is not None:
+                    table.seats[s].client = None  # Open again, for someone else to join
+                if table.creator not in self.clients and not any(isinstance(seat, Seat) and seat.client
+                                                                 for seat in table.seats):
+                    del self.tables[table.id]
+            writer.close()
+
+    def handle(self, client, message):
+        cmd = message['cmd']
+        if cmd == 'new':
+            self.new_table(client, message['game'], message['seats'], message.get('seed'))
+        elif cmd == 'join':
+            self.join(client, self.tables[message['table']])
+        elif cmd == 'move':
+            n = message['table']
+            if n not in client.seats or n not in self.tables:
+                raise KeyError('no seat at table {}'.format(n))
+            self.tables[n].seats[client.seats[n]].moves.put_nowait(message['move'])
+        elif cmd == 'stats':
+            client.send(dict(event='stats', **self.stats()))
+        else:
+            raise KeyError(cmd)
+
+    def new_table(self, client, game, seats, seed=None):
+        if len(self.tables) >= self.max_tables:
+            return client.send({'event': 'error', 'message': 'the server is full'})
+        if game not in GAMES or len(seats) != 2:
+            return client.send({'event': 'error', 'message': 'a table is a game ("uno" or "scrabble") and 2 seats'})
+        if seats.count('human') > 1:
+            return client.send({'event': 'error', 'message': 'a client can take only one seat at a table'})
+        for seat in seats:
+            if seat not in ('human', 'open') + STRATEGIES[game]:
+                return client.send({'event': 'error', 'message': 'a seat is "human", "open" or one of '
+                                    + ', '.join(STRATEGIES[game])})
+        table = Table(self, next(self.ids), game,
+                      [Seat(client if seat == 'human' else None) if seat in ('human', 'open') else seat
+                       for seat in seats], seed)
+        self.tables[table.id] = table
+        table.creator = client
+        table.watchers.add(client)
+        for (n, seat) in enumerate(seats):
+            if seat == 'human':
+                client.seats[table.id] = n
+        client.send({'event': 'table', 'table': table.id, 'game': game, 'seat': client.seats.get(table.id)})
+        if table.is_ready():
+            self.start_table(table)
+
+    def join(self, client, table):
+        if table.id in client.seats:
+            return client.send({'event': 'error', 'message': 'already seated at table {}'.format(table.id)})
+        n = table.open_seat()
+        if n is not None:
+            table.seats[n].client = client
+            client.seats[table.id] = n
+        table.watchers.add(client)
+        client.send({'event': 'table', 'table': table.id, 'game': table.game, 'seat': n})
+        if n is not None and table.is_ready():
+            self.start_table(table)
+
+    def start_table(self, table):
+        table.started = True
+        self.loop.create_task(self.run(table))
+
+    async def run(self, table):
+        "Play a table's game in the table pool, then close the table."
+        try:
+            await self.loop.run_in_executor(self.table_pool, table.play)
+            self.finished += 1
+        except TableClosed:
+            self.aborted += 1
+            table.broadcast({'event': 'aborted'})
+        finally:
+            del self.tables[table.id]
+
+    def stats(self):
+        return {'tables': len(self.tables), 'finished': self.finished, 'aborted': self.aborted, 'moves': self.moves,
+                'workers': self.pool._max_workers, 'move_seconds': tournament.describe(self.latencies)}
+
+
+async def stand_in(host, port, game, results, rng):
+    """A client stand-in that plays one table and records how it went in results: an UNO table against clueless,
+    moving at random, or a Scrabble table of best_strat against itself, watching."""
+    reader, writer = await asyncio.open_connection(host, port)
+    seats = ['human', 'clueless'] if game == 'uno' else ['best_strat', 'best_strat']
+    writer.write(json.dumps({'cmd': 'new', 'game': game, 'seats': seats}).encode() + b'\n')
+    sent = None
+    while line := await reader.readline():
+        event = json.loads(line)
+        if event['event'] == 'turn':
+            if sent is not None:
+                results['turn_seconds'].append(time.perf_counter() - sent)
+            legal = event['legal']
+            move = legal if isinstance(legal, str) else rng.choice(legal)
+            if move[0] == '?':
+                move = rng.choice('RGBY') + move[1]
+            writer.write(json.dumps({'cmd': 'move', 'table': event['table'], 'move': move}).encode() + b'\n')
+            sent = time.perf_counter()
+        elif event['event'] == 'error' and 'table' not in event:
+            results['refused'] += 1
+            break
+        elif event['event'] in ('end', 'aborted'):
+            results['games'] += 1
+            break
+    writer.close()
+    await writer.wait_closed()
+
+
+async def load_test(game='uno', tables=64, games=5, workers=None, seed=0):
+    "Run a server and tables stand-ins, each playing games one after the other. Return a report."
+    server = Server(workers, max(tables, MAX_TABLES))
+    listener = await server.start(port=0)
+    host, port = listener.sockets[0].getsockname()[:2]
+    results = {'games': 0, 'refused': 0, 'turn_seconds': []}
+
+    async def client(n):
+        rng = random.Random(seed * 1000003 + n)
+        for _ in range(games):
+            await stand_in(host, port, game, results, rng)
+
+    t = time.perf_counter()
+    await asyncio.gather(*[client(n) for n in range(tables)])
+    seconds = time.perf_counter() - t
+    while server.clients:  # Let the server see the stand-ins go
+        await asyncio.sleep(0.01)
+    listener.close()
+    stats = server.stats()
+    server.close()
+    cores = os.cpu_count()
+    return {'game': game, 'tables': tables, 'cores': cores, 'tables_per_core': tables / cores,
+            'seconds': seconds, 'games': results['games'], 'refused': results['refused'],
+            'games_per_second': results['games'] / seconds, 'moves_per_second': stats['moves'] / seconds,
+            'move_seconds': stats['move_seconds'], 'turn_seconds': tournament.describe(results['turn_seconds'])}
+
+
+def report(r):
+    print('{games} {game} games at {tables} tables on {cores} cores ({tables_per_core:.0f} tables/core) in '
+          '{seconds:.1f}s: {games_per_second:.1f} games/s, {moves_per_second:.0f} moves/s'.format(**r))
+    for (name, d) in (('computer move', r['move_seconds']), ('client turn round trip', r['turn_seconds'])):
+        if d['n']:
+            print('{:<24} ms  p50 {:8.2f}  p95 {:8.2f}  max {:8.2f}'.format(
+                name, 1000 * d['p50'], 1000 * d['p95'], 1000 * d['max']))
+
+
+async def serve(host, port, workers):
+    server = Server(workers)
+    listener = await server.start(host, port)
+    print('serving on {}:{}'.format(host, port))
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve UNO and Scrabble tables over TCP, or load test a server.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    s = commands.add_parser('serve', help='run the server')
+    s.add_argument('--host', default='127.0.0.1')
+    s.add_argument('--port', type=int, default=7777)
+    load = commands.add_parser('load', help='run a server and client stand-ins against it, and report')
+    load.add_argument('--game', choices=sorted(GAMES), default='uno')
+    load.add_argument('--tables', type=int, default=64, help='client stand-ins, each at one table at a time')
+    load.add_argument('--games', type=int, default=5, help='games each stand-in plays')
+    load.add_argument('--seed', type=int, default=0)
+    load.add_argument('--json', help='save the report to this JSON file')
+    for p in (s, load):
+        p.add_argument('--workers', type=int, default=None, help='processes for computer moves (default: cores)')
+    args = parser.parse_args(argv)
+    if args.command == 'serve':
+        asyncio.run(serve(args.host, args.port, args.workers))
+    else:
+        r = asyncio.run(load_test(args.game, args.tables, args.games, args.workers, args.seed))
+        report(r)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(r, f, indent=1)
+        return r
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+'''
+A Scrabble player that looks ahead by simulation.
+
+It takes the few plays with the best points plus leave value (see leaves.py) as candidates, and plays each of them
+out against many racks the opponent might hold: racks are drawn from the unseen tiles (the full bag less the tiles on
+the board and in hand, which is what is left in the bag and on the opponent's rack). A candidate's equity is its
+points, less the points of the opponent's best reply, plus the value of the tiles it leaves, averaged over the racks.
+Every candidate is tried against the same racks, so differences between them are not down to luck of the draw.
+
+Each move has a wall-clock budget (SECONDS, counted from when the strategy is called). Racks are played out round by
+round until it runs out, dropping candidates whose equity is clearly (Z standard errors) below the leader's as
+they go, and stopping early if only one is left. Whatever has finished by the deadline decides the move: a rack
+counts only once it has been played out against every live candidate, so that they are all scored on the same
+racks, however many of them were tried against the last rack when time ran out.
+
+Rollouts run in the calling process unless start_pool has been called, in which case a pool of worker processes
+shares them out (threads would not help: move generation holds the GIL). Tournament workers don't start pools, so
+
+    python tournament.py scrabble simulation.sim_strat best_strat -n 20
+
+plays each game's simulations in the worker playing it.
+'''
+
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import Scrabble
+import leaves
+
+CANDIDATES = 8  # How many plays to simulate
+SECONDS = 1.0  # Budget per move
+MIN_SAMPLES = 4  # Racks a candidate is tried against before it can be dropped
+Z = 2.0  # Standard errors between a candidate and the leader before it is dropped
+ROUND = 2  # Racks drawn per round (per worker, when there is a pool)
+
+POOL, WORKERS = None, 1  # The worker pool, once start_pool is called, and its size
+
+
+def start_pool(workers=None):
+    "Share rollouts out among a pool of worker processes (all cores by default) from now on."
+    global POOL, WORKERS
+    if POOL is None:
+        WORKERS = workers or os.cpu_count()
+        POOL = ProcessPoolExecutor(WORKERS)
+    return POOL
+
+
+def stop_pool():
+    "Go back to running rollouts in this process."
+    global POOL, WORKERS
+    if POOL is not None:
+        POOL.shutdown(cancel_futures=True)
+        POOL, WORKERS = None, 1
+
+
+def reply_scores(task):
+    """Make a play on a copy of the board, then find the opponent's best reply from each of a list of racks.
+    task is (board, play, racks); return the reply scores (0 for a pass)."""
+    board, play, racks = task
+    board = board.copy()
+    Scrabble.make_play(play, board, '')
+    scores = []
+    for rack in racks:
+        reply = Scrabble.best_play(rack, board)
+        scores.append(reply[0] if reply else 0)
+    return scores
+
+
+def unseen_tiles(hand, board):
+    """The tiles that are not on the board or in hand: the bag and the opponent's rack. (Tiles that aren't in the
+    full bag, as on a made-up board, are ignored.)"""
+    tiles = list(Scrabble.TILES)
+    for L in Scrabble.tiles(''.join(chr(sq) for sq in board.letters if sq > Scrabble.BORDER)) + hand:
+        if L in tiles:
+            tiles.remove(L)
+    return tiles
+
+
+class Candidate:
+    "A play being simulated: its points and leave value, and the sum and sum of squares of its equity samples."
+
+    __slots__ = ('play', 'base', 'n', 'total', 'squares')
+
+    def __init__(self, play, base):
+        self.play, self.base = play, base
+        self.n, self.total, self.squares = 0, 0.0, 0.0
+
+    def add(self, reply_score):
+        equity = self.base - reply_score
+        self.n += 1
+        self.total += equity
+        self.squares += equity * equity
+
+    def mean(self):
+        return self.total / self.n if self.n else self.base
+
+    def stderr(self):
+        if self.n < 2:
+            return float('inf')
+        variance = max(0.0, (self.squares - self.total * self.total / self.n) / (self.n - 1))
+        return (variance / self.n) ** 0.5
+
+
+def candidates(hand, board, k=CANDIDATES, bag_empty=False):
+    "The k plays with the most points plus leave value (or just points, if the bag is empty), best first."
+    values = {}
+    result = []
+    for play in Scrabble.all_plays(hand, board):
+        if bag_empty:
+            base = play[0]
+        else:
+            played = Scrabble.tiles_played(play, board)
+            if played not in values:
+                values[played] = leaves.leave_value(Scrabble.removed(hand, played))
+            base = play[0] + values[played]
+        result.append(Candidate(play, base))
+    result.sort(key=lambda c: (c.base, c.play), reverse=True)
+    return result[:k]
+
+
+def prune(live):
+    "The candidates that might still be best: those whose equity isn't clearly below the leader's."
+    if any(c.n < MIN_SAMPLES for c in live):
+        return live
+    leader = max(live, key=Candidate.mean)
+    bar = leader.mean() - Z * leader.stderr()
+    return [c for c in live if c is leader or c.mean() + Z * c.stderr() >= bar]
+
+
+def simulate(hand, board, k=CANDIDATES, seconds=SECONDS, rng=random, deadline=None):
+    """Simulate the top k candidate plays until the budget of seconds runs out (or deadline, a time.perf_counter
+    time, is reached) or a single candidate is left. Return the candidates, best first."""
+    deadline = deadline or time.perf_counter() + seconds
+    unseen = unseen_tiles(hand, board)
+    bag_empty = len(unseen) <= 7  # The opponent holds all the unseen tiles
+    cands = candidates(hand, board, k, bag_empty)
+    live = cands
+    while len(live) > 1 and time.perf_counter() < deadline:
+        # One round: the same freshly drawn racks against every live candidate.
+        racks = [''.join(rng.sample(unseen, min(7, len(unseen)))) for _ in range(1 if bag_empty else ROUND * WORKERS)]
+        if POOL is None:
+            play_round(board, live, racks, deadline)
+        else:
+            play_round_in_pool(board, live, racks, deadline)
+        if bag_empty:
+            break  # There is only one rack to try
+        live = prune(live)
+    return sorted(cands, key=lambda c: (c.n > 0, c.mean()), reverse=True)
+
+
+def play_round(board, live, racks, deadline):
+    """Play out each rack against every live candidate in this process, stopping at the deadline. A rack not played
+    out against all of them by then isn't counted."""
+    for rack in racks:
+        scores = []
+        for c in live:
+            if time.perf_counter() >= deadline:
+                return
+            scores.append(reply_scores((board, c.play, [rack]))[0])
+        for (c, score) in zip(live, scores):
+            c.add(score)
+
+
+def play_round_in_pool(board, live, racks, deadline):
+    """Play out the racks against the live candidates in the pool, one task per candidate and rack (so a task takes
+    only as long as one move generation). Only the racks played out against all of them by the deadline are
+    counted."""
+    futures = {POOL.submit(reply_scores, (board, c.play, [rack])): (n, c) for (n, rack) in enumerate(racks)
+               for c in live}
+    scores = [{} for _ in racks]  # {candidate: reply score} for each rack
+    pending = set(futures)
+    while pending:
+        timeout = deadline - time.perf_counter()
+        if timeout <= 0:
+            break
+        done, pending = wait(pending, timeout, FIRST_COMPLETED)
+        for f in done:
+            n, c = futures[f]
+            scores[n][c] = f.result()[0]
+    for f in pending:
+        f.cancel()
+    for rack_scores in scores:
+        if len(rack_scores) == len(live):
+            for c in live:
+                c.add(rack_scores[c])
+
+
+def sim_strat(hand, board):
+    "The candidate play with the best simulated equity, chosen within SECONDS."
+    deadline = time.perf_counter() + SECONDS
+    ranked = simulate(hand, board, deadline=deadline)
+    return ranked[0].play if ranked else Scrabble.NOPLAY
@@ -0,0 +1,251 @@
+'''
+Snapshots of games in progress: compact binary records of a position, to pause a game and resume it later (or in
+another process), or to hand positions to searches and analyses without pickling them.
+
+A snapshot is bytes of a fixed layout, in little-endian order whatever the machine: a header (MAGIC, the format
+VERSION and the kind of game), then the fields of its kind, each at a fixed offset, so that every snapshot of a kind
+is the same size. There are three kinds:
+
+    Scrabble   the position play_game goes on from, (state, board, passes): the player to move, the scores and
+               racks, the bag in order, and the board with its anchors, cross-checks and cross sums, so that it
+               doesn't have to be worked out again
+    UNO        an UNO.py state: the player to move, whether they have picked, the top card, the two hands (as counts
+               of each card, so a resumed hand is in card order) and the deck in order
+    engine     an uno_engine.UnoGame: its rules, the players and direction of play, their hands, the draw and
+               discard piles in order (only the last DECK_SIZE cards of the discard pile, by rules that don't recycle
+               it, as they never draw on it), and the rest of its state; not its random number generator, which is
+               given when it is loaded
+
+A snapshot from another format VERSION, or of another kind, is refused with a SnapshotError.
+
+Loading a snapshot makes new objects, which can be played on at once. To try out moves from a position many times
+over, clone it instead: clone_scrabble shares the board (see Scrabble.Board.clone) until a move is made on it, and
+copies only the racks and bag; UnoGame.copy copies the game's lists.
+
+    state, board, passes = position = snapshot.load_scrabble(data)
+    Scrabble.play_game(A, B, position=position)
+
+    python snapshot.py scrabble --seed 3 --moves 10
+'''
+
+import argparse
+import random
+import struct
+import sys
+import time
+from array import array
+
+import Scrabble
+import UNO
+import tournament
+import uno_engine
+
+MAGIC, VERSION = b'GSNP', 2
+SCRABBLE, UNO_STATE, ENGINE = b'S', b'U', b'E'  # The kinds of snapshot
+HEADER = struct.Struct('<4sBc')  # magic, version, kind
+SQUARES = Scrabble.SIZE * Scrabble.SIZE
+DECK_SIZE = len(uno_engine.DECK)
+CARDS = 54  # Cards in uno_engine's numbering: hands are counts of each
+NO_PLAYER = 255
+
+# Scrabble: player to move, passes, scores, racks (length and tiles), bag (length and tiles); then the squares of the
+# board and of its transpose, and the arrays (see packed) of checks (unsigned 32-bit) and of cross sums (signed
+# 16-bit), across and down.
+SCRABBLE_FIELDS = struct.Struct('<BBiiB7sB7sB{}s{}s{}s{}s{}s{}s{}s'.format(
+    len(Scrabble.TILES), SQUARES, SQUARES, 4 * SQUARES, 4 * SQUARES, 2 * SQUARES, 2 * SQUARES))
+# UNO.py state: player to move, picked, top card; the two hands; deck (length and cards). Cards are numbered as in
+# UNO_NAMES.
+UNO_FIELDS = struct.Struct('<BBB{}s{}sB{}s'.format(CARDS, CARDS, DECK_SIZE))
+# uno_engine: hand size, rule flags, players, player to move, direction, top color and face, picked, penalty,
+# bluffed (0 for None, else 1 + bluffed), offender (NO_PLAYER for None), turns; the draw pile and the discard pile
+# (length and cards); then the hands, MAX_PLAYERS of them (those of absent players are all zero).
+ENGINE_FIELDS = struct.Struct('<BBBBbBBBHBBIB{}sB{}s{}s'.format(DECK_SIZE, DECK_SIZE, uno_engine.MAX_PLAYERS * CARDS))
+RULE_FLAGS = ('recycle', 'draw_skips', 'stacking', 'challenge')
+UNO_NAMES = [uno_engine.card_name(card) for card in range(CARDS)] + [C + '?' for C in uno_engine.COLORS]
+UNO_CODES = {name: code for (code, name) in enumerate(UNO_NAMES)}
+LITTLE = sys.byteorder == 'little'
+
+
+class SnapshotError(ValueError):
+    "The bytes are not a snapshot this version can load."
+
+
+def header(kind):
+    return HEADER.pack(MAGIC, VERSION, kind)
+
+
+def fields(data, kind, layout):
+    "The fields of a snapshot of this kind, after checking its header and size."
+    if len(data) != HEADER.size + layout.size:
+        raise SnapshotError('a snapshot of kind {!r} is {} bytes, not {}'.format(kind, HEADER.size + layout.size,
+                                                                                 len(data)))
+    magic, version, found = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or found != kind:
+        raise SnapshotError('not a version {} snapshot of kind {!r}: {!r}'.format(VERSION, kind,
+                                                                               (magic, version, found)))
+    return layout.unpack_from(data, HEADER.size)
+
+
+def packed(typecode, values):
+    "The bytes of values as an array of this type, little-endian."
+    a = array(typecode, values)
+    if not LITTLE: a.byteswap()
+    return a.tobytes()
+
+
+def unpacked(typecode, data):
+    "The list of values in the bytes of a little-endian array of this type."
+    a = array(typecode)
+    a.frombytes(data)
+    if not LITTLE: a.byteswap()
+    return a.tolist()
+
+
+def dump_scrabble(state, board, passes=0):
+    "A snapshot of a Scrabble position: state is as in play_game, (p, (hand0, score0), (hand1, score1), bag)."
+    (p, (hand0, score0), (hand1, score1), bag) = state
+    checks, cross_sums = board.checks, board.cross_sums
+    return header(SCRABBLE) + SCRABBLE_FIELDS.pack(
+        p, passes, score0, score1, len(hand0), hand0.encode(), len(hand1), hand1.encode(),
+        len(bag), ''.join(bag).encode(), bytes(board.letters), bytes(board.transposed),
+        packed('I', checks[Scrabble.ACROSS]), packed('I', checks[Scrabble.DOWN]),
+        packed('h', cross_sums[Scrabble.ACROSS]), packed('h', cross_sums[Scrabble.DOWN]))
+
+
+def load_scrabble(data):
+    "The position (state, board, passes) in a Scrabble snapshot."
+    (p, passes, score0, score1, n0, hand0, n1, hand1, n, bag, letters, transposed,
+     checks_across, checks_down, sums_across, sums_down) = fields(data, SCRABBLE, SCRABBLE_FIELDS)
+    board = Scrabble.Board.__new__(Scrabble.Board)
+    board.letters, board.transposed, board.shared = bytearray(letters), bytearray(transposed), False
+    board.checks = {Scrabble.ACROSS: unpacked('I', checks_across), Scrabble.DOWN: unpacked('I', checks_down)}
+    board.cross_sums = {Scrabble.ACROSS: unpacked('h', sums_across), Scrabble.DOWN: unpacked('h', sums_down)}
+    state = (p, (hand0[:n0].decode(), score0), (hand1[:n1].decode(), score1), list(bag[:n].decode()))
+    return state, board, passes
+
+
+def clone_scrabble(position):
+    "A copy of a Scrabble position (state, board, passes) to play on, sharing the board until a move is made on it."
+    (p, hand0, hand1, bag), board, passes = position
+    return (p, hand0, hand1, bag[:]), board.clone(), passes
+
+
+def dump_uno(state):
+    "A snapshot of an UNO.py state (p, hand0, hand1, top_card, deck, pick)."
+    p, hand0, hand1, top_card, deck, pick = state
+    return header(UNO_STATE) + UNO_FIELDS.pack(p, pick, UNO_CODES[top_card], card_counts(hand0), card_counts(hand1),
+                                               len(deck), bytes(UNO_CODES[card] for card in deck))
+
+
+def card_counts(hand):
+    "The counts of each card in a hand of UNO.py card names, as bytes."
+    counts = bytearray(CARDS)
+    for card in hand:
+        counts[UNO_CODES[card]] += 1
+    return bytes(counts)
+
+
+def load_uno(data):
+    "The UNO.py state in a snapshot."
+    p, pick, top, counts0, counts1, n, deck = fields(data, UNO_STATE, UNO_FIELDS)
+    hand0 = [UNO_NAMES[card] for card in range(CARDS) for _ in range(counts0[card])]
+    hand1 = [UNO_NAMES[card] for card in range(CARDS) for _ in range(counts1[card])]
+    return (p, hand0, hand1, UNO_NAMES[top], [UNO_NAMES[card] for card in deck[:n]], pick)
+
+
+def dump_engine(game):
+    "A snapshot of an uno_engine game (all but its random number generator)."
+    rules = game.rules
+    flags = sum(1 << n for (n, name) in enumerate(RULE_FLAGS) if getattr(rules, name))
+    discard = game.discard[-DECK_SIZE:]
+    hands = b''.join(bytes(hand) for hand in game.hands)
+    return header(ENGINE) + ENGINE_FIELDS.pack(
+        rules.hand_size, flags, game.players, game.player, game.direction, game.top_color, game.top_face,
+        game.picked, game.penalty, 0 if game.bluffed is None else 1 + game.bluffed,
+        NO_PLAYER if game.offender is None else game.offender, game.turns,
+        len(game.deck), bytes(game.deck), len(discard), bytes(discard), hands)
+
+
+def load_engine(data, rng):
+    "The uno_engine game in a snapshot, drawing on rng from here on."
+    (hand_size, flags, players, player, direction, top_color, top_face, picked, penalty, bluffed, offender, turns,
+     n, deck, m, discard, hands) = fields(data, ENGINE, ENGINE_FIELDS)
+    rules = uno_engine.Rules(hand_size, *[bool(flags >> n & 1) for n in range(len(RULE_FLAGS))])
+    game = uno_engine.UnoGame.__new__(uno_engine.UnoGame)
+    game.rng, game.rules, game.players = rng, rules, players
+    game.deck, game.discard = list(deck[:n]), list(discard[:m])
+    game.hands, game.colors, game.faces = [None] * players, [None] * players, [None] * players
+    game.sizes = [0] * players
+    for p in range(players):
+        counts = hands[p * CARDS:(p + 1) * CARDS]
+        game.set_hand(p, [card for card in range(CARDS) for _ in range(counts[card])])
+    game.player, game.direction, game.top_color, game.top_face = player, direction, top_color, top_face
+    game.picked, game.penalty, game.turns = bool(picked), penalty, turns
+    game.bluffed = None if not bluffed else bool(bluffed - 1)
+    game.offender = None if offender == NO_PLAYER else offender
+    return game
+
+
+def timed(f, *args, repeat=1000):
+    "The result of f(*args), and the average seconds it took over repeat calls."
+    t = time.perf_counter()
+    for _ in range(repeat):
+        result = f(*args)
+    return result, (time.perf_counter() - t) / repeat
+
+
+def over(args):
+    print('the {} game was over in fewer than {} moves'.format(args.game, args.moves))
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pause a game, snapshot it, and resume it from the snapshot.')
+    parser.add_argument('game', choices=('scrabble', 'uno', 'engine'))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--moves', type=int, default=10, help='moves to play before pausing')
+    args = parser.parse_args(argv)
+    seen = []
+
+    def pause(position):
+        seen.append(position)
+        return len(seen) > args.moves
+
+    if args.game == 'scrabble':
+        rng = random.Random(args.seed)
+        Scrabble.play_game(Scrabble.best_strat, Scrabble.best_strat, False, rng=rng, pause=pause)
+        if len(seen) <= args.moves:
+            return over(args)
+        data, dump_seconds = timed(dump_scrabble, *seen[-1])
+        position, load_seconds = timed(load_scrabble, data)
+        result = Scrabble.play_game(Scrabble.best_strat, Scrabble.best_strat, False, rng=rng, position=position)[:2]
+        whole = Scrabble.play_game(Scrabble.best_strat, Scrabble.best_strat, False, rng=random.Random(args.seed))[:2]
+    elif args.game == 'uno':
+        # A paused game has drawn nothing more from its generator, or from the random module (which clueless draws
+        # on), so the resumed game goes on drawing from them as the game played straight through does.
+        rng = tournament.game_rng(args.seed)
+        UNO.play_game(UNO.clueless, UNO.clueless, False, rng=rng, pause=pause)
+        if len(seen) <= args.moves:
+            return over(args)
+        data, dump_seconds = timed(dump_uno, seen[-1])
+        state, load_seconds = timed(load_uno, data)
+        winner, turns, _ = UNO.play_game(UNO.clueless, UNO.clueless, False, rng=rng, state=state)
+        result = winner, args.moves + turns  # The turns before the pause, and those after it
+        whole = UNO.play_game(UNO.clueless, UNO.clueless, False, rng=tournament.game_rng(args.seed))[:2]
+    else:
+        strategies = (uno_engine.random_play, uno_engine.random_play)
+        game = uno_engine.UnoGame(random.Random(args.seed))
+        if uno_engine.play_table(strategies, None, max_turns=args.moves, game=game)[0] is not None:
+            return over(args)
+        data, dump_seconds = timed(dump_engine, game)
+        resumed, load_seconds = timed(load_engine, data, game.rng)
+        result = uno_engine.play_table(strategies, None, game=resumed)
+        whole = uno_engine.play_table(strategies, None, game=uno_engine.UnoGame(random.Random(args.seed)))
+    print('{} snapshot after {} moves: {} bytes, dumped in {:.1f} us, loaded in {:.1f} us'.format(
+        args.game, args.moves, len(data), 1e6 * dump_seconds, 1e6 * load_seconds))
+    print('resumed game: {}; the game played straight through: {}'.format(result, whole))
+    return result == whole
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+'''
+Game records: the position replayed from a game's logged events, after every move, is the game's live position.
+'''
+
+import random
+
+import pytest
+
+import Scrabble
+import UNO
+import gamelog
+import snapshot
+import tournament
+
+
+def logged(tmp_path, play_game, pause):
+    "Play a game, logging it to a file and calling pause with the live position before every move. Its events."
+    filename = str(tmp_path / 'games.jsonl')
+    with gamelog.Writer(filename) as writer:
+        play_game(observers=[writer], pause=pause)
+    [events] = gamelog.read_games(filename)
+    return events
+
+
+def scrabble_live(positions):
+    def pause(position):
+        (p, (hand0, score0), (hand1, score1), bag), board, passes = position
+        positions.append((p, [hand0, hand1], [score0, score1], Scrabble.board_rows(board)))
+        return False
+    return pause
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_scrabble_replay_matches_live_positions(tmp_path, seed):
+    live = []
+    events = logged(tmp_path, lambda **kw: Scrabble.play_game(Scrabble.best_strat, Scrabble.best_strat, False,
+                                                              rng=random.Random(seed), **kw), scrabble_live(live))
+    assert events[0]['event'] == 'start' and events[-1]['event'] == 'end'
+    for (k, (p, hands, scores, rows)) in enumerate(live):
+        position = gamelog.replay(events, k)
+        assert (position.player, position.hands, position.scores) == (p, hands, scores)
+        assert Scrabble.board_rows(position.board) == rows
+
+
+def test_scrabble_replay_of_a_resumed_game(tmp_path):
+    snapshots = []
+
+    def pause(position):
+        snapshots.append(snapshot.dump_scrabble(*position))
+        return len(snapshots) > 6
+    Scrabble.play_game(Scrabble.best_strat, Scrabble.best_strat, False, rng=random.Random(4), pause=pause)
+    live = []
+    position = snapshot.load_scrabble(snapshots[-1])
+    events = logged(tmp_path, lambda **kw: Scrabble.play_game(Scrabble.best_strat, Scrabble.best_strat, False,
+                                                              position=position, **kw), scrabble_live(live))
+    for (k, (p, hands, scores, rows)) in enumerate(live):
+        replayed = gamelog.replay(events, k)
+        assert (replayed.player, replayed.hands, replayed.scores) == (p, hands, scores)
+        assert Scrabble.board_rows(replayed.board) == rows
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_uno_replay_matches_live_positions(tmp_path, seed):
+    live = []
+
+    def pause(state):
+        p, hand, other, top, deck, pick = state
+        hands = [list(hand), list(other)] if p == 0 else [list(other), list(hand)]
+        live.append((p, hands, top))
+        return False
+    events = logged(tmp_path, lambda **kw: UNO.play_game(UNO.clueless, UNO.clueless, False,
+                                                         rng=tournament.game_rng(seed), **kw), pause)
+    for (k, (p, hands, top)) in enumerate(live):
+        position = gamelog.replay(events, k)
+        assert (position.player, position.hands, position.top) == (p, hands, top)
@@ -0,0 +1,51 @@
+'''
+The leave table's index: rank numbers the leaves of up to MAX_LEAVE tiles one to one, whatever their order.
+'''
+
+import itertools
+import random
+from array import array
+
+import leaves
+
+
+def test_rank_is_a_bijection_onto_the_table():
+    seen = bytearray(leaves.SIZE)
+    count = 0
+    for leave in leaves.all_leaves():
+        r = leaves.rank(leave)
+        assert 0 <= r < leaves.SIZE and not seen[r]
+        seen[r] = 1
+        count += 1
+    assert count == leaves.SIZE == 1107568
+
+
+def test_rank_orders_leaves_by_size_then_tiles():
+    assert leaves.rank('') == 0
+    assert [leaves.rank(L) for L in leaves.ALPHABET] == list(range(1, len(leaves.ALPHABET) + 1))
+    for k in range(leaves.MAX_LEAVE + 1):
+        assert leaves.rank('_' * k) == leaves.OFFSETS[k + 1] - 1
+
+
+def test_rank_ignores_the_order_of_the_tiles():
+    rng = random.Random(7)
+    for _ in range(200):
+        leave = ''.join(rng.choices(leaves.ALPHABET, k=rng.randint(1, leaves.MAX_LEAVE)))
+        ranks = {leaves.rank(''.join(p)) for p in itertools.permutations(leave)}
+        assert ranks == {leaves.rank(''.join(sorted(leave)))}
+
+
+def test_table_file_round_trip(tmp_path):
+    filename = str(tmp_path / 'leaves.bin')
+    table = array('h', (r % 65536 - 32768 for r in range(leaves.SIZE)))
+    leaves.save_table(table, filename, games=12, samples=345)
+    values, games, samples = leaves.read_table(filename)
+    assert (games, samples) == (12, 345)
+    assert values[leaves.rank('QU')] == table[leaves.rank('QU')]
+    assert list(values[:1000]) == list(table[:1000]) and list(values[-1000:]) == list(table[-1000:])
+
+
+def test_a_truncated_table_file_is_ignored(tmp_path):
+    filename = tmp_path / 'leaves.bin'
+    filename.write_bytes(b'LEAV' + bytes(100))
+    assert leaves.read_table(str(filename)) is None
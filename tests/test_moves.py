@@ -0,0 +1,131 @@
+'''
+The move generator (Scrabble.all_plays) against a brute-force oracle: every way of putting some of the rack's tiles
+in a row on the board, kept if it makes only words, and scored square by square from BONUS.
+'''
+
+import itertools
+import random
+
+import pytest
+
+import Scrabble
+from Scrabble import ACROSS, DOWN, DL, DW, TL, TW, POINTS, SIZE
+
+WORDS = Scrabble.readwords(Scrabble.WORDLIST)
+
+
+def grid(board):
+    "The board's squares as a dict {(i, j): letter} of its letters, and the set of its empty squares."
+    letters, empty = {}, set()
+    for (j, row) in enumerate(Scrabble.board_rows(board)):
+        for (i, sq) in enumerate(row):
+            if sq == '.':
+                empty.add((i, j))
+            elif sq != '|':
+                letters[(i, j)] = sq
+    return letters, empty
+
+
+def sequences(rack):
+    "Every sequence of tiles from rack, with a blank as each lowercase letter."
+    for k in range(1, len(rack) + 1):
+        for tiles in set(itertools.permutations(rack, k)):
+            choices = [Scrabble.LETTERS.lower() if t == '_' else t for t in tiles]
+            for letters in itertools.product(*choices):
+                yield letters
+
+
+def run(letters, square, step):
+    "The squares of the run of letters through square along step (square itself need not hold a letter yet)."
+    (i, j), (di, dj) = square, step
+    while (i - di, j - dj) in letters:
+        i, j = i - di, j - dj
+    squares = []
+    while (i, j) in letters or (i, j) == square:
+        squares.append((i, j))
+        i, j = i + di, j + dj
+    return squares
+
+
+def score(letters, placed, squares, step):
+    "The score of the word on squares, with the new tiles placed, and of the words across it that they make."
+    def word_score(word_squares):
+        total, mult = 0, 1
+        for sq in word_squares:
+            points = POINTS[letters[sq]]
+            if sq in placed:
+                bonus = Scrabble.BONUS[sq[1]][sq[0]]
+                points *= 3 if bonus == TL else 2 if bonus == DL else 1
+                mult *= 3 if bonus == TW else 2 if bonus in (DW, '*') else 1
+            total += points
+        return total * mult
+    across = (step[1], step[0])
+    crosses = [run(letters, sq, across) for sq in placed]
+    return word_score(squares) + sum(word_score(c) for c in crosses if len(c) > 1)
+
+
+def oracle(rack, board):
+    "All the legal plays of rack on board, found by trying everything."
+    letters, empty = grid(board)
+    start = Scrabble.BONUS_SQUARES.index(b'*')
+    start = (start % SIZE, start // SIZE)
+    plays = set()
+    for (direction, step) in ((ACROSS, ACROSS), (DOWN, DOWN)):
+        for first in empty:
+            for tiles in sequences(rack):
+                placed, (i, j), trial = [], first, dict(letters)
+                for L in tiles:
+                    while (i, j) in letters:
+                        i, j = i + step[0], j + step[1]
+                    if (i, j) not in empty:
+                        break
+                    trial[(i, j)] = L
+                    placed.append((i, j))
+                    i, j = i + step[0], j + step[1]
+                if len(placed) < len(tiles):
+                    continue
+                squares = run(trial, first, step)
+                if len(squares) < 2 or squares[0] != first and squares[0] not in letters:
+                    continue
+                word = ''.join(trial[sq] for sq in squares)
+                if word.upper() not in WORDS:
+                    continue
+                across = (step[1], step[0])
+                crosses = [run(trial, sq, across) for sq in placed]
+                if any(len(c) > 1 and ''.join(trial[sq] for sq in c).upper() not in WORDS for c in crosses):
+                    continue
+                touches = any(sq in letters for sq in squares) or any(len(c) > 1 for c in crosses)
+                if not (touches if letters else start in placed):
+                    continue
+                plays.add((score(trial, set(placed), squares, step), squares[0], direction, word))
+    return plays
+
+
+def positions():
+    "Boards after a few greedy moves of seeded games, each with a short rack (some with a blank) to play on it."
+    rng = random.Random(2024)
+    for (moves, rack) in [(0, 'RTA'), (0, 'Q_I'), (1, 'SEAT'), (2, 'ZOA'), (3, 'IN_'), (4, 'EXO'), (5, 'SLUR')]:
+        board = Scrabble.make_board()
+        for _ in range(moves):
+            hand = ''.join(rng.sample(Scrabble.TILES.replace('_', ''), 7))
+            play = Scrabble.best_play(hand, board)
+            if play:
+                Scrabble.make_play(play, board, hand)
+        yield board, rack
+
+
+@pytest.mark.parametrize('board, rack', list(positions()))
+def test_all_plays_matches_brute_force(board, rack):
+    Scrabble.clear_caches()
+    assert Scrabble.all_plays(rack, board) == oracle(rack, board)
+
+
+def test_rebuilt_board_generates_the_same_plays():
+    for (board, rack) in positions():
+        rebuilt = Scrabble.Board(''.join(Scrabble.board_rows(board)))
+        assert Scrabble.all_plays(rack, rebuilt) == Scrabble.all_plays(rack, board)
+
+
+def test_the_bag_holds_100_tiles_with_two_blanks():
+    assert len(Scrabble.TILES) == 100
+    assert Scrabble.TILES.count('_') == 2
@@ -0,0 +1,85 @@
+'''
+Snapshots: a game paused, dumped, loaded and resumed ends as the same game played straight through.
+'''
+
+import random
+
+import pytest
+
+import Scrabble
+import UNO
+import snapshot
+import tournament
+import uno_engine
+
+
+def pauses(snapshots, dump):
+    "A pause function for play_game that dumps every position it is given, and never pauses."
+    def pause(position):
+        snapshots.append(dump(position))
+        return False
+    return pause
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_scrabble_resumes_from_every_move(seed):
+    snapshots = []
+    whole = Scrabble.play_game(Scrabble.best_strat, Scrabble.best_strat, False, rng=random.Random(seed),
+                               pause=pauses(snapshots, lambda position: snapshot.dump_scrabble(*position)))[:2]
+    assert snapshots
+    for data in snapshots[::3]:
+        position = snapshot.load_scrabble(data)
+        assert snapshot.dump_scrabble(*position) == data
+        assert Scrabble.play_game(Scrabble.best_strat, Scrabble.best_strat, False, position=position)[:2] == whole
+
+
+def test_scrabble_clone_leaves_the_position_alone():
+    snapshots = []
+    Scrabble.play_game(Scrabble.best_strat, Scrabble.best_strat, False, rng=random.Random(5),
+                       pause=pauses(snapshots, lambda position: snapshot.dump_scrabble(*position)))
+    position = snapshot.load_scrabble(snapshots[len(snapshots) // 2])
+    Scrabble.play_game(Scrabble.best_strat, Scrabble.best_strat, False, position=snapshot.clone_scrabble(position))
+    assert snapshot.dump_scrabble(*position) == snapshots[len(snapshots) // 2]
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_uno_resumes(seed):
+    whole = UNO.play_game(UNO.clueless, UNO.clueless, False, rng=tournament.game_rng(seed))[:2]
+    moves = seed % 5 + 1
+    states = []
+
+    def pause(state):
+        states.append(state)
+        return len(states) > moves
+    rng = tournament.game_rng(seed)
+    UNO.play_game(UNO.clueless, UNO.clueless, False, rng=rng, pause=pause)
+    if len(states) <= moves:
+        pytest.skip('the game was over before the pause')
+    state = snapshot.load_uno(snapshot.dump_uno(states[-1]))
+    winner, turns, _ = UNO.play_game(UNO.clueless, UNO.clueless, False, rng=rng, state=state)
+    assert (winner, moves + turns) == whole
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_engine_resumes(seed):
+    setup = random.Random(seed)
+    rules = uno_engine.Rules(setup.choice([5, 7]), *[setup.random() < 0.5 for _ in range(4)])
+    players = setup.randint(2, 10)
+    strategies = [uno_engine.random_play] * players
+    game = uno_engine.UnoGame(random.Random(seed), rules, players)
+    if uno_engine.play_table(strategies, None, max_turns=setup.randint(0, 30), game=game)[0] is not None:
+        pytest.skip('the game was over before the pause')
+    data = snapshot.dump_engine(game)
+    resumed = snapshot.load_engine(data, random.Random())
+    resumed.rng.setstate(game.rng.getstate())
+    assert snapshot.dump_engine(resumed) == data
+    assert repr(resumed.rules) == repr(rules)
+    assert uno_engine.play_table(strategies, None, game=resumed) == uno_engine.play_table(strategies, None, game=game)
+
+
+def test_a_snapshot_of_another_kind_is_refused():
+    data = snapshot.dump_engine(uno_engine.UnoGame(random.Random(0)))
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.load_uno(data)
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.load_engine(data[:4] + bytes([snapshot.VERSION + 1]) + data[5:], random.Random())
@@ -0,0 +1,38 @@
+'''
+Scrabble.top_plays, the branch-and-bound search, against the n largest of all_plays.
+'''
+
+import random
+
+import pytest
+
+import Scrabble
+
+
+def positions(seed):
+    "The (hand, board) of every move of a seeded game of best_strat against itself."
+    seen = []
+
+    def watch(hand, board):
+        seen.append((hand, board.copy()))
+        return Scrabble.best_play(hand, board)
+    Scrabble.play_game(watch, watch, verbose=False, rng=random.Random(seed))
+    return seen
+
+
+@pytest.mark.parametrize('seed', [1, 2])
+@pytest.mark.parametrize('n', [1, 3, 10])
+def test_top_plays_are_the_largest_of_all_plays(seed, n):
+    for (hand, board) in positions(seed):
+        assert Scrabble.top_plays(hand, board, n) == sorted(Scrabble.all_plays(hand, board), reverse=True)[:n]
+
+
+def test_top_plays_with_blanks():
+    for (hand, board) in positions(3)[::4]:
+        hand = hand[:5] + '_'
+        assert Scrabble.top_plays(hand, board, 5) == sorted(Scrabble.all_plays(hand, board), reverse=True)[:5]
+
+
+def test_best_play_of_a_hand_with_no_play():
+    assert Scrabble.best_play('', Scrabble.make_board()) is Scrabble.NOPLAY
+    assert Scrabble.top_plays('', Scrabble.make_board(), 3) == []
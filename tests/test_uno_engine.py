@@ -0,0 +1,122 @@
+'''
+The UNO engine's rules, one variant at a time, on positions set up by hand; and its bookkeeping over whole games.
+'''
+
+import itertools
+import random
+
+import pytest
+
+import uno_engine
+from uno_engine import CHALLENGE, FOUR, FOUR_CARD, PICK, WILD_CARD, Rules
+
+
+def card(name):
+    "The engine's card for an UNO.py card name such as 'R7' or '?F'."
+    return {'?W': WILD_CARD, '?F': FOUR_CARD}.get(name) or uno_engine.parse_move(name)
+
+
+def table(rules, hands, top='R5'):
+    "A game by rules with these hands (of card names), top on the pile, and player 0 to move."
+    game = uno_engine.UnoGame(random.Random(0), rules, len(hands))
+    for (p, hand) in enumerate(hands):
+        game.set_hand(p, [card(name) for name in hand])
+    top = card(top)
+    game.top_color, game.top_face = uno_engine.CARD_COLOR[top], uno_engine.CARD_FACE[top]
+    game.player, game.direction, game.picked, game.penalty, game.bluffed, game.offender = 0, 1, False, 0, None, None
+    return game
+
+
+@pytest.mark.parametrize('draw_skips, next_to_move', [(True, 2), (False, 1)])
+def test_draw_two_skips_only_by_the_rules(draw_skips, next_to_move):
+    game = table(Rules(draw_skips=draw_skips), [['RD', 'G1'], ['B1'], ['Y1']])
+    game.move(card('RD'))
+    assert game.sizes[1] == 3 and game.penalty == 0
+    assert game.player == next_to_move
+
+
+def test_stacking_passes_draw_twos_on():
+    game = table(Rules(stacking=True), [['RD', 'G1'], ['BD', 'R3'], ['Y1', 'Y2']])
+    game.move(card('RD'))
+    assert (game.penalty, game.player, game.sizes[1]) == (2, 1, 2)
+    assert game.legal_cards() == [card('BD')]  # Only a Draw Two can pass it on, though R3 would match
+    game.move(card('BD'))
+    assert (game.penalty, game.player) == (4, 2)
+    assert game.legal_cards() == []
+    game.move(PICK)
+    assert (game.sizes[2], game.penalty, game.player) == (6, 0, 0)
+
+
+def test_stacking_passes_wild_draw_fours_on():
+    game = table(Rules(stacking=True), [['?F', 'G1'], ['?F', 'R3'], ['Y1']])
+    game.move(FOUR + 2)
+    assert (game.penalty, game.player, game.top_color) == (4, 1, 2)
+    assert game.legal_cards() == [FOUR_CARD]
+    game.move(FOUR + 0)
+    assert (game.penalty, game.player) == (8, 2)
+
+
+def test_without_stacking_a_draw_is_taken_at_once():
+    game = table(Rules(), [['RD', 'G1'], ['BD', 'R3']])
+    game.move(card('RD'))
+    assert (game.penalty, game.sizes[1], game.player) == (0, 4, 0)
+
+
+def test_a_successful_challenge_makes_the_bluffer_draw():
+    game = table(Rules(challenge=True), [['?F', 'R1', 'G1'], ['B1']])
+    game.move(FOUR + 1)
+    assert (game.bluffed, game.offender, game.penalty, game.player) == (True, 0, 4, 1)
+    game.move(CHALLENGE)
+    assert (game.sizes[0], game.sizes[1], game.penalty, game.player) == (6, 1, 0, 1)
+    assert game.bluffed is None
+
+
+def test_a_failed_challenge_costs_the_challenger_two_more():
+    game = table(Rules(challenge=True), [['?F', 'B2'], ['B1'], ['Y1']])
+    game.move(FOUR + 1)
+    assert game.bluffed is False
+    game.move(CHALLENGE)
+    assert (game.sizes[1], game.penalty, game.player) == (7, 0, 2)
+
+
+def test_an_unchallenged_wild_draw_four_is_drawn():
+    game = table(Rules(challenge=True), [['?F', 'R1', 'G1'], ['B1'], ['Y1']])
+    game.move(FOUR + 1)
+    game.move(PICK)
+    assert (game.sizes[1], game.penalty, game.player, game.bluffed) == (5, 0, 2, None)
+
+
+@pytest.mark.parametrize('players, next_to_move, direction', [(3, 2, -1), (2, 0, 1)])
+def test_reverse(players, next_to_move, direction):
+    game = table(Rules(), [['RR', 'G1']] + [['B1']] * (players - 1))
+    game.move(card('RR'))
+    assert (game.player, game.direction) == (next_to_move, direction)
+
+
+def test_a_player_who_plays_their_last_card_wins():
+    game = table(Rules(), [['R7'], ['B1']])
+    assert game.move(card('R7')) == 0
+
+
+RULE_SETS = [Rules(5, *flags) for flags in itertools.product((False, True), repeat=4)]
+
+
+@pytest.mark.parametrize('rules', RULE_SETS, ids=repr)
+def test_bookkeeping_over_random_games(rules):
+    for seed in range(5):
+        game = uno_engine.UnoGame(random.Random(seed), rules, 2 + seed)
+        for _ in range(300):
+            cards = game.legal_cards()
+            if cards or game.bluffed is not None:
+                move = uno_engine.random_play(game, cards)
+            else:
+                move = PICK if game.penalty or not game.picked else uno_engine.WAIT
+            if game.move(move) is not None:
+                break
+            for p in range(game.players):
+                hand = game.hands[p]
+                assert game.sizes[p] == sum(hand) and min(hand) >= 0
+                assert game.colors[p] == [sum(hand[c] for c in range(54) if uno_engine.CARD_COLOR[c] == k)
+                                          for k in range(5)]
+            if rules.recycle:  # No card comes in or goes out of the game
+                assert sum(map(sum, game.hands)) + len(game.deck) + len(game.discard) == len(uno_engine.DECK)
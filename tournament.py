@@ -0,0 +1,311 @@
+'''
+Tournaments between game strategies, played in parallel by a pool of worker processes.
+
+Every game gets its own seed, drawn from the tournament's seed. Its deal and draws come from a random.Random seeded
+with it (see game_rng), and the random module, which strategies draw on, is seeded from that before the game starts.
+So a tournament has the same results however many workers play it, and any single game can be played again
+from its seed, move for move:
+
+    python tournament.py scrabble best_strat best_strat2 -n 200 --seed 1 --replay 17
+
+The Scrabble lexicon is a memory-mapped file (see lexicon.py), so workers share it rather than each building their
+own.
+
+Summaries can be saved as JSON, and the games one per row as CSV, to track strategies from run to run.
+
+    python tournament.py scrabble best_strat best_strat2 -n 200 --seed 1
+    python tournament.py uno clueless clueless2 -n 10000 --json uno.json --csv uno.csv
+    python tournament.py uno clueless uno_engine.random_play -n 10000 --players 6
+    python tournament.py uno ismcts.ismcts_strat clueless -n 200
+
+UNO tournaments for more than two players are played by uno_engine, by the official rules: A takes one seat (each
+seat in turn, from game to game) and B all the others.
+'''
+
+import argparse
+import csv
+import importlib
+import json
+import math
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import Scrabble
+import UNO
+import uno_engine
+
+
+def game_seeds(seed, N):
+    "The seeds of the N games of a tournament with this seed."
+    rng = random.Random(seed)
+    return [rng.getrandbits(64) for _ in range(N)]
+
+
+def game_rng(seed):
+    """The random number generator for the deal and draws of the game with this seed. The random module is seeded from
+    it too, for strategies that make random choices: a worker process's games don't depend on what it played before."""
+    rng = random.Random(seed)
+    random.seed(rng.getrandbits(64))
+    return rng
+
+
+def start_worker():
+    "Map the lexicon when a worker process starts, so the first game it plays doesn't pay for it."
+    Scrabble.LEXICON.masks
+
+
+def scrabble_game(task, verbose=False):
+    """Play one tournament game. task is (n, seed, A, B, endgame); in even-numbered games A moves first, in odd ones
+    B; with endgame, the game is played out once the bag is empty (see Scrabble.play_game).
+    Return (n, seed, score_A, score_B, move_seconds_A, move_seconds_B)."""
+    n, seed, A, B, endgame = task
+    rng = game_rng(seed)
+    if n % 2 == 0:
+        score_a, score_b, (seconds_a, seconds_b) = Scrabble.play_game(A, B, verbose, rng=rng, endgame=endgame)
+    else:
+        score_b, score_a, (seconds_b, seconds_a) = Scrabble.play_game(B, A, verbose, rng=rng, endgame=endgame)
+    return n, seed, score_a, score_b, seconds_a, seconds_b
+
+
+def play_games(game, tasks, workers=None, initializer=None):
+    "Map game over tasks in a pool of workers (all cores by default); return the results in task order."
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(workers, initializer=initializer) as pool:
+        return list(pool.map(game, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+
+
+def scrabble_tournament(A, B, N=1000, seed=0, workers=None, endgame=False):
+    """Play N games between the Scrabble strategies A and B, taking turns to move first (and playing endgames out,
+    if endgame is set). Return a summary: see summarize."""
+    start_worker()  # Compile the lexicon here if it needs it, rather than in every worker at once
+    tasks = [(n, s, A, B, endgame) for (n, s) in enumerate(game_seeds(seed, N))]
+    t = time.perf_counter()
+    games = play_games(scrabble_game, tasks, workers, start_worker)
+    return summarize(A.__name__, B.__name__, games, seed, time.perf_counter() - t)
+
+
+def uno_game(task, verbose=False):
+    """Play one tournament game of UNO. task is (n, seed, A, B, alternate): A takes the first seat unless alternate
+    is set and n is odd. Return (n, seed, A_first, winner ('A' or 'B'), turns, decision_seconds_A, decision_seconds_B)."""
+    n, seed, A, B, alternate = task
+    rng = game_rng(seed)
+    a_first = not (alternate and n % 2)
+    winner, turns, seconds = UNO.play_game(*((A, B) if a_first else (B, A)), verbose, rng=rng)
+    seconds_a, seconds_b = seconds if a_first else seconds[::-1]
+    return n, seed, a_first, 'A' if (winner == 0) == a_first else 'B', turns, seconds_a, seconds_b
+
+
+def uno_table_game(task):
+    """Play one tournament game of UNO at a table of players, with uno_engine. task is (n, seed, A, B, players,
+    alternate): A takes seat n % players if alternate is set (else seat 0), and B every other seat. A and B can be
+    UNO.py strategies or uno_engine ones. Return as uno_game does; winner is None for a game called off."""
+    n, seed, A, B, players, alternate = task
+    rng = game_rng(seed)
+    seat = n % players if alternate else 0
+    seconds_a, seconds_b = [], []
+    a, b = timed(uno_engine.engine_strategy(A), seconds_a), timed(uno_engine.engine_strategy(B), seconds_b)
+    winner, turns = uno_engine.play_table([a if q == seat else b for q in range(players)], rng)
+    return n, seed, seat == 0, None if winner is None else 'A' if winner == seat else 'B', turns, seconds_a, seconds_b
+
+
+def timed(strategy, seconds):
+    "An uno_engine strategy that plays as strategy does, adding how long each of its decisions took to seconds."
+    def decide(game, cards):
+        t = time.perf_counter()
+        move = strategy(game, cards)
+        seconds.append(time.perf_counter() - t)
+        return move
+    return decide
+
+
+def uno_tournament(A, B, N=1000, seed=0, workers=None, alternate=True, players=2):
+    """Play N games between the UNO.py strategies A and B. With alternate, they take turns at the first seat (as playN
+    meant to), and the first seat's win rate measures its advantage; without, A always sits first. With more than
+    two players, games are played by uno_engine (see uno_table_game).
+    Return a summary: see summarize_uno."""
+    seeds = game_seeds(seed, N)
+    t = time.perf_counter()
+    if players == 2:
+        games = play_games(uno_game, [(n, s, A, B, alternate) for (n, s) in enumerate(seeds)], workers)
+    else:
+        games = play_games(uno_table_game, [(n, s, A, B, players, alternate) for (n, s) in enumerate(seeds)],
+                           workers)
+    return summarize_uno(A.__name__, B.__name__, games, seed, alternate, time.perf_counter() - t, players)
+
+
+def replay(game, A, B, n, seed=0, alternate=True, players=2, endgame=False):
+    """Play game n of the tournament with this seed again, printing it (unless uno_engine plays it); return its
+    result, which is the same as it was in the tournament."""
+    s = game_seeds(seed, n + 1)[n]
+    if game == 'scrabble':
+        return scrabble_game((n, s, A, B, endgame), verbose=True)
+    if players > 2:
+        return uno_table_game((n, s, A, B, players, alternate))
+    return uno_game((n, s, A, B, alternate), verbose=True)
+
+
+def describe(values):
+    "Summary statistics of a list of numbers."
+    if not values:
+        return {'n': 0}
+    ordered = sorted(values)
+    return {'n': len(values), 'mean': statistics.fmean(values),
+            'stdev': statistics.stdev(values) if len(values) > 1 else 0.0,
+            'min': ordered[0], 'p50': ordered[len(ordered) // 2],
+            'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 'max': ordered[-1]}
+
+
+def wilson(wins, n, z=1.96):
+    "The Wilson score interval (95% by default) for a win rate of wins out of n: (low, high)."
+    if not n:
+        return (0.0, 1.0)
+    p = wins / n
+    centre = (p + z * z / (2 * n)) / (1 + z * z / n)
+    spread = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return (centre - spread, centre + spread)
+
+
+def rate(wins, n):
+    "A win rate with its 95% confidence interval."
+    low, high = wilson(wins, n)
+    return {'wins': wins, 'rate': wins / n if n else 0.0, 'low': low, 'high': high}
+
+
+def summarize(name_a, name_b, games, seed, seconds):
+    """Summarize tournament games, each (n, seed, score_A, score_B, move_seconds_A, move_seconds_B):
+    wins and draws, the distributions of scores and of seconds per move, and each game's seed and scores."""
+    draws = sum(a == b for (_, _, a, b, _, _) in games)
+    players = {}
+    for (label, name, me) in (('A', name_a, 2), ('B', name_b, 3)):
+        them = 5 - me
+        players[label] = {
+            'strategy': name,
+            'wins': sum(g[me] > g[them] for g in games),
+            'scores': describe([g[me] for g in games]),
+            'move_seconds': describe([s for g in games for s in g[me + 2]])}
+    return {'game': 'scrabble', 'seed': seed, 'games': len(games), 'draws': draws, 'seconds': seconds,
+            'games_per_second': len(games) / seconds if seconds else 0.0,
+            'players': players,
+            'results': [(n, s, a, b) for (n, s, a, b, _, _) in games]}
+
+
+def summarize_uno(name_a, name_b, games, seed, alternate, seconds, seats=2):
+    """Summarize UNO tournament games, each (n, seed, A_first, winner, turns, decision_seconds_A, decision_seconds_B):
+    each strategy's win rate and decision times, the first seat's win rate (with two players), the game lengths,
+    and every game."""
+    N = len(games)
+    players = {}
+    for (label, name, me) in (('A', name_a, 5), ('B', name_b, 6)):
+        players[label] = {'strategy': name, **rate(sum(g[3] == label for g in games), N),
+                          'decision_seconds': describe([s for g in games for s in g[me]])}
+    first_seat = rate(sum((g[3] == 'A') == g[2] for g in games), N) if seats == 2 else None
+    return {'game': 'uno', 'seed': seed, 'games': N, 'alternate': alternate, 'seats': seats, 'seconds': seconds,
+            'games_per_second': N / seconds if seconds else 0.0,
+            'players': players, 'first_seat': first_seat,
+            'turns': describe([g[4] for g in games]),
+            'results': [(n, s, 'A' if a_first else 'B', winner, turns)
+                        for (n, s, a_first, winner, turns, _, _) in games]}
+
+
+RESULT_COLUMNS = {'scrabble': ('game', 'seed', 'score_A', 'score_B'),
+                  'uno': ('game', 'seed', 'first', 'winner', 'turns')}
+
+
+def write_json(summary, filename):
+    "Save a tournament summary as JSON."
+    with open(filename, 'w') as f:
+        json.dump(summary, f, indent=1)
+
+
+def write_csv(summary, filename):
+    "Save the games of a tournament as CSV, one game per row."
+    with open(filename, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(RESULT_COLUMNS[summary['game']])
+        writer.writerows(summary['results'])
+
+
+def report(summary):
+    "Print a tournament summary."
+    if summary['game'] == 'uno':
+        return report_uno(summary)
+    print('{games} games (seed {seed}) in {seconds:.1f}s, {games_per_second:.2f} games/s, {draws} draws'
+          .format(**summary))
+    for (label, p) in summary['players'].items():
+        scores, moves = p['scores'], p['move_seconds']
+        print('{} {:<14} wins {:>5}   score mean {:6.1f} sd {:5.1f} [{}..{}]   ms/move mean {:6.1f} p95 {:6.1f}'.format(
+            label, p['strategy'], p['wins'], scores.get('mean', 0), scores.get('stdev', 0),
+            scores.get('min'), scores.get('max'), 1000 * moves.get('mean', 0), 1000 * moves.get('p95', 0)))
+
+
+def report_uno(summary):
+    "Print an UNO tournament summary."
+    print('{games} games (seed {seed}) in {seconds:.1f}s, {games_per_second:.0f} games/s'.format(**summary))
+    for (label, p) in summary['players'].items():
+        decisions = p['decision_seconds']
+        print('{} {:<14} win rate {:.3f} [{:.3f}, {:.3f}]   us/decision mean {:6.1f} p95 {:6.1f}'.format(
+            label, p['strategy'], p['rate'], p['low'], p['high'],
+            1e6 * decisions.get('mean', 0), 1e6 * decisions.get('p95', 0)))
+    first, turns = summary['first_seat'], summary['turns']
+    if first is None:
+        print('{} players, A at one seat (a fair share of wins is {:.3f})   turns mean {:.1f} sd {:.1f}'.format(
+            summary['seats'], 1 / summary['seats'], turns.get('mean', 0), turns.get('stdev', 0)))
+        return
+    print('first seat win rate {:.3f} [{:.3f}, {:.3f}]{}   turns mean {:.1f} sd {:.1f}'.format(
+        first['rate'], first['low'], first['high'], '' if summary['alternate'] else ' (A always first)',
+        turns.get('mean', 0), turns.get('stdev', 0)))
+
+
+def strategy(name, module):
+    "The strategy called name in module, or in another module if name is 'module.name' (e.g. leaves.leave_strat)."
+    if '.' in name:
+        module_name, name = name.rsplit('.', 1)
+        module = importlib.import_module(module_name)
+    return getattr(module, name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Play a tournament between two strategies.')
+    games = parser.add_subparsers(dest='game', required=True)
+    scrabble = games.add_parser('scrabble', help='Scrabble strategies from Scrabble.py')
+    scrabble.add_argument('A', help='name of a strategy, e.g. best_strat or leaves.leave_strat')
+    scrabble.add_argument('B', help='name of a strategy, e.g. best_strat2')
+    scrabble.add_argument('--endgame', action='store_true',
+                          help='play games out once the bag is empty (e.g. for endgame.endgame_strat)')
+    uno = games.add_parser('uno', help='UNO strategies from UNO.py')
+    uno.add_argument('A', help='name of a strategy, e.g. clueless')
+    uno.add_argument('B', help='name of a strategy, e.g. clueless2')
+    uno.add_argument('--fixed-seats', action='store_true', help='A always takes the first seat')
+    uno.add_argument('--players', type=int, default=2, help='players at the table (B takes all seats but one)')
+    for p in (scrabble, uno):
+        p.add_argument('-n', '--games', type=int, default=100)
+        p.add_argument('--seed', type=int, default=0)
+        p.add_argument('--workers', type=int, default=None, help='worker processes (default: one per core)')
+        p.add_argument('--json', help='save the summary to this JSON file')
+        p.add_argument('--csv', help='save the games to this CSV file')
+        p.add_argument('--replay', type=int, metavar='N', help='play game N (from 0) of the tournament again')
+    args = parser.parse_args(argv)
+    if args.replay is not None:
+        module = Scrabble if args.game == 'scrabble' else UNO
+        result = replay(args.game, strategy(args.A, module), strategy(args.B, module), args.replay, args.seed,
+                        args.game == 'scrabble' or not args.fixed_seats, getattr(args, 'players', 2),
+                        getattr(args, 'endgame', False))
+        print(result[:4] if args.game == 'scrabble' else result[:5])
+        return result
+    if args.game == 'scrabble':
+        summary = scrabble_tournament(strategy(args.A, Scrabble), strategy(args.B, Scrabble),
+                                      args.games, args.seed, args.workers, args.endgame)
+    else:
+        summary = uno_tournament(strategy(args.A, UNO), strategy(args.B, UNO),
+                                 args.games, args.seed, args.workers, not args.fixed_seats, args.players)
+    report(summary)
+    if args.json: write_json(summary, args.json)
+    if args.csv: write_csv(summary, args.csv)
+    return summary
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,388 @@
+'''
+A headless UNO engine for simulating many games quickly, by rules that can be chosen (see Rules), at tables of
+2 to 10 players.
+
+Cards are small integers. A colored card is 13 * color + face, with colors 0-3 (COLORS) and faces 0-12 (FACES:
+the numbers, then Skip, Reverse and Draw Two); WILD_CARD and FOUR_CARD are the Wild and the Wild Draw Four. A hand
+is a vector of counts indexed by card, and alongside it are the counts of its cards of each color and of each face.
+So whether a player can go on the top card is a lookup of two counts and the wilds, and the cards that can go on it
+are found among the 13 cards of its color and the 4 of its face, without scanning the hand. The draw pile is
+shuffled once and dealt from its end; cards played go on the discard pile, which is shuffled into a new draw pile
+when the old one runs out.
+
+A move is a colored card, a wild together with the color it names (WILD + color or FOUR + color), PICK, WAIT or
+CHALLENGE. A strategy is a function strategy(game, cards) -> move that is called with the cards it may play. When
+there are none the engine picks a card, or waits if it already picked, without asking; unless the player could
+challenge a Wild Draw Four (game.challengeable), in which case the strategy is asked with no cards and answers
+CHALLENGE or PICK. UNO.py strategies, which take the 6-tuple state and return strings, play here through adapt.
+
+Play goes round the table in a direction (1 or -1, changed by Reverse), from seat to seat; UNO.py's two-player
+state, with the hand of the player to move and the next player's, is made for UNO.py strategies by legacy_state.
+
+    python uno_engine.py -n 100000
+    python uno_engine.py -n 100000 --stacking --challenge --players 6
+'''
+
+import argparse
+import inspect
+import random
+import time
+
+COLORS, FACES = 'RGBY', '0123456789SRD'
+SKIP, REVERSE, DRAW_TWO = 10, 11, 12
+WILD_CARD, FOUR_CARD = 52, 53
+WILD, FOUR, PICK, WAIT, CHALLENGE = 52, 56, 60, 61, 62  # Moves: WILD + color, FOUR + color, PICK, WAIT, CHALLENGE
+NO_FACE = 13  # The face of the top card after a wild: only its color can be matched
+
+DECK = tuple([13 * c + f for c in range(4) for f in [0] + list(range(1, 13)) * 2] + [WILD_CARD] * 4 + [FOUR_CARD] * 4)
+SAME_COLOR = [range(13 * c, 13 * c + 13) for c in range(4)]
+SAME_FACE = [tuple(13 * c + f for c in range(4)) for f in range(13)] + [()]
+CARD_COLOR = [c // 13 for c in range(52)] + [4, 4]  # Wilds are counted as a fifth color, and
+CARD_FACE = [c % 13 for c in range(52)] + [NO_FACE, NO_FACE]  # under NO_FACE, which no card matches
+HAND_SIZE = 5
+MAX_PLAYERS = 10
+MAX_TURNS = 10000  # A game still going after this many turns is called off (it needs very bad luck)
+
+
+class Rules:
+    """The rules a game is played by. The defaults are the official rules (with UNO.py's hands of 5): a player made to
+    draw by a Draw Two or Wild Draw Four also misses their turn, and Reverse changes the direction of play (with two
+    players, it works as a Skip). The options:
+
+        recycle    when the draw pile runs out, shuffle the discard pile (all but its top card) into a new one;
+                   otherwise a whole new deck is shuffled, as UNO.py does
+        draw_skips a player who draws 2 or 4 misses their turn; otherwise they play on, as in UNO.py
+        stacking   a player given a Draw Two can pass it on, with 2 more, by playing a Draw Two of their own,
+                   and the same for a Wild Draw Four; the player who can't (or won't) draws them all
+        challenge  the player given a Wild Draw Four can challenge it: if it was played by a player holding a card
+                   of the color to follow, that player draws the cards instead; if not, the challenger draws 2 more
+
+    Rules.legacy() are the rules UNO.play_uno plays by."""
+
+    __slots__ = ('hand_size', 'recycle', 'draw_skips', 'stacking', 'challenge')
+
+    def __init__(self, hand_size=HAND_SIZE, recycle=True, draw_skips=True, stacking=False, challenge=False):
+        self.hand_size, self.recycle, self.draw_skips = hand_size, recycle, draw_skips
+        self.stacking, self.challenge = stacking, challenge
+
+    @classmethod
+    def legacy(cls):
+        return cls(recycle=False, draw_skips=False)
+
+    def __repr__(self):
+        return 'Rules({})'.format(', '.join('{}={!r}'.format(name, getattr(self, name)) for name in self.__slots__))
+
+
+OFFICIAL = Rules()
+
+
+class UnoGame:
+    """The state of a game: the number of players; their hands (count vectors), the counts of each hand by color and
+    by face, and their sizes; the draw and discard piles; the top card's color and face; whose turn it is, the
+    direction of play, whether the player to move has picked a card this turn, the cards they must draw if they
+    can't pass them on (penalty), and whether a challenge of a Wild Draw Four would succeed (bluffed: None if there
+    is none to challenge) and who played it (offender); and the turns played. Everything is changed in place as
+    the game goes on."""
+
+    __slots__ = ('rng', 'rules', 'players', 'deck', 'discard', 'hands', 'colors', 'faces', 'sizes', 'top_color',
+                 'top_face', 'player', 'direction', 'picked', 'penalty', 'bluffed', 'offender', 'turns')
+
+    def __init__(self, rng, rules=OFFICIAL, players=2):
+        if not 2 <= players <= MAX_PLAYERS:
+            raise ValueError('UNO is for 2 to {} players, not {}'.format(MAX_PLAYERS, players))
+        self.rng, self.rules, self.players = rng, rules, players
+        self.deck = list(DECK)
+        rng.shuffle(self.deck)
+        self.discard = []
+        self.hands = [[0] * 54 for _ in range(players)]
+        self.colors = [[0] * 5 for _ in range(players)]
+        self.faces = [[0] * 14 for _ in range(players)]
+        self.sizes = [0] * players
+        self.picked, self.penalty, self.bluffed, self.offender, self.turns = False, 0, None, None, 0
+        start = self.deck.pop()
+        while start >= WILD_CARD:  # A wild can't start the pile; it goes under the start card
+            self.discard.append(start)
+            start = self.deck.pop()
+        for p in range(players):
+            self.draw(p, rules.hand_size)
+        # As in UNO_setup, the start card takes effect as if player 0 had just played it.
+        self.player, self.direction = 0, 1
+        self.discard.append(start)
+        self.play_effect(start)
+
+    def copy(self, rng=None):
+        "A copy of the game to play on without changing this one, drawing on rng (by default, this game's)."
+        game = UnoGame.__new__(UnoGame)
+        for name in self.__slots__:
+            setattr(game, name, getattr(self, name))
+        game.rng = rng or self.rng
+        game.deck, game.discard, game.sizes = self.deck[:], self.discard[:], self.sizes[:]
+        game.hands = [hand[:] for hand in self.hands]
+        game.colors = [colors[:] for colors in self.colors]
+        game.faces = [faces[:] for faces in self.faces]
+        return game
+
+    def set_hand(self, p, cards):
+        "Give player p exactly these cards (a list), in place of their hand."
+        hand, colors, faces = [0] * 54, [0] * 5, [0] * 14
+        for card in cards:
+            hand[card] += 1
+            colors[CARD_COLOR[card]] += 1
+            faces[CARD_FACE[card]] += 1
+        self.hands[p], self.colors[p], self.faces[p], self.sizes[p] = hand, colors, faces, len(cards)
+
+    def draw(self, p, n):
+        "Player p draws n cards (fewer, if the draw and discard piles are both empty)."
+        hand, colors, faces, deck = self.hands[p], self.colors[p], self.faces[p], self.deck
+        for _ in range(n):
+            if not deck:
+                deck = self.new_deck()
+                if not deck:
+                    break
+            card = deck.pop()
+            hand[card] += 1
+            colors[CARD_COLOR[card]] += 1
+            faces[CARD_FACE[card]] += 1
+            self.sizes[p] += 1
+
+    def new_deck(self):
+        "Replace the empty draw pile: with the discard pile, all but its top card, or (not recycling) a new deck."
+        if self.rules.recycle:
+            deck, self.discard = self.discard[:-1], self.discard[-1:]
+        else:
+            deck = list(DECK)
+        self.rng.shuffle(deck)
+        self.deck = deck
+        return deck
+
+    def next_player(self, seats=1):
+        "The player that many seats on from the player to move, in the direction of play."
+        return (self.player + seats * self.direction) % self.players
+
+    def legal_cards(self):
+        "The distinct cards the player to move can put on the top card."
+        p = self.player
+        hand, color, face = self.hands[p], self.top_color, self.top_face
+        if self.penalty:  # Only a card like the one that gave it can pass a penalty on
+            if not self.rules.stacking:
+                return []
+            if face == DRAW_TWO:
+                return [c for c in SAME_FACE[DRAW_TWO] if hand[c]]
+            return [FOUR_CARD] if hand[FOUR_CARD] else []
+        cards = [c for c in SAME_COLOR[color] if hand[c]] if self.colors[p][color] else []
+        if self.faces[p][face]:
+            cards += [c for c in SAME_FACE[face] if hand[c] and CARD_COLOR[c] != color]
+        if hand[WILD_CARD]: cards.append(WILD_CARD)
+        if hand[FOUR_CARD]: cards.append(FOUR_CARD)
+        return cards
+
+    @property
+    def challengeable(self):
+        "Whether the player to move can challenge the Wild Draw Four just played on them."
+        return self.bluffed is not None
+
+    def move(self, move):
+        "Make a move for the player to move. Return the player who has just won, or None."
+        p = self.player
+        self.turns += 1
+        if move == PICK:
+            if self.penalty:  # Take the cards (and, by the rules, miss the turn)
+                self.draw(p, self.penalty)
+                self.penalty, self.bluffed = 0, None
+                if self.rules.draw_skips:
+                    self.player = self.next_player()
+                return None
+            self.draw(p, 1)
+            self.picked = True
+            return None
+        self.picked = False
+        if move == WAIT:
+            self.player = self.next_player()
+            return None
+        if move == CHALLENGE:
+            if self.bluffed:  # The player of the Wild Draw Four had a card of the color: they draw instead
+                self.draw(self.offender, self.penalty)
+            else:
+                self.draw(p, self.penalty + 2)
+                if self.rules.draw_skips:
+                    self.player = self.next_player()
+            self.penalty, self.bluffed = 0, None
+            return None
+        card = move if move < WILD else WILD_CARD if move < FOUR else FOUR_CARD
+        if card == FOUR_CARD and self.rules.challenge:
+            self.bluffed = self.colors[p][self.top_color] > 0
+        self.hands[p][card] -= 1
+        self.colors[p][CARD_COLOR[card]] -= 1
+        self.faces[p][CARD_FACE[card]] -= 1
+        self.sizes[p] -= 1
+        self.discard.append(card)
+        if card >= WILD_CARD:
+            self.top_color, self.top_face = (move - WILD) % 4, NO_FACE
+        self.play_effect(card)
+        return p if not self.sizes[p] else None
+
+    def play_effect(self, card):
+        "Put card on top of the pile and pass the turn on as it says (a wild's color is already set)."
+        rules = self.rules
+        if card < WILD_CARD:
+            self.top_color, self.top_face = CARD_COLOR[card], CARD_FACE[card]
+            face = self.top_face
+            if face == SKIP:
+                self.player = self.next_player(2)
+                return
+            if face == REVERSE:
+                if self.players == 2:  # It works as a Skip
+                    return
+                self.direction = -self.direction
+            elif face == DRAW_TWO:
+                if rules.stacking:
+                    self.penalty += 2  # Drawn by whoever can't pass it on
+                else:
+                    self.draw(self.next_player(), 2)
+                    if rules.draw_skips:
+                        self.player = self.next_player(2)
+                        return
+        elif card == FOUR_CARD:
+            if rules.stacking or rules.challenge:
+                self.penalty += 4
+                self.offender = self.player
+            else:
+                self.draw(self.next_player(), 4)
+                if rules.draw_skips:
+                    self.player = self.next_player(2)
+                    return
+        self.player = self.next_player()
+
+    def legacy_state(self):
+        """The state as the 6-tuple that UNO.py strategies take: (p, hand0, hand1, top_card, deck, pick), where hand1
+        is the next player's hand."""
+        p = self.player
+        top = COLORS[self.top_color] + (FACES[self.top_face] if self.top_face != NO_FACE else '?')
+        return (p, card_names(self.hands[p]), card_names(self.hands[self.next_player()]), top,
+                [card_name(c) for c in reversed(self.deck)], int(self.picked))
+
+
+def card_name(card):
+    "The UNO.py name of a card: e.g. 'R7', 'GS', '?W'."
+    if card >= WILD_CARD:
+        return '?W' if card == WILD_CARD else '?F'
+    return COLORS[card // 13] + FACES[card % 13]
+
+
+def card_names(hand):
+    "The UNO.py names of the cards in a hand (count vector)."
+    return [card_name(c) for (c, n) in enumerate(hand) for _ in range(n)]
+
+
+def parse_move(move):
+    "The engine's move for a move returned by an UNO.py strategy: 'pick', 'wait', or a card such as 'R7' or 'BW'."
+    if move == 'pick': return PICK
+    if move == 'wait': return WAIT
+    color = COLORS.index(move[0])
+    if move[1] == 'W': return WILD + color
+    if move[1] == 'F': return FOUR + color
+    return 13 * color + FACES.index(move[1])
+
+
+def adapt(strategy):
+    "A strategy for this engine that asks an UNO.py strategy for its moves. (UNO.py strategies never challenge.)"
+    def adapted(game, cards):
+        return parse_move(strategy(game.legacy_state())) if cards else PICK
+    adapted.__name__ = getattr(strategy, '__name__', type(strategy).__name__)
+    return adapted
+
+
+def engine_strategy(strategy):
+    """strategy itself, if it is written for this engine (it takes game and cards), or else adapted from UNO.py (it
+    takes a state). Any callable will do: a function, a bound method, a functools.partial or a callable object. An
+    UNO.py strategy with a native counterpart names it as its engine attribute, and plays as that here."""
+    if hasattr(strategy, 'engine'):
+        return strategy.engine
+    positional = [param for param in inspect.signature(strategy).parameters.values()
+                  if param.kind in (param.POSITIONAL_ONLY, param.POSITIONAL_OR_KEYWORD)
+                  and param.default is param.empty]
+    return strategy if len(positional) == 2 else adapt(strategy)
+
+
+def random_play(game, cards):
+    """Play a random card, naming a random color for a wild: the same choices as UNO.clueless, natively. A Wild Draw
+    Four is challenged half the time (when the rules allow it)."""
+    if game.bluffed is not None and game.rng.random() < 0.5:
+        return CHALLENGE
+    if not cards:
+        return PICK
+    card = cards[game.rng.randrange(len(cards))]
+    if card < WILD_CARD:
+        return card
+    return (WILD if card == WILD_CARD else FOUR) + game.rng.randrange(4)
+
+
+def play(A, B, rng, max_turns=MAX_TURNS, rules=OFFICIAL):
+    "Play one game between strategies A and B. Return (winner, turns); winner is 0, 1, or None if called off."
+    return play_table((A, B), rng, max_turns, rules)
+
+
+def play_table(strategies, rng, max_turns=MAX_TURNS, rules=OFFICIAL, game=None):
+    """Play one game with a player for each of strategies, in seat order. Return (winner, turns); winner is a seat,
+    or None if the game was called off. A game can go on from where game is (such as snapshot.load_engine gives),
+    by its own rules and drawing on its own generator, instead of starting anew."""
+    if game is None:
+        game = UnoGame(rng, rules, len(strategies))
+    while game.turns < max_turns:
+        cards = game.legal_cards()
+        if cards or game.bluffed is not None:
+            move = strategies[game.player](game, cards)
+        elif game.penalty:
+            move = PICK
+        else:
+            move = WAIT if game.picked else PICK
+        winner = game.move(move)
+        if winner is not None:
+            return winner, game.turns
+    return None, game.turns
+
+
+def simulate(A, B, games=10000, seed=None, rules=OFFICIAL, players=2):
+    """Play many games between strategy A, in seat 0, and strategy B in the other seats, from one seeded generator.
+    Return {'games', 'wins': [wins of each seat], 'called_off', 'turns', 'seconds', 'games_per_second'}."""
+    rng = random.Random(seed)
+    strategies = (A,) + (B,) * (players - 1)
+    wins, called_off, turns = [0] * players, 0, 0
+    t = time.perf_counter()
+    for _ in range(games):
+        winner, n = play_table(strategies, rng, rules=rules)
+        turns += n
+        if winner is None:
+            called_off += 1
+        else:
+            wins[winner] += 1
+    seconds = time.perf_counter() - t
+    return {'games': games, 'wins': wins, 'called_off': called_off, 'turns': turns, 'seconds': seconds,
+            'games_per_second': games / seconds if seconds else 0.0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Simulate UNO games between random players.')
+    parser.add_argument('-n', '--games', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--legacy', action='store_true', help='play UNO.clueless and UNO.clueless2 through adapt')
+    parser.add_argument('--legacy-rules', action='store_true', help="play by UNO.play_uno's rules (Rules.legacy)")
+    parser.add_argument('--stacking', action='store_true', help='Draw Twos and Wild Draw Fours can be passed on')
+    parser.add_argument('--challenge', action='store_true', help='Wild Draw Fours can be challenged')
+    parser.add_argument('--players', type=int, default=2, help='players at the table (2 to {})'.format(MAX_PLAYERS))
+    args = parser.parse_args(argv)
+    rules = Rules.legacy() if args.legacy_rules else Rules()
+    rules.stacking, rules.challenge = args.stacking, args.challenge
+    if args.legacy:
+        import UNO
+        A, B = adapt(UNO.clueless), adapt(UNO.clueless2)
+    else:
+        A = B = random_play
+    result = simulate(A, B, args.games, args.seed, rules, args.players)
+    print('{games} games in {seconds:.2f}s: {games_per_second:.0f} games/s, wins {wins}, '
+          '{called_off} called off, {turns} turns'.format(**result))
+    return result
+
+
+if __name__ == '__main__':
+    main()
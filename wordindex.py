@@ -0,0 +1,155 @@
+'''
+An index of the word list for the questions move generation doesn't ask: which words are anagrams of these tiles,
+which match a pattern such as A?T??, and which contain Q but no U.
+
+Anagrams are found in a dict from each word's signature (its letters, sorted) to the words with it: one lookup
+for a set of tiles, or one for each letter a blank can stand for. The other queries go through bitmaps. The words
+of each length are numbered (in alphabetical order), and for each length there is a bitmap, an int with a bit for
+each word, of the words with each letter at each position, and of the words with each letter anywhere. A pattern
+is the AND of the bitmaps of its letters, at their positions; a word with a letter and without another is one
+bitmap AND NOT the other. Only the words whose bits are left are looked at.
+
+WordIndex.load() builds the index of the word list that Scrabble uses (Scrabble.WORDLIST, read as readwordlist
+reads it), once per process; building it takes seconds (from under 2 to about 5, depending on the machine: the
+command line prints how long), and it holds a few megabytes. A long-running process pays for it once.
+
+    python main.py anagram RETAIN_
+    python main.py pattern A?T??
+    python main.py containing Q --without U
+'''
+
+import argparse
+import itertools
+import time
+
+import Scrabble
+from lexicon import LETTERS
+
+WILDCARDS = '?._'  # Any of these in a pattern matches any letter; '_' or '?' in tiles is a blank
+index = None  # The index of Scrabble.WORDLIST, built by the first WordIndex.load()
+
+
+class WordIndex:
+    "An index of a set of uppercase words, for anagrams, patterns and the letters they hold."
+
+    def __init__(self, words):
+        self.signatures = {}
+        for word in sorted(words):
+            self.signatures.setdefault(signature(word), []).append(word)
+        self.lengths = {}  # {length: words of that length, in order}
+        for word in sorted(words, key=lambda word: (len(word), word)):
+            self.lengths.setdefault(len(word), []).append(word)
+        self.positions = {}  # {length: [{letter: bitmap of the words with it at this position}, ...]}
+        self.letters = {}  # {length: {letter: bitmap of the words with it anywhere}}
+        for (n, group) in self.lengths.items():
+            size = (len(group) + 7) // 8
+            positions = [{L: bytearray(size) for L in LETTERS} for _ in range(n)]
+            anywhere = {L: bytearray(size) for L in LETTERS}
+            for (k, word) in enumerate(group):
+                byte, bit = k >> 3, 1 << (k & 7)
+                for (i, L) in enumerate(word):
+                    positions[i][L][byte] |= bit
+                    anywhere[L][byte] |= bit
+            self.positions[n] = [{L: int.from_bytes(bits, 'little') for (L, bits) in position.items()}
+                                 for position in positions]
+            self.letters[n] = {L: int.from_bytes(bits, 'little') for (L, bits) in anywhere.items()}
+
+    @classmethod
+    def load(cls):
+        "The index of Scrabble's word list, built the first time it is asked for."
+        global index
+        if index is None:
+            index = cls(Scrabble.readwords(Scrabble.WORDLIST))
+        return index
+
+    def __len__(self):
+        return sum(len(group) for group in self.lengths.values())
+
+    def anagrams(self, tiles):
+        "The words that use exactly these tiles, in alphabetical order; a blank ('_' or '?') can be any letter."
+        tiles = tiles.upper()
+        letters = ''.join(L for L in tiles if L not in WILDCARDS)
+        blanks = len(tiles) - len(letters)
+        if not blanks:
+            return list(self.signatures.get(signature(letters), ()))
+        found = set()
+        for extra in itertools.combinations_with_replacement(LETTERS, blanks):
+            found.update(self.signatures.get(signature(letters + ''.join(extra)), ()))
+        return sorted(found)
+
+    def matching(self, pattern, containing='', without=''):
+        """The words that match pattern, in alphabetical order: each letter of the pattern must be in the word at its
+        position, and each wildcard ('?', '.' or '_') can be any letter. If given, the words must also contain each
+        of the letters of containing, and none of those of without."""
+        pattern = pattern.upper()
+        n = len(pattern)
+        if n not in self.lengths:
+            return []
+        bits = (1 << len(self.lengths[n])) - 1
+        for (position, L) in zip(self.positions[n], pattern):
+            if L not in WILDCARDS:
+                bits &= position.get(L, 0)
+        return self.words(n, self.filter(n, bits, containing, without))
+
+    def containing(self, letters, without='', lengths=None):
+        """The words of any length (or of one of lengths) that contain each of letters and none of the letters of
+        without, shortest first and in alphabetical order for each length."""
+        found = []
+        for n in sorted(self.lengths if lengths is None else set(lengths) & set(self.lengths)):
+            found.extend(self.words(n, self.filter(n, (1 << len(self.lengths[n])) - 1, letters, without)))
+        return found
+
+    def filter(self, n, bits, containing, without):
+        "The bitmap of the words of length n among bits that contain each of containing and none of without."
+        letters = self.letters[n]
+        for L in containing.upper():
+            bits &= letters.get(L, 0)
+        for L in without.upper():
+            bits &= ~letters.get(L, 0)
+        return bits
+
+    def words(self, n, bits):
+        "The words of length n whose bits are set in bits."
+        group, found = self.lengths[n], []
+        digits = bin(bits)[:1:-1]  # Bit k is digit k
+        k = digits.find('1')
+        while k >= 0:
+            found.append(group[k])
+            k = digits.find('1', k + 1)
+        return found
+
+
+def signature(word):
+    "The letters of a word in sorted order: the same for all its anagrams."
+    return ''.join(sorted(word))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='main.py', description="Query the index of Scrabble's word list.")
+    queries = parser.add_subparsers(dest='query', required=True)
+    anagram = queries.add_parser('anagram', help='words that use exactly these tiles (_ or ? is a blank)')
+    anagram.add_argument('tiles')
+    pattern = queries.add_parser('pattern', help='words matching a pattern such as A?T?? (? . or _ is any letter)')
+    pattern.add_argument('pattern')
+    containing = queries.add_parser('containing', help='words that contain all these letters')
+    containing.add_argument('letters')
+    containing.add_argument('--length', type=int, action='append', help='only words of this length (repeatable)')
+    for p in (pattern, containing):
+        p.add_argument('--without', default='', help='only words with none of these letters')
+    pattern.add_argument('--containing', default='', help='only words with all of these letters')
+    args = parser.parse_args(argv)
+    t = time.perf_counter()
+    words = WordIndex.load()
+    built = time.perf_counter() - t
+    t = time.perf_counter()
+    if args.query == 'anagram':
+        found = words.anagrams(args.tiles)
+    elif args.query == 'pattern':
+        found = words.matching(args.pattern, args.containing, args.without)
+    else:
+        found = words.containing(args.letters, args.without, args.length)
+    seconds = time.perf_counter() - t
+    print(' '.join(found))
+    print('{} words in {:.3f} ms (index of {} words built in {:.2f}s)'.format(
+        len(found), 1000 * seconds, len(words), built))
+    return found